@@ -1,162 +1,414 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from flask import Flask, current_app, render_template, request, jsonify, Response, stream_with_context
 from datetime import datetime, timedelta
+from typing import Optional
 import pytz
 
 from config import (
-    DATABASE_URL,
+    ANALYTICS_DEFAULT_DAYS,
     CALENDAR_TIMEZONE,
-    SERVICES,
-    STYLISTS,
-    BUSINESS_HOURS
+    DEFAULT_LOCATION,
+    PROFILER_ENABLED
 )
-from models import Client, Appointment, Service, Stylist, AppointmentStatus
-from scheduler import Scheduler
+from scheduler import BookingConflict, Scheduler
+from pagination import appointments_page, clients_page, page_size, appointment_to_dict, client_to_dict
+from export import stream_appointments_csv, stream_appointments_ndjson
+from email_archive import archive_dir, daily_counts, stream_archive_ndjson
+from stats import dashboard_context
+from db import scoped_app_session
+from locations import LocationRouter
+from instrumentation import instrument_app, profiler, render_prometheus
 
-app = Flask(__name__)
-app.secret_key = 'your-secret-key-here'  # Change this in production
+# Views are collected here and registered on each app that create_app builds
+_routes = []
 
-# Database setup
-engine = create_engine(DATABASE_URL)
-Session = sessionmaker(bind=engine)
-scheduler = Scheduler()
+def route(rule, **options):
+    """Record a view for create_app, as app.route would register it."""
+    def record(view):
+        _routes.append((rule, view, options))
+        return view
+    return record
 
-@app.route('/')
+class AdminState:
+    """What the views share: the location router, the default location's scheduler and its sessions.
+
+    Views use db_session, which is removed when the app context ends; the
+    scheduler, stats and exports open their own short sessions from Session.
+    Pages show DEFAULT_LOCATION; the booking API takes a 'location' to route
+    to another shard.
+    """
+
+    def __init__(self, app, router: LocationRouter, session_factory, scheduler: Scheduler):
+        self.router = router
+        self.Session = session_factory
+        self.db_session = scoped_app_session(app, session_factory)
+        self.scheduler = scheduler
+
+    def location_scheduler(self, data=None) -> Scheduler:
+        """The scheduler for the location a request names, or the default one."""
+        location_id = (data or {}).get('location') or request.args.get('location') or DEFAULT_LOCATION
+        if location_id == DEFAULT_LOCATION:
+            return self.scheduler
+        return self.router.scheduler(location_id)
+
+def state() -> AdminState:
+    return current_app.extensions['salon']
+
+def create_app(router: Optional[LocationRouter] = None, session_factory=None,
+               scheduler: Optional[Scheduler] = None) -> Flask:
+    """Build the admin app. Nothing connects to a database until the first request.
+
+    By default the app serves DEFAULT_LOCATION from LOCATIONS; pass a
+    session factory (and optionally a scheduler) to serve another database.
+    """
+    app = Flask(__name__)
+    app.secret_key = 'your-secret-key-here'  # Change this in production
+    instrument_app(app)
+    if PROFILER_ENABLED:
+        profiler.start()
+
+    router = router or LocationRouter()
+    if session_factory is None:
+        session_factory = router.session_factory(DEFAULT_LOCATION)
+        scheduler = scheduler or router.scheduler(DEFAULT_LOCATION)
+    app.extensions['salon'] = AdminState(app, router, session_factory, scheduler or Scheduler(session_factory))
+
+    for rule, view, options in _routes:
+        app.add_url_rule(rule, view_func=view, **options)
+    app.add_template_filter(format_datetime, 'format_datetime')
+    return app
+
+@route('/')
 def dashboard():
     """Display the main dashboard."""
-    session = Session()
-    today = datetime.now(pytz.timezone(CALENDAR_TIMEZONE))
-    
-    # Get today's appointments
-    todays_appointments = session.query(Appointment).filter(
-        Appointment.start_time >= today.replace(hour=0, minute=0),
-        Appointment.start_time < (today + timedelta(days=1)).replace(hour=0, minute=0)
-    ).all()
-    
-    # Get upcoming appointments for the week
-    upcoming_appointments = scheduler.get_upcoming_appointments(7)
-    
-    # Get basic stats
-    total_clients = session.query(Client).count()
-    total_appointments = session.query(Appointment).count()
-    
-    session.close()
-    
+    context = dashboard_context(state().Session, state().scheduler)
     return render_template(
         'dashboard.html',
-        todays_appointments=todays_appointments,
-        upcoming_appointments=upcoming_appointments,
-        total_clients=total_clients,
-        total_appointments=total_appointments
+        todays_appointments=context['todays_appointments'],
+        upcoming_appointments=context['upcoming_appointments'],
+        stats=context['stats']
     )
 
-@app.route('/appointments')
+@route('/appointments')
 def appointments():
-    """Display and manage appointments."""
-    session = Session()
-    appointments = session.query(Appointment).order_by(Appointment.start_time.desc()).all()
-    session.close()
-    return render_template('appointments.html', appointments=appointments)
+    """Display and manage appointments, one page at a time."""
+    session = state().db_session()
+    try:
+        appointments, next_cursor = appointments_page(
+            session,
+            request.args.get('cursor'),
+            page_size(request.args.get('limit'))
+        )
+        return render_template('appointments.html', appointments=appointments, next_cursor=next_cursor)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-@app.route('/clients')
+@route('/clients')
 def clients():
-    """Display and manage clients."""
-    session = Session()
-    clients = session.query(Client).all()
-    session.close()
-    return render_template('clients.html', clients=clients)
+    """Display and manage clients, one page at a time."""
+    session = state().db_session()
+    try:
+        clients, next_cursor = clients_page(
+            session,
+            request.args.get('cursor'),
+            page_size(request.args.get('limit'))
+        )
+        return render_template('clients.html', clients=clients, next_cursor=next_cursor)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@route('/api/appointments')
+def list_appointments():
+    """API endpoint to page through appointments, newest first."""
+    session = state().db_session()
+    try:
+        appointments, next_cursor = appointments_page(
+            session,
+            request.args.get('cursor'),
+            page_size(request.args.get('limit'))
+        )
+        return jsonify({
+            'appointments': [appointment_to_dict(a) for a in appointments],
+            'next_cursor': next_cursor
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@route('/api/clients')
+def list_clients():
+    """API endpoint to page through clients."""
+    session = state().db_session()
+    try:
+        clients, next_cursor = clients_page(
+            session,
+            request.args.get('cursor'),
+            page_size(request.args.get('limit'))
+        )
+        return jsonify({
+            'clients': [client_to_dict(c) for c in clients],
+            'next_cursor': next_cursor
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-@app.route('/services')
+@route('/export/appointments.<fmt>')
+def export_appointments(fmt):
+    """Stream every appointment as CSV or NDJSON."""
+    if fmt == 'csv':
+        rows, mimetype = stream_appointments_csv(state().Session), 'text/csv'
+    elif fmt == 'ndjson':
+        rows, mimetype = stream_appointments_ndjson(state().Session), 'application/x-ndjson'
+    else:
+        return jsonify({'error': f'Unsupported export format: {fmt}'}), 400
+    return Response(
+        stream_with_context(rows),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=appointments.{fmt}'}
+    )
+
+@route('/services')
 def services():
     """Display and manage services."""
-    return render_template('services.html', services=SERVICES)
+    return render_template('services.html', services=state().scheduler.catalog.get().services)
 
-@app.route('/stylists')
+@route('/stylists')
 def stylists():
     """Display and manage stylists."""
-    return render_template('stylists.html', stylists=STYLISTS)
+    return render_template('stylists.html', stylists=state().scheduler.catalog.get().stylists)
 
-@app.route('/schedule')
+@route('/schedule')
 def schedule():
     """Display the scheduling interface."""
+    catalog = state().scheduler.catalog.get()
     return render_template(
         'schedule.html',
-        services=SERVICES,
-        stylists=STYLISTS,
-        business_hours=BUSINESS_HOURS
+        services=catalog.services,
+        stylists=catalog.stylists,
+        business_hours=catalog.business_hours
     )
 
-@app.route('/api/available-slots', methods=['POST'])
+@route('/api/available-slots', methods=['GET', 'POST'])
 def get_available_slots():
-    """API endpoint to get available appointment slots."""
-    data = request.json
+    """API endpoint to get available appointment slots.
+
+    GET takes the same fields as query parameters and answers with an ETag
+    made from the slot cache's version counters. A repeat request whose
+    If-None-Match still matches gets 304 without the slots being searched.
+    """
+    data = request.json if request.method == 'POST' else request.args
     service_name = data.get('service')
     date_str = data.get('date')
     stylist_id = data.get('stylist')
     
     try:
+        days = int(data.get('days', 1))
         preferred_date = datetime.strptime(date_str, '%Y-%m-%d').replace(
             tzinfo=pytz.timezone(CALENDAR_TIMEZONE)
         )
-        slots = scheduler.find_available_slots(
-            service_name,
+        scheduler = state().location_scheduler(data)
+        etag = scheduler.slots_etag(service_name, preferred_date=preferred_date, stylist_id=stylist_id, days=days)
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            slots = scheduler.find_available_slots(
+                service_name,
+                preferred_date=preferred_date,
+                stylist_id=stylist_id,
+                days=days
+            )
+
+            response = jsonify({
+                'slots': [
+                    {
+                        'datetime': slot[0].isoformat(),
+                        'stylists': slot[1]
+                    }
+                    for slot in slots
+                ]
+            })
+        # Browsers revalidate every time, and a matching ETag makes that a 304
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@route('/api/locations')
+def list_locations():
+    """API endpoint listing the locations this deployment serves."""
+    return jsonify({
+        'default': DEFAULT_LOCATION,
+        'locations': [{'id': key, 'name': info['name']} for key, info in state().router.locations.items()]
+    })
+
+@route('/api/nearest-slots', methods=['POST'])
+def nearest_slots():
+    """API endpoint to find the open slots closest to a time at any location."""
+    data = request.json
+    try:
+        preferred_date = datetime.fromisoformat(data['datetime']) if data.get('datetime') else None
+        if preferred_date is not None and preferred_date.tzinfo is None:
+            preferred_date = pytz.timezone(CALENDAR_TIMEZONE).localize(preferred_date)
+        slots = state().router.find_nearest_slots(
+            data.get('service'),
             preferred_date=preferred_date,
-            stylist_id=stylist_id
+            days=int(data.get('days', 1)),
+            limit=int(data.get('limit', 3)),
+            location_ids=data.get('locations')
         )
-        
         return jsonify({
             'slots': [
                 {
-                    'datetime': slot[0].isoformat(),
-                    'stylists': slot[1]
+                    'location': location_id,
+                    'datetime': start.isoformat(),
+                    'stylists': stylists
                 }
-                for slot in slots
+                for location_id, start, stylists in slots
             ]
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
-@app.route('/api/schedule-appointment', methods=['POST'])
+@route('/api/schedule-appointment', methods=['POST'])
 def schedule_appointment():
     """API endpoint to schedule an appointment."""
     data = request.json
     try:
-        appointment = scheduler.schedule_appointment(
+        appointment = state().location_scheduler(data).schedule_appointment(
             data['client_name'],
             data['service'],
             datetime.fromisoformat(data['datetime']),
-            data['stylist_id']
+            data['stylist_id'],
+            client_email=data.get('client_email'),
+            phone=data.get('phone'),
+            notes=data.get('notes')
         )
         return jsonify(appointment)
+    except BookingConflict as e:
+        return jsonify({'error': str(e)}), 409
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
-@app.route('/api/cancel-appointment/<event_id>', methods=['POST'])
+@route('/api/cancel-appointment/<event_id>', methods=['POST'])
 def cancel_appointment(event_id):
     """API endpoint to cancel an appointment."""
     try:
-        success = scheduler.cancel_appointment(event_id)
+        success = state().location_scheduler().cancel_appointment(event_id)
         if success:
-            session = Session()
-            appointment = session.query(Appointment).filter_by(
-                event_id=event_id
-            ).first()
-            if appointment:
-                appointment.status = AppointmentStatus.CANCELLED
-                session.commit()
-            session.close()
             return jsonify({'success': True})
         return jsonify({'error': 'Failed to cancel appointment'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
-@app.route('/settings')
+def analytics_history():
+    """Load the appointment history an analytics request asks for.
+
+    'start' and 'end' are ISO dates, both inclusive; by default the range is
+    the last ANALYTICS_DEFAULT_DAYS days. NumPy is imported on the first
+    analytics request rather than with the app.
+    """
+    from analytics import cached_history
+
+    scheduler = state().location_scheduler()
+    end = request.args.get('end')
+    last_day = datetime.fromisoformat(end).date() if end else scheduler._now().date()
+    start = request.args.get('start')
+    first_day = (
+        datetime.fromisoformat(start).date() if start else last_day - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1)
+    )
+    if first_day > last_day:
+        raise ValueError('start must not be after end')
+    return scheduler, cached_history(scheduler.Session, first_day, last_day, scheduler.location_id)
+
+@route('/api/analytics/utilization')
+def analytics_utilization():
+    """API endpoint: share of each stylist's open hours that was booked, by weekday and hour."""
+    from analytics import utilization
+    try:
+        scheduler, history = analytics_history()
+        return jsonify(utilization(history, scheduler.catalog.get()))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@route('/api/analytics/statuses')
+def analytics_statuses():
+    """API endpoint: appointment counts and cancellation rates by status, salon-wide and per stylist."""
+    from analytics import status_breakdown
+    try:
+        scheduler, history = analytics_history()
+        return jsonify(status_breakdown(history, scheduler._now()))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@route('/api/analytics/revenue')
+def analytics_revenue():
+    """API endpoint: booked revenue per service, by day, week or month ('interval')."""
+    from analytics import revenue_by_service
+    try:
+        _, history = analytics_history()
+        return jsonify(revenue_by_service(history, request.args.get('interval', 'month')))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@route('/api/email-logs/archive')
+def email_log_archive():
+    """Stream archived email logs as NDJSON.
+
+    Filters are 'recipient', 'email_type', 'status' and 'appointment_id',
+    and the months 'start' and 'end' (YYYY-MM, inclusive).
+    """
+    try:
+        for month in ('start', 'end'):
+            if request.args.get(month):
+                datetime.strptime(request.args[month], '%Y-%m')
+        rows = stream_archive_ndjson(
+            archive_dir(state().location_scheduler().location_id),
+            first_month=request.args.get('start'),
+            last_month=request.args.get('end'),
+            recipient=request.args.get('recipient'),
+            email_type=request.args.get('email_type'),
+            status=request.args.get('status'),
+            appointment_id=request.args.get('appointment_id', type=int)
+        )
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+    return Response(stream_with_context(rows), mimetype='application/x-ndjson')
+
+@route('/api/email-logs/daily')
+def email_log_daily():
+    """API endpoint: emails sent per day, type and status, archived or not, between 'start' and 'end'."""
+    try:
+        scheduler = state().location_scheduler()
+        end = request.args.get('end')
+        last_day = datetime.fromisoformat(end).date() if end else datetime.utcnow().date()
+        start = request.args.get('start')
+        first_day = (
+            datetime.fromisoformat(start).date() if start else last_day - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1)
+        )
+        session = scheduler.Session()
+        try:
+            return jsonify(daily_counts(session, first_day, last_day))
+        finally:
+            session.close()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@route('/settings')
 def settings():
     """Display and manage system settings."""
     return render_template('settings.html')
 
-@app.template_filter('format_datetime')
+@route('/metrics')
+def metrics():
+    """Request, scheduler, email and database timings in the Prometheus text format."""
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@route('/debug/profile')
+def profile():
+    """Stacks sampled by the profiler, folded for flamegraph tools."""
+    if not profiler.running:
+        return jsonify({'error': 'Profiler is off; set SALON_PROFILER=1 to enable it'}), 404
+    return Response(profiler.folded(), mimetype='text/plain')
+
 def format_datetime(value, format='%Y-%m-%d %H:%M'):
     """Template filter to format datetime objects."""
     if value is None:
@@ -164,4 +416,4 @@ def format_datetime(value, format='%Y-%m-%d %H:%M'):
     return value.strftime(format)
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000) 
\ No newline at end of file
+    create_app().run(debug=True, port=5000) 
\ No newline at end of file
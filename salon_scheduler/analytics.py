@@ -0,0 +1,291 @@
+"""Occupancy, status and revenue analytics over appointment history.
+
+One Core select pulls the stylist, service, start, end and status of every
+appointment in the range, with the timestamps and status cast to their
+stored strings and read straight off the DBAPI cursor, so no Row,
+datetime or enum object is built per appointment. The columns become
+NumPy arrays and every aggregate is a bincount over combined indexes
+(stylist x weekday x hour, stylist x status, service x period) rather
+than a Python loop over appointments. The loaded arrays are shared for
+ANALYTICS_CACHE_SECONDS, so the three views of one range cost one query.
+"""
+from datetime import date, datetime, time, timedelta
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+from sqlalchemy import String, cast, func, select
+
+from config import ANALYTICS_CACHE_SECONDS, BUSINESS_HOURS, DEFAULT_LOCATION
+from models import Appointment, AppointmentStatus, Service, Stylist
+from availability import WEEKDAYS
+from cache import TTLCache
+from catalog import Catalog
+from instrumentation import timed
+from stats import BOOKED_STATUSES
+
+# Status codes in the arrays are positions in this list
+STATUSES = list(AppointmentStatus)
+INTERVALS = ('day', 'week', 'month')
+HOURS_PER_WEEK = 7 * 24
+
+history_cache = TTLCache(ANALYTICS_CACHE_SECONDS)
+
+
+class History(NamedTuple):
+    """Column arrays for the appointments in [first_day, last_day], one entry per appointment."""
+    first_day: date
+    last_day: date
+    stylist: np.ndarray       # Index into stylist_ids
+    service: np.ndarray       # Index into service_names
+    start: np.ndarray         # datetime64[m], salon-local
+    end: np.ndarray
+    status: np.ndarray        # Index into STATUSES
+    stylist_ids: List[int]
+    stylist_names: List[str]
+    service_names: List[str]
+    prices: np.ndarray        # Current price of each service
+
+
+def _index(ids: List[int]) -> np.ndarray:
+    """Lookup array mapping a database id to its position in ids."""
+    lookup = np.full(max(ids, default=0) + 1, -1, dtype=np.int64)
+    lookup[ids] = np.arange(len(ids))
+    return lookup
+
+
+@timed('analytics_load')
+def load_history(session_factory, first_day: date, last_day: date,
+                 location_id: str = DEFAULT_LOCATION) -> History:
+    """Fetch a location's appointment columns for a date range (both ends inclusive) into arrays."""
+    session = session_factory()
+    try:
+        stylists = session.execute(select(Stylist.id, Stylist.name).where(
+            Stylist.location_id == location_id
+        ).order_by(Stylist.name)).all()
+        services = session.execute(select(Service.id, Service.name, Service.price).order_by(Service.name)).all()
+        result = session.connection().execute(select(
+            Appointment.stylist_id,
+            Appointment.service_id,
+            cast(Appointment.start_time, String),
+            cast(Appointment.end_time, String),
+            func.coalesce(cast(Appointment.status, String), AppointmentStatus.PENDING.name)
+        ).where(
+            Appointment.location_id == location_id,
+            Appointment.start_time >= datetime.combine(first_day, time.min),
+            Appointment.start_time < datetime.combine(last_day + timedelta(days=1), time.min)
+        ))
+        try:
+            # Nothing in the select needs a result processor, so the driver's tuples are final
+            rows = result.cursor.fetchall()
+        finally:
+            result.close()
+    finally:
+        session.close()
+
+    stylist_ids = [row[0] for row in stylists]
+    service_ids = [row[0] for row in services]
+    if rows:
+        stylist_col, service_col, starts, ends, statuses = zip(*rows)
+    else:
+        stylist_col = service_col = starts = ends = statuses = ()
+
+    # Status names repeat, so look each distinct one up once
+    names, inverse = np.unique(np.array(statuses, dtype=str), return_inverse=True)
+    codes = {status.name: i for i, status in enumerate(STATUSES)}
+    status = np.array([codes[name] for name in names], dtype=np.int64)[inverse]
+
+    return History(
+        first_day=first_day,
+        last_day=last_day,
+        stylist=_index(stylist_ids)[np.fromiter(stylist_col, dtype=np.int64, count=len(rows))],
+        service=_index(service_ids)[np.fromiter(service_col, dtype=np.int64, count=len(rows))],
+        start=np.array(starts, dtype='datetime64[m]'),
+        end=np.array(ends, dtype='datetime64[m]'),
+        status=status.reshape(-1),
+        stylist_ids=stylist_ids,
+        stylist_names=[row[1] for row in stylists],
+        service_names=[row[1] for row in services],
+        prices=np.array([row[2] or 0.0 for row in services], dtype=np.float64)
+    )
+
+
+def cached_history(session_factory, first_day: date, last_day: date,
+                   location_id: str = DEFAULT_LOCATION) -> History:
+    """load_history, shared by every request for the same range for ANALYTICS_CACHE_SECONDS.
+
+    Bookings do not invalidate it: the numbers may be that far behind.
+    """
+    return history_cache.get_or_compute(
+        (location_id, first_day, last_day),
+        lambda: load_history(session_factory, first_day, last_day, location_id)
+    )
+
+
+def _weekday(days: np.ndarray) -> np.ndarray:
+    """Monday=0 weekday of datetime64[D] values (1970-01-01 was a Thursday)."""
+    return (days.astype(np.int64) + 3) % 7
+
+
+def _booked(history: History) -> np.ndarray:
+    return np.isin(history.status, [STATUSES.index(status) for status in BOOKED_STATUSES])
+
+
+def _open_hours(weekly: List[Optional[tuple]]) -> np.ndarray:
+    """Open minutes in each hour of the week, as a 7 x 24 array, for one stylist's weekly hours."""
+    starts = np.arange(24) * 60
+    result = np.zeros((7, 24))
+    for day, hours in enumerate(weekly):
+        if hours:
+            opens = hours[0].hour * 60 + hours[0].minute
+            closes = hours[1].hour * 60 + hours[1].minute
+            result[day] = np.clip(np.minimum(starts + 60, closes) - np.maximum(starts, opens), 0, 60)
+    return result
+
+
+def utilization(history: History, catalog: Catalog) -> dict:
+    """Booked share of each stylist's open minutes, by weekday and hour, over the range.
+
+    Appointments are split across the hours they overlap, and open minutes
+    are each stylist's weekly hours times the number of non-holiday
+    Mondays, Tuesdays, ... in the range. Hours nobody works are dropped;
+    hours a stylist is closed are null.
+    """
+    booked = _booked(history)
+    stylist = history.stylist[booked]
+    start = history.start[booked]
+    day = start.astype('datetime64[D]')
+    start_minute = (start - day).astype(np.int64)
+    end_minute = start_minute + np.maximum((history.end[booked] - start).astype(np.int64), 0)
+
+    # One entry per (appointment, hour it overlaps)
+    first_hour = start_minute // 60
+    spans = np.maximum((end_minute - 1) // 60 - first_hour + 1, 0)
+    owner = np.repeat(np.arange(len(spans)), spans)
+    hour = first_hour[owner] + np.arange(len(owner)) - np.repeat(np.cumsum(spans) - spans, spans)
+    minutes = np.minimum(end_minute[owner], (hour + 1) * 60) - np.maximum(start_minute[owner], hour * 60)
+    # Past midnight rolls over into the next weekday
+    slot = (stylist[owner] * 7 + (_weekday(day)[owner] + hour // 24) % 7) * 24 + hour % 24
+
+    count = len(history.stylist_ids)
+    booked_minutes = np.bincount(slot, weights=minutes, minlength=count * HOURS_PER_WEEK).reshape(count, 7, 24)
+
+    days = np.arange(history.first_day, history.last_day + timedelta(days=1), dtype='datetime64[D]')
+    days = days[~np.isin(days, np.array(sorted(catalog.holidays), dtype='datetime64[D]'))]
+    weekday_counts = np.bincount(_weekday(days), minlength=7)
+    default_hours = _open_hours([
+        (hours['start'], hours['end']) if hours else None for hours in (BUSINESS_HOURS.get(d) for d in WEEKDAYS)
+    ])
+    open_minutes = np.zeros((count, 7, 24))
+    for i, stylist_id in enumerate(history.stylist_ids):
+        # Stylists no longer in the catalog are assumed to have kept business hours
+        key = catalog.stylist_keys.get(stylist_id)
+        open_minutes[i] = _open_hours(catalog.weekly_hours[key]) if key else default_hours
+    open_minutes *= weekday_counts[None, :, None]
+
+    # Stylists with neither hours nor bookings have nothing to show
+    shown = np.flatnonzero((open_minutes.sum(axis=(1, 2)) > 0) | (booked_minutes.sum(axis=(1, 2)) > 0))
+    hours = np.flatnonzero((open_minutes[shown] > 0).any(axis=(0, 1)) | (booked_minutes[shown] > 0).any(axis=(0, 1)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(open_minutes > 0, booked_minutes / open_minutes, np.nan)
+        overall = booked_minutes.sum(axis=(1, 2)) / open_minutes.sum(axis=(1, 2))
+
+    def rounded(values: np.ndarray) -> list:
+        return [None if np.isnan(value) else round(float(value), 4) for value in values]
+
+    return {
+        'start': history.first_day.isoformat(),
+        'end': history.last_day.isoformat(),
+        'days': WEEKDAYS,
+        'hours': hours.tolist(),
+        'stylists': [
+            {
+                'stylist': history.stylist_names[i],
+                'booked_minutes': int(booked_minutes[i].sum()),
+                'open_minutes': int(open_minutes[i].sum()),
+                'utilization': rounded(overall[i:i + 1])[0],
+                'heatmap': [rounded(ratio[i, weekday, hours]) for weekday in range(7)]
+            }
+            for i in shown
+        ]
+    }
+
+
+def status_breakdown(history: History, now: datetime) -> dict:
+    """Appointment counts and rates by status, salon-wide and per stylist.
+
+    There is no no-show status, so 'unresolved' counts past appointments
+    still pending or confirmed: ones nobody completed or cancelled.
+    """
+    statuses = len(STATUSES)
+    count = len(history.stylist_ids)
+    totals = np.bincount(history.status, minlength=statuses)
+    by_stylist = np.bincount(history.stylist * statuses + history.status,
+                             minlength=count * statuses).reshape(count, statuses)
+    unresolved = (history.start < np.datetime64(now, 'm')) & np.isin(
+        history.status, [STATUSES.index(AppointmentStatus.PENDING), STATUSES.index(AppointmentStatus.CONFIRMED)]
+    )
+    unresolved_by_stylist = np.bincount(history.stylist[unresolved], minlength=count)
+
+    def summary(counts: np.ndarray, unresolved_count: int) -> dict:
+        total = int(counts.sum())
+        return {
+            'total': total,
+            'counts': {status.value: int(n) for status, n in zip(STATUSES, counts)},
+            'rates': {status.value: round(n / total, 4) if total else 0.0 for status, n in zip(STATUSES, counts)},
+            'unresolved': int(unresolved_count),
+            'unresolved_rate': round(unresolved_count / total, 4) if total else 0.0
+        }
+
+    return {
+        'start': history.first_day.isoformat(),
+        'end': history.last_day.isoformat(),
+        **summary(totals, int(unresolved.sum())),
+        'stylists': [
+            dict(stylist=history.stylist_names[i], **summary(by_stylist[i], unresolved_by_stylist[i]))
+            for i in np.flatnonzero(by_stylist.sum(axis=1))
+        ]
+    }
+
+
+def _periods(days: np.ndarray, interval: str) -> np.ndarray:
+    """The first day of the day, Monday-based week or month each day falls in."""
+    if interval == 'day':
+        return days
+    if interval == 'week':
+        return days - _weekday(days).astype('timedelta64[D]')
+    if interval == 'month':
+        return days.astype('datetime64[M]').astype('datetime64[D]')
+    raise ValueError(f"Unknown interval: {interval}")
+
+
+def revenue_by_service(history: History, interval: str = 'month') -> dict:
+    """Booked revenue and appointment counts per service, per day, week or month.
+
+    Revenue uses each service's current price, as the dashboard does.
+    """
+    booked = _booked(history)
+    service = history.service[booked]
+    labels, period = np.unique(_periods(history.start[booked].astype('datetime64[D]'), interval),
+                               return_inverse=True)
+    period = period.reshape(-1)
+    cells = len(history.service_names) * len(labels)
+    combined = service * len(labels) + period
+    revenue = np.bincount(combined, weights=history.prices[service], minlength=cells).reshape(-1, len(labels))
+    counts = np.bincount(combined, minlength=cells).reshape(-1, len(labels))
+
+    return {
+        'start': history.first_day.isoformat(),
+        'end': history.last_day.isoformat(),
+        'interval': interval,
+        'periods': [str(label) for label in labels],
+        'total': round(float(revenue.sum()), 2),
+        'services': [
+            {
+                'service': history.service_names[i],
+                'appointments': int(counts[i].sum()),
+                'revenue': round(float(revenue[i].sum()), 2),
+                'by_period': [round(float(value), 2) for value in revenue[i]]
+            }
+            for i in np.flatnonzero(counts.sum(axis=1))
+        ]
+    }
@@ -0,0 +1,184 @@
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from config import (
+    SERVICES,
+    STYLISTS,
+    BUFFER_BETWEEN_APPOINTMENTS
+)
+from availability import ScheduleBitmap
+
+Placement = Tuple[datetime, str]
+
+
+class BookingRequest(NamedTuple):
+    """One client's ask: a service at a time, optionally with a named stylist."""
+    service: str
+    requested: datetime
+    stylist: Optional[str] = None
+
+
+class _Option(NamedTuple):
+    cost: int  # Minutes away from the requested time
+    start: datetime
+    end: datetime
+    stylist: str
+    clear_until: datetime  # End plus the buffer: nothing else may start before it
+
+
+class BatchAssigner:
+    """Place a batch of competing requests on a schedule together.
+
+    Booking requests one at a time hands each the first stylist free at its
+    time, which can take the only stylist a later request could have used.
+    This assigner instead collects every (stylist, start) option within
+    `tolerance` of each request from the ScheduleBitmap, places the most
+    constrained requests first on their closest option, then improves the
+    result by local search: a request left out, or placed away from its
+    time, may take a better option if that displaces at most one other
+    request which can move to an option of its own. A move is kept only if
+    it books more requests, or as many with fewer total minutes moved.
+    """
+
+    def __init__(self, schedule: ScheduleBitmap, services: Dict[str, dict] = SERVICES,
+                 stylists: Dict[str, dict] = STYLISTS, tolerance: timedelta = timedelta(0),
+                 earliest: Optional[datetime] = None, latest: Optional[datetime] = None,
+                 daily_limit: Optional[int] = None, buffer_minutes: int = BUFFER_BETWEEN_APPOINTMENTS,
+                 max_passes: int = 3):
+        self.schedule = schedule
+        self.services = services
+        self.stylists = stylists
+        self.tolerance = tolerance
+        self.earliest = earliest
+        self.latest = latest
+        self.daily_limit = daily_limit
+        self.buffer = timedelta(minutes=buffer_minutes)
+        self.max_passes = max_passes
+        # Generalists are a scarce resource, so on a tie the specialist takes the slot
+        self._rank = {
+            key: (len(info['specialties']), position)
+            for position, (key, info) in enumerate(stylists.items())
+        }
+        self._eligible = {
+            service: [key for key, info in stylists.items() if service in info['specialties']]
+            for service in services
+        }
+
+    def _options(self, request: BookingRequest) -> List[_Option]:
+        """Every free (stylist, start) for a request within tolerance, closest first."""
+        service = self.services.get(request.service)
+        if service is None:
+            return []
+        candidates = self._eligible[request.service]
+        if request.stylist:
+            candidates = [request.stylist] if request.stylist in candidates else []
+
+        duration = timedelta(minutes=service['duration'])
+        earliest, latest = request.requested - self.tolerance, request.requested + self.tolerance
+        if self.earliest is not None:
+            earliest = max(earliest, self.earliest)
+        if self.latest is not None:
+            latest = min(latest, self.latest)
+        if earliest > latest:
+            return []
+
+        options = [
+            _Option(int(abs(start - request.requested) / timedelta(minutes=1)), start, start + duration, key,
+                    start + duration + self.buffer)
+            for start, keys in self.schedule.slots(candidates, duration, earliest=earliest, latest=latest,
+                                                   daily_limit=self.daily_limit)
+            for key in keys
+        ]
+        options.sort(key=lambda option: (option.cost, self._rank[option.stylist], option.start))
+        return options
+
+    def solve(self, requests: List[BookingRequest]) -> List[Optional[Placement]]:
+        """Return a (start, stylist) per request, or None for requests that could not be placed."""
+        options = [self._options(request) for request in requests]
+        placed: List[Optional[_Option]] = [None] * len(requests)
+        # Batch placements per stylist-day, checked against each other with the buffer
+        booked: Dict[Tuple[str, object], Set[int]] = defaultdict(set)
+        day_counts: Counter = Counter()
+
+        def blockers(option: _Option) -> Set[int]:
+            return {
+                other for other in booked[option.stylist, option.start.date()]
+                if option.start < placed[other].clear_until and placed[other].start < option.clear_until
+            }
+
+        def day_has_room(option: _Option) -> bool:
+            if self.daily_limit is None:
+                return True
+            day = option.start.date()
+            return self.schedule.daily_count(day) + day_counts[day] < self.daily_limit
+
+        def place(index: int, option: _Option):
+            placed[index] = option
+            booked[option.stylist, option.start.date()].add(index)
+            day_counts[option.start.date()] += 1
+
+        def unplace(index: int) -> _Option:
+            option = placed[index]
+            placed[index] = None
+            booked[option.stylist, option.start.date()].discard(index)
+            day_counts[option.start.date()] -= 1
+            return option
+
+        def best_free(index: int, limit: Optional[int] = None) -> Optional[_Option]:
+            for option in options[index]:
+                if limit is not None and option.cost >= limit:
+                    return None
+                if day_has_room(option) and not blockers(option):
+                    return option
+            return None
+
+        # Greedy: fewest options first, each on its closest free option
+        for index in sorted(range(len(requests)), key=lambda i: (len(options[i]), i)):
+            option = best_free(index)
+            if option is not None:
+                place(index, option)
+
+        # Local search: single moves and one-for-one displacements
+        for _ in range(self.max_passes):
+            improved = False
+            for index in range(len(requests)):
+                current = placed[index]
+                if current is not None and current.cost == 0:
+                    continue
+                if current is not None:
+                    unplace(index)
+                limit = current.cost if current is not None else None
+                moved = False
+                for option in options[index]:
+                    if limit is not None and option.cost >= limit:
+                        break
+                    if not day_has_room(option):
+                        continue
+                    blocking = blockers(option)
+                    if not blocking:
+                        place(index, option)
+                        moved = True
+                        break
+                    if len(blocking) != 1:
+                        continue
+                    other = blocking.pop()
+                    displaced = unplace(other)
+                    place(index, option)
+                    # Worth it only if the displaced request still fits and, when this
+                    # request was already placed, the two together move less than before
+                    budget = None if limit is None else limit + displaced.cost - option.cost
+                    relocated = best_free(other, budget)
+                    if relocated is not None:
+                        place(other, relocated)
+                        moved = True
+                        break
+                    unplace(index)
+                    place(other, displaced)
+                if not moved and current is not None:
+                    place(index, current)
+                improved |= moved
+            if not improved:
+                break
+
+        return [(option.start, option.stylist) if option is not None else None for option in placed]
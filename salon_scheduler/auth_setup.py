@@ -4,6 +4,8 @@ from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 import json
 
+from config import GOOGLE_TOKEN_PATH
+
 # If modifying these scopes, delete the file token.json.
 SCOPES = [
     'https://www.googleapis.com/auth/gmail.modify',
@@ -16,8 +18,9 @@ def setup_credentials():
     
     # The file token.json stores the user's access and refresh tokens, and is
     # created automatically when the authorization flow completes for the first time.
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
+    # The daemon reads it from GOOGLE_TOKEN_PATH and keeps it refreshed from then on.
+    if os.path.exists(GOOGLE_TOKEN_PATH):
+        creds = Credentials.from_authorized_user_file(GOOGLE_TOKEN_PATH, SCOPES)
     
     # If there are no (valid) credentials available, let the user log in.
     if not creds or not creds.valid:
@@ -42,10 +45,10 @@ def setup_credentials():
             creds = flow.run_local_server(port=0)
         
         # Save the credentials for the next run
-        with open('token.json', 'w') as token:
+        with open(GOOGLE_TOKEN_PATH, 'w') as token:
             token.write(creds.to_json())
         
-        print("Authentication successful! Credentials saved to 'token.json'")
+        print(f"Authentication successful! Credentials saved to '{GOOGLE_TOKEN_PATH}'")
         return True
 
     print("Existing credentials are valid.")
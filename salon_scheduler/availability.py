@@ -0,0 +1,166 @@
+import sys
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from config import (
+    BUFFER_BETWEEN_APPOINTMENTS,
+    SLOT_INTERVAL
+)
+
+Interval = Tuple[datetime, datetime]
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def business_windows(schedule: Dict[str, Optional[dict]], first_day: date, days: int,
+                     holidays: Set[date] = frozenset()) -> List[Interval]:
+    """Return the ordered opening windows for a weekly schedule over a range of days."""
+    windows = []
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        if day in holidays:
+            continue
+        hours = schedule.get(WEEKDAYS[day.weekday()])
+        if not hours:
+            continue
+        windows.append((
+            datetime.combine(day, hours['start']),
+            datetime.combine(day, hours['end'])
+        ))
+    return windows
+
+
+def run_starts(mask: int, length: int) -> int:
+    """Return the bits of mask that start a run of `length` consecutive set bits."""
+    span = 1
+    while span < length and mask:
+        shift = min(span, length - span)
+        mask &= mask >> shift
+        span += shift
+    return mask
+
+
+class ScheduleBitmap:
+    """Free SLOT_INTERVAL cells for every stylist and day in a date range.
+
+    Each stylist-day is one int bitset on a grid anchored at midnight: bit i
+    is set when the cell starting i slots after midnight lies inside the
+    stylist's opening hours and clear of every booking padded by the buffer.
+    A service fits wherever enough consecutive bits are set, which a few
+    shifts and ANDs find for a whole day at once, and because stylists share
+    the grid, OR-ing their masks answers a multi-stylist query. Cells only
+    partly covered by opening hours count as closed and cells partly covered
+    by a booking count as busy, so off-grid times are never double-booked.
+    """
+
+    def __init__(self, schedules: Dict[str, Dict[str, Optional[dict]]], first_day: date, days: int,
+                 holidays: Set[date] = frozenset(), buffer_minutes: int = BUFFER_BETWEEN_APPOINTMENTS,
+                 slot_interval: int = SLOT_INTERVAL):
+        self.first_day = first_day
+        self.days = days
+        self.origin = datetime.combine(first_day, datetime.min.time())
+        self.step = timedelta(minutes=slot_interval)
+        self.buffer = timedelta(minutes=buffer_minutes)
+        self.cells_per_day = -(-24 * 60 // slot_interval)
+        self.daily_counts = [0] * days
+        self.free: Dict[str, List[int]] = {
+            key: [self._open_cells(schedule, first_day + timedelta(days=d), holidays) for d in range(days)]
+            for key, schedule in schedules.items()
+        }
+
+    def _floor_cell(self, when: datetime) -> int:
+        return (when - self.origin) // self.step
+
+    def _ceil_cell(self, when: datetime) -> int:
+        return -((self.origin - when) // self.step)
+
+    def _open_cells(self, schedule: Dict[str, Optional[dict]], day: date, holidays: Set[date]) -> int:
+        hours = schedule.get(WEEKDAYS[day.weekday()])
+        if not hours or day in holidays:
+            return 0
+        offset = (day - self.first_day).days * self.cells_per_day
+        first = self._ceil_cell(datetime.combine(day, hours['start'])) - offset
+        last = self._floor_cell(datetime.combine(day, hours['end'])) - offset
+        return ((1 << (last - first)) - 1) << first if last > first else 0
+
+    def _day_spans(self, first: int, last: int) -> Iterator[Tuple[int, int]]:
+        """Split the cell range [first, last) into (day offset, day mask) pieces."""
+        first, last = max(first, 0), min(last, self.days * self.cells_per_day)
+        while first < last:
+            day, lo = divmod(first, self.cells_per_day)
+            hi = min(last - day * self.cells_per_day, self.cells_per_day)
+            yield day, ((1 << (hi - lo)) - 1) << lo
+            first = (day + 1) * self.cells_per_day
+
+    def mark_busy(self, stylist: str, start: datetime, end: datetime):
+        """Clear every cell the interval touches once padded by the buffer."""
+        cells = self.free.get(stylist)
+        if cells is None:
+            return
+        for day, mask in self._day_spans(self._floor_cell(start - self.buffer), self._ceil_cell(end + self.buffer)):
+            cells[day] &= ~mask
+
+    def add_appointment(self, stylist: Optional[str], start: datetime, end: datetime):
+        """Mark a booking busy and count it against its day."""
+        day = (start.date() - self.first_day).days
+        if 0 <= day < self.days:
+            self.daily_counts[day] += 1
+        if stylist is not None:
+            self.mark_busy(stylist, start, end)
+
+    def daily_count(self, day: date) -> int:
+        offset = (day - self.first_day).days
+        return self.daily_counts[offset] if 0 <= offset < self.days else 0
+
+    def is_free(self, stylist: str, start: datetime, end: datetime) -> bool:
+        """Check whether every cell [start, end) touches is open and free."""
+        cells = self.free.get(stylist)
+        if cells is None:
+            return False
+        first, last = self._floor_cell(start), self._ceil_cell(end)
+        if first < 0 or last > self.days * self.cells_per_day:
+            return False
+        return all(cells[day] & mask == mask for day, mask in self._day_spans(first, last))
+
+    def slots(self, stylists: Iterable[str], duration: timedelta, earliest: Optional[datetime] = None,
+              latest: Optional[datetime] = None, daily_limit: Optional[int] = None) -> List[Tuple[datetime, List[str]]]:
+        """Return (start time, [stylist keys]) for every grid slot where the duration fits.
+
+        Days that already have `daily_limit` bookings are skipped; slots start
+        no earlier than `earliest` and no later than `latest`.
+        """
+        length = max(1, -(-duration // self.step))
+        lowest = self._ceil_cell(earliest) if earliest is not None else 0
+        highest = self._floor_cell(latest) if latest is not None else self.days * self.cells_per_day
+        stylists = [key for key in stylists if key in self.free]
+
+        available = []
+        first_day = max(lowest // self.cells_per_day, 0)
+        last_day = min(highest // self.cells_per_day + 1, self.days)
+        for day in range(first_day, last_day):
+            if daily_limit is not None and self.daily_counts[day] >= daily_limit:
+                continue
+            offset = day * self.cells_per_day
+            starts = [(key, run_starts(self.free[key][day], length)) for key in stylists]
+            union = 0
+            for _, mask in starts:
+                union |= mask
+            if lowest > offset:
+                union &= ~((1 << (lowest - offset)) - 1)
+            if highest < offset + self.cells_per_day:
+                union &= (1 << max(highest - offset + 1, 0)) - 1
+
+            day_start = self.origin + timedelta(days=day)
+            while union:
+                low = union & -union
+                available.append((
+                    day_start + (low.bit_length() - 1) * self.step,
+                    [key for key, mask in starts if mask & low]
+                ))
+                union ^= low
+        return available
+
+    def memory_bytes(self) -> int:
+        """Approximate size of the bitsets and counters."""
+        return sum(sys.getsizeof(mask) for cells in self.free.values() for mask in cells) + \
+            sys.getsizeof(self.daily_counts)
@@ -0,0 +1,7 @@
+"""Performance benchmarks for the salon scheduler.
+
+Run from the salon_scheduler directory, e.g. `python -m benchmarks.bench_availability`.
+
+`python -m benchmarks.suite` runs the standard cases against data from
+benchmarks.generate and writes the results as JSON for comparing runs.
+"""
@@ -0,0 +1,158 @@
+"""Concurrent load test for the admin app's database layer.
+
+Serves an app from admin.create_app on a threaded WSGI server and hammers
+/api/available-slots and / with many client threads while a few others
+book appointments. Runs twice against copies of the same seeded database:
+once with a default SQLAlchemy engine (rollback journal, stock pool) and
+once with db.create_db_engine (WAL, busy timeout, tuned pool). Reports
+throughput, latency and any "database is locked" failures.
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from werkzeug.serving import make_server
+
+from admin import create_app
+from config import SERVICES, STYLISTS
+from db import create_db_engine
+from models import init_db
+from scheduler import Scheduler
+from stats import dashboard_cache
+from benchmarks.bench_availability import seed
+from benchmarks.common import percentiles
+
+
+def seeded_database(appointments: int) -> str:
+    """Build a database file with a plain engine, so it starts in rollback-journal mode."""
+    path = os.path.join(tempfile.mkdtemp(prefix='salon-load-'), 'base.db')
+    engine = create_engine(f'sqlite:///{path}')
+    init_db(engine)
+    seed(sessionmaker(bind=engine), Scheduler(sessionmaker(bind=engine)), appointments, datetime.now())
+    engine.dispose()
+    return path
+
+
+def request(port: int, method: str, path: str, body: dict = None):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        payload = json.dumps(body) if body is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        connection.request(method, path, payload, headers)
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def run_load(engine, clients: int, writers: int, requests_per_client: int, seed_value: int) -> dict:
+    app = create_app(session_factory=sessionmaker(bind=engine))
+    dashboard_cache.invalidate()
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    outcomes = Counter()
+    latencies = []
+    lock = threading.Lock()
+    days = [(datetime.now() + timedelta(days=d)).strftime('%Y-%m-%d') for d in range(2, 20)]
+
+    def client(n: int):
+        rng = random.Random(seed_value + n)
+        writer = n < writers
+        for i in range(requests_per_client):
+            if writer:
+                stylist = rng.choice(list(STYLISTS))
+                start = datetime.strptime(rng.choice(days), '%Y-%m-%d').replace(
+                    hour=rng.randint(9, 16), minute=rng.choice([0, 15, 30, 45])
+                )
+                args = ('POST', '/api/schedule-appointment', {
+                    'client_name': f'Load {n}', 'client_email': f'load{n}@example.com',
+                    'service': rng.choice(STYLISTS[stylist]['specialties']),
+                    'datetime': start.isoformat(), 'stylist_id': stylist
+                })
+            elif i % 4 == 0:
+                args = ('GET', '/', None)
+            else:
+                args = ('POST', '/api/available-slots', {
+                    'service': rng.choice(list(SERVICES)), 'date': rng.choice(days), 'days': 3
+                })
+            started = time.perf_counter()
+            status, body = request(port, *args)
+            elapsed = time.perf_counter() - started
+            if b'database is locked' in body:
+                outcome = 'locked'
+            elif status >= 500:
+                outcome = 'server_error'
+            elif writer:
+                outcome = 'booked' if status == 200 else 'rejected'
+            else:
+                outcome = 'ok' if status == 200 else 'client_error'
+            with lock:
+                outcomes[outcome] += 1
+                if not writer:
+                    latencies.append(elapsed)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+    engine.dispose()
+
+    reads = len(latencies)
+    return {
+        'seconds': elapsed,
+        'reads_per_second': reads / elapsed,
+        'outcomes': dict(outcomes),
+        'latency': percentiles(latencies)
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--appointments', type=int, default=20000)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--writers', type=int, default=4, help='clients that book instead of reading')
+    parser.add_argument('--requests', type=int, default=60, help='requests per client')
+    args = parser.parse_args()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    base = seeded_database(args.appointments)
+    tuned_copy = base.replace('base.db', 'tuned.db')
+    shutil.copy(base, tuned_copy)
+
+    results = {
+        'default engine': run_load(create_engine(f'sqlite:///{base}'), args.clients, args.writers, args.requests, 1),
+        'db.create_db_engine': run_load(create_db_engine(f'sqlite:///{tuned_copy}'), args.clients, args.writers,
+                                        args.requests, 1)
+    }
+    for label, result in results.items():
+        latency = result['latency']
+        print(f"{label}: {result['reads_per_second']:.0f} reads/s over {result['seconds']:.1f}s, "
+              f"p50 {latency['p50_ms']:.1f} ms, p99 {latency['p99_ms']:.1f} ms")
+        print('  ' + ', '.join(f'{k}={v}' for k, v in sorted(result['outcomes'].items())))
+
+    tuned = results['db.create_db_engine']['outcomes']
+    ok = tuned.get('locked', 0) == 0 and tuned.get('server_error', 0) == 0
+    print('PASS: no lock errors with the tuned engine' if ok else 'FAIL')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""Analytics endpoint latency over years of history.
+
+Generates 5 years of history for 50 stylists (about 280,000 appointments at
+the default 200 bookings a day), then times loading the column arrays on
+their own and each /api/analytics endpoint through the test client, for
+ranges from the last 30 days to the whole history. Cold requests load the
+range; warm ones find it in the history cache, as the second and third
+view of a range on one dashboard do. Loading is row-bound (one driver
+tuple per appointment) and the NumPy aggregates are a small part of a
+cold request, so cold latency grows with the appointments in the range,
+not with the stylists or hours reported. Reuse a database written by
+benchmarks.generate with --database.
+"""
+import argparse
+from datetime import date, timedelta
+
+from sqlalchemy.orm import sessionmaker
+
+from db import create_db_engine
+from scheduler import Scheduler
+from analytics import history_cache, load_history
+from benchmarks.common import measure, report, temp_session_factory
+from benchmarks.generate import generate
+
+RANGES = {'30d': 30, '90d': 90, '1y': 365, '5y': 5 * 365}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--stylists', type=int, default=50)
+    parser.add_argument('--years', type=float, default=5)
+    parser.add_argument('--bookings-per-day', type=int, default=200)
+    parser.add_argument('--database', default=None, help='existing SQLite file to read instead of generating one')
+    parser.add_argument('--ranges', default=','.join(RANGES), help='comma-separated, from ' + ', '.join(RANGES))
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    if args.database:
+        Session = sessionmaker(bind=create_db_engine(f'sqlite:///{args.database}'))
+    else:
+        Session, path = temp_session_factory()
+        counts = generate(Session, args.stylists, args.years, args.bookings_per_day)
+        print(f"Generated {counts['appointments']} appointments into {path}")
+    scheduler = Scheduler(Session)
+
+    from admin import create_app
+    client = create_app(session_factory=Session, scheduler=scheduler).test_client()
+    last_day = date.today()
+    for name in args.ranges.split(','):
+        first_day = last_day - timedelta(days=RANGES[name] - 1)
+        query = f'start={first_day.isoformat()}&end={last_day.isoformat()}'
+        rows = len(load_history(Session, first_day, last_day).start)
+        print(f'{name}: {rows} appointments')
+        report(f'{name} load_history', measure(lambda: load_history(Session, first_day, last_day), runs=args.runs))
+        for endpoint in ('utilization', 'statuses', 'revenue?interval=week'):
+            url = f'/api/analytics/{endpoint}{"&" if "?" in endpoint else "?"}{query}'
+            response = client.get(url)
+            assert response.status_code == 200, response.get_json()
+            label = f'{name} GET /api/analytics/{endpoint.split("?")[0]}'
+            report(f'{label} (cold)', measure(lambda: (history_cache.invalidate(), client.get(url)),
+                                              runs=args.runs, warmup=1))
+            report(f'{label} (warm)', measure(lambda: client.get(url), runs=args.runs, warmup=1))
+
+
+if __name__ == '__main__':
+    main()
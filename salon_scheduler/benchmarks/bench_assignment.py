@@ -0,0 +1,169 @@
+"""Batch assignment versus one-by-one booking for a poll's worth of competing requests.
+
+Builds a salon of synthetic stylists with random specialties and a partly
+booked week, then places growing batches of requests bunched around peak
+hours. Reports, for each batch size, the solver's runtime and how many
+requests each strategy books: the daemon's old one-by-one path (exact time,
+first free stylist), one-by-one taking the nearest free time within the
+tolerance, and BatchAssigner with and without a tolerance. Every placement
+is replayed on a fresh bitmap to check nothing overlaps.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from assignment import BatchAssigner, BookingRequest, Placement
+from availability import ScheduleBitmap
+from config import BUSINESS_HOURS, SERVICES
+
+
+def salon(stylists: int, rng: random.Random) -> dict:
+    services = list(SERVICES)
+    return {
+        f'stylist{n:02d}': {
+            'name': f'Stylist {n}',
+            'specialties': rng.sample(services, rng.choice([1, 1, 2, 2, 3])),
+            'schedule': BUSINESS_HOURS
+        }
+        for n in range(stylists)
+    }
+
+
+def existing_bookings(stylists: dict, first_day: datetime, days: int, per_stylist_day: int,
+                      rng: random.Random):
+    rows = []
+    for key in stylists:
+        for day in range(days):
+            for _ in range(per_stylist_day):
+                start = first_day + timedelta(days=day, hours=9, minutes=15 * rng.randrange(28))
+                rows.append((key, start, start + timedelta(minutes=rng.choice([45, 60]))))
+    return rows
+
+
+def requests_for(count: int, stylists: dict, first_day: datetime, days: int, rng: random.Random):
+    """Requests bunched late morning and after work, a fifth naming a stylist."""
+    hours = [9, 10, 10, 11, 11, 11, 12, 13, 14, 15, 15, 16, 16, 16]
+    asks = []
+    for _ in range(count):
+        service = rng.choice(list(SERVICES))
+        start = first_day + timedelta(days=rng.randrange(days), hours=rng.choice(hours),
+                                      minutes=15 * rng.randrange(4))
+        named = None
+        if rng.random() < 0.2:
+            named = rng.choice([key for key, info in stylists.items() if service in info['specialties']])
+        asks.append(BookingRequest(service, start, named))
+    return asks
+
+
+def one_by_one(bitmap: ScheduleBitmap, stylists: dict, asks: List[BookingRequest], tolerance: timedelta,
+               daily_limit: Optional[int]) -> List[Optional[Placement]]:
+    """Book in arrival order, each request taking the nearest free time as it comes."""
+    placements = []
+    for ask in asks:
+        assigner = BatchAssigner(bitmap, stylists=stylists, tolerance=tolerance, daily_limit=daily_limit)
+        option = next(iter(assigner._options(ask)), None)
+        placements.append((option.start, option.stylist) if option else None)
+        if option:
+            bitmap.add_appointment(option.stylist, option.start, option.end)
+    return placements
+
+
+def first_free_stylist(bitmap: ScheduleBitmap, stylists: dict, asks: List[BookingRequest],
+                       daily_limit: Optional[int]) -> List[Optional[Placement]]:
+    """What the daemon did per email: the exact time with the first stylist free at it."""
+    placements = []
+    for ask in asks:
+        end = ask.requested + timedelta(minutes=SERVICES[ask.service]['duration'])
+        stylist = None
+        if daily_limit is None or bitmap.daily_count(ask.requested.date()) < daily_limit:
+            stylist = next((
+                key for key, info in stylists.items()
+                if ask.service in info['specialties'] and (not ask.stylist or key == ask.stylist)
+                and bitmap.is_free(key, ask.requested, end)
+            ), None)
+        placements.append((ask.requested, stylist) if stylist else None)
+        if stylist:
+            bitmap.add_appointment(stylist, ask.requested, end)
+    return placements
+
+
+def summarize(asks: List[BookingRequest], placements: List[Optional[Placement]], build) -> dict:
+    """Hit rates, minutes moved and a replay check for overlaps."""
+    replay = build()
+    overlaps = 0
+    booked = exact = moved = 0
+    for ask, placement in zip(asks, placements):
+        if placement is None:
+            continue
+        start, stylist = placement
+        end = start + timedelta(minutes=SERVICES[ask.service]['duration'])
+        overlaps += not replay.is_free(stylist, start, end)
+        replay.add_appointment(stylist, start, end)
+        booked += 1
+        exact += start == ask.requested
+        moved += abs(start - ask.requested) / timedelta(minutes=1)
+    return {
+        'booked': booked / len(asks),
+        'exact': exact / len(asks),
+        'mean_moved_min': moved / booked if booked else 0.0,
+        'overlaps': overlaps
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--stylists', type=int, default=50)
+    parser.add_argument('--days', type=int, default=5)
+    parser.add_argument('--existing', type=int, default=3, help='bookings already on each stylist-day')
+    parser.add_argument('--sizes', default='50,100,250,500,1000', help='batch sizes to run')
+    parser.add_argument('--tolerance', type=int, default=30, help='minutes a request may move')
+    parser.add_argument('--daily-limit', type=int, default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    stylists = salon(args.stylists, rng)
+    monday = datetime.combine(datetime.now().date(), datetime.min.time())
+    monday += timedelta(days=7 - monday.weekday())
+    rows = existing_bookings(stylists, monday, args.days, args.existing, rng)
+    schedules = {key: info['schedule'] for key, info in stylists.items()}
+
+    def build():
+        bitmap = ScheduleBitmap(schedules, monday.date(), args.days)
+        for stylist, start, end in rows:
+            bitmap.add_appointment(stylist, start, end)
+        return bitmap
+
+    tolerance = timedelta(minutes=args.tolerance)
+    print(f'{args.stylists} stylists, {args.days} days, {len(rows)} existing bookings, '
+          f'tolerance {args.tolerance} min')
+    ok = True
+    for size in [int(n) for n in args.sizes.split(',')]:
+        asks = requests_for(size, stylists, monday, args.days, rng)
+        strategies = {
+            'first free stylist': lambda: first_free_stylist(build(), stylists, asks, args.daily_limit),
+            'one by one, nearest': lambda: one_by_one(build(), stylists, asks, tolerance, args.daily_limit),
+            'batch, exact': lambda: BatchAssigner(build(), stylists=stylists,
+                                                  daily_limit=args.daily_limit).solve(asks),
+            'batch, nearest': lambda: BatchAssigner(build(), stylists=stylists, tolerance=tolerance,
+                                                    daily_limit=args.daily_limit).solve(asks)
+        }
+        print(f'{size} requests:')
+        for label, run in strategies.items():
+            started = time.perf_counter()
+            placements = run()
+            elapsed = time.perf_counter() - started
+            summary = summarize(asks, placements, build)
+            ok &= summary['overlaps'] == 0
+            print(f"  {label:<20} {elapsed * 1000:8.1f} ms  booked {summary['booked']:6.1%}  "
+                  f"exact {summary['exact']:6.1%}  moved {summary['mean_moved_min']:4.1f} min  "
+                  f"overlaps {summary['overlaps']}")
+
+    print('PASS: no overlapping placements' if ok else 'FAIL: overlapping placements')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
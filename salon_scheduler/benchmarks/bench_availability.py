@@ -0,0 +1,82 @@
+"""Latency of Scheduler.find_available_slots against a large appointment table."""
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from config import BUSINESS_HOURS, SERVICES, STYLISTS
+from models import Appointment, AppointmentStatus, Client
+from availability import WEEKDAYS
+from scheduler import Scheduler
+from benchmarks.common import measure, report, temp_session_factory
+
+
+def seed(Session, scheduler: Scheduler, appointments: int, now: datetime, seed_value: int = 42):
+    """Fill the stylists' calendars backwards and forwards from now."""
+    rng = random.Random(seed_value)
+    session = Session()
+    catalog = scheduler.catalog.get()
+    client = Client(name='Bench Client', email='bench@example.com')
+    session.add(client)
+    session.flush()
+
+    rows = []
+    day = (now - timedelta(days=appointments // (3 * len(STYLISTS)))).date()
+    while len(rows) < appointments:
+        hours = BUSINESS_HOURS[WEEKDAYS[day.weekday()]]
+        if hours:
+            for key in STYLISTS:
+                cursor = datetime.combine(day, hours['start'])
+                close = datetime.combine(day, hours['end'])
+                # Leave gaps so the sweep has real work to do
+                for _ in range(3):
+                    service = rng.choice(STYLISTS[key]['specialties'])
+                    cursor += timedelta(minutes=rng.choice([0, 30, 60, 90]))
+                    end = cursor + timedelta(minutes=SERVICES[service]['duration'])
+                    if end > close:
+                        break
+                    rows.append({
+                        'client_id': client.id,
+                        'stylist_id': catalog.stylist_ids[key],
+                        'service_id': catalog.service_ids[service],
+                        'start_time': cursor,
+                        'end_time': end,
+                        'status': AppointmentStatus.CONFIRMED
+                    })
+                    cursor = end + timedelta(minutes=15)
+        day += timedelta(days=1)
+
+    session.bulk_insert_mappings(Appointment, rows[:appointments])
+    session.commit()
+    session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--appointments', type=int, default=10000)
+    parser.add_argument('--runs', type=int, default=200)
+    args = parser.parse_args()
+
+    Session, path = temp_session_factory()
+    scheduler = Scheduler(Session)
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    seed(Session, scheduler, args.appointments, now)
+    print(f'Seeded {args.appointments} appointments into {path}')
+
+    cache = scheduler.slot_cache.entries
+    for service in SERVICES:
+        report(f'{service} 1 day', measure(
+            lambda: (cache.invalidate(), scheduler.find_available_slots(service, now + timedelta(days=2), now=now)),
+            runs=args.runs
+        ))
+        report(f'{service} 30 days', measure(
+            lambda: (cache.invalidate(), scheduler.find_available_slots(service, days=30, now=now)),
+            runs=args.runs
+        ))
+        report(f'{service} 30 days (cached)', measure(
+            lambda: scheduler.find_available_slots(service, days=30, now=now),
+            runs=args.runs
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Cost of ScheduleBitmap queries on their own, without the database round trip.
+
+Builds a 30-day bitmap for every stylist from a dense set of bookings and
+times the bitset search across all stylists, full slot listings (which
+also build one (datetime, stylists) pair per slot), point checks and the
+build itself, and reports the bitmap's memory footprint.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from availability import ScheduleBitmap, run_starts
+from config import HOLIDAYS, SERVICES, SLOT_INTERVAL, STYLISTS
+from catalog import holiday_dates
+from benchmarks.common import measure, report
+
+
+def bookings(first_day: datetime, days: int, per_day: int, rng: random.Random):
+    rows = []
+    for day in range(days):
+        for _ in range(per_day):
+            start = first_day + timedelta(days=day, hours=9, minutes=15 * rng.randrange(32))
+            rows.append((rng.choice(list(STYLISTS)), start, start + timedelta(minutes=rng.choice([45, 60, 120]))))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--per-day', type=int, default=12, help='bookings per day across all stylists')
+    parser.add_argument('--runs', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    first_day = datetime.combine(datetime.now().date(), datetime.min.time())
+    rows = bookings(first_day, args.days, args.per_day, rng)
+    schedules = {key: info['schedule'] for key, info in STYLISTS.items()}
+    holidays = holiday_dates(HOLIDAYS)
+
+    def build():
+        bitmap = ScheduleBitmap(schedules, first_day.date(), args.days, holidays)
+        for stylist, start, end in rows:
+            bitmap.add_appointment(stylist, start, end)
+        return bitmap
+
+    bitmap = build()
+    print(f'{len(STYLISTS)} stylists x {args.days} days, {len(rows)} bookings: '
+          f'{bitmap.memory_bytes() / 1024:.1f} KB')
+    report('build', measure(build, runs=max(args.runs // 10, 10)))
+
+    everyone = list(STYLISTS)
+    earliest = first_day + timedelta(hours=30)
+    for service, info in SERVICES.items():
+        duration = timedelta(minutes=info['duration'])
+        length = -(-info['duration'] // SLOT_INTERVAL)
+
+        def search():
+            # The bit work alone: which cells start a fit, for every stylist-day
+            return [run_starts(cells[day], length) for cells in bitmap.free.values() for day in range(args.days)]
+        report(f'{service} bitset search, {args.days} days x all stylists', measure(search, runs=args.runs))
+        count = len(bitmap.slots(everyone, duration, earliest=earliest, daily_limit=20))
+        report(f'{service} slot list ({count} slots)', measure(
+            lambda: bitmap.slots(everyone, duration, earliest=earliest, daily_limit=20), runs=args.runs
+        ))
+
+    probes = [(rng.choice(everyone), first_day + timedelta(days=rng.randrange(args.days), hours=9,
+                                                          minutes=15 * rng.randrange(32))) for _ in range(1000)]
+    started = time.perf_counter()
+    for stylist, start in probes:
+        bitmap.is_free(stylist, start, start + timedelta(minutes=45))
+    print(f'is_free: {(time.perf_counter() - started) / len(probes) * 1e6:.2f} us per check')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Concurrent booking stress test.
+
+Many threads book random overlapping slots for the same few stylists at
+once. Afterwards the appointments table is checked for overlapping bookings
+(including the buffer between appointments) and for days over the daily
+limit; any overlap or unexpected error fails the run.
+tests/test_booking.py asserts the same on a few heavily contended slots.
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+import scheduler as scheduler_module
+from config import BUFFER_BETWEEN_APPOINTMENTS, SERVICES, STYLISTS
+from availability import business_windows
+from models import init_db
+from scheduler import BookingConflict, Scheduler
+from benchmarks.common import temp_session_factory
+
+OVERLAPS = text("""
+    SELECT COUNT(*) FROM appointments a JOIN appointments b
+      ON a.stylist_id = b.stylist_id AND a.id < b.id
+     AND a.start_time < datetime(b.end_time, :buffer)
+     AND b.start_time < datetime(a.end_time, :buffer)
+     WHERE a.status != 'CANCELLED' AND b.status != 'CANCELLED'
+""")
+BUSIEST_DAY = text("""
+    SELECT COALESCE(MAX(n), 0) FROM (
+        SELECT COUNT(*) AS n FROM appointments WHERE status != 'CANCELLED' GROUP BY date(start_time)
+    )
+""")
+
+
+class CountingScheduler(Scheduler):
+    """Scheduler that counts optimistic retries."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def _book(self, *args, **kwargs):
+        try:
+            return super()._book(*args, **kwargs)
+        except BookingConflict:
+            with self._lock:
+                self.retries += 1
+            raise
+
+
+def candidate_requests(days: int, first_day: datetime):
+    """Every (stylist, service, start) that fits inside business hours."""
+    candidates = []
+    for key, info in STYLISTS.items():
+        for start, end in business_windows(info['schedule'], first_day.date(), days, set()):
+            slot = start
+            while slot < end:
+                for service in info['specialties']:
+                    if slot + timedelta(minutes=SERVICES[service]['duration']) <= end:
+                        candidates.append((key, service, slot))
+                slot += timedelta(minutes=15)
+    return candidates
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--attempts', type=int, default=4000)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--days', type=int, default=20, help='days the requests are spread over')
+    parser.add_argument('--daily-limit', type=int, default=1000,
+                        help='MAX_DAILY_APPOINTMENTS for the run; the default keeps it out of the way')
+    args = parser.parse_args()
+
+    scheduler_module.MAX_DAILY_APPOINTMENTS = args.daily_limit
+    Session, _ = temp_session_factory()
+    init_db(Session.kw['bind'])
+    scheduler = CountingScheduler(Session)
+
+    first_day = datetime.combine(datetime.now().date() + timedelta(days=3), datetime.min.time())
+    candidates = candidate_requests(args.days, first_day)
+    rng = random.Random(17)
+    requests = [rng.choice(candidates) for _ in range(args.attempts)]
+    outcomes = {'booked': 0, 'unavailable': 0, 'conflict': 0, 'error': 0}
+    lock = threading.Lock()
+
+    def attempt(n_request):
+        n, (stylist, service, start) = n_request
+        try:
+            scheduler.schedule_appointment(
+                f'Client {n % 500}', service, start, stylist, client_email=f'client{n % 500}@example.com'
+            )
+            outcome = 'booked'
+        except BookingConflict:
+            outcome = 'conflict'
+        except ValueError:
+            outcome = 'unavailable'
+        except Exception as e:
+            print(f"Error booking: {str(e)}")
+            outcome = 'error'
+        with lock:
+            outcomes[outcome] += 1
+
+    scheduler.catalog.get()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as pool:
+        list(pool.map(attempt, enumerate(requests)))
+    elapsed = time.perf_counter() - started
+
+    with Session.kw['bind'].connect() as connection:
+        overlaps = connection.execute(OVERLAPS, {'buffer': f'+{BUFFER_BETWEEN_APPOINTMENTS} minutes'}).scalar()
+        busiest_day = connection.execute(BUSIEST_DAY).scalar()
+
+    print(f"{args.attempts} attempts from {args.threads} threads over {len(candidates)} candidate slots "
+          f"in {elapsed:.2f}s")
+    print('  ' + ', '.join(f'{k}={v}' for k, v in outcomes.items()) + f', optimistic retries={scheduler.retries}')
+    print(f"  {outcomes['booked'] / elapsed:.0f} bookings/s, {args.attempts / elapsed:.0f} attempts/s")
+    print(f"  overlapping bookings: {overlaps}, busiest day: {busiest_day} (limit {args.daily_limit})")
+    ok = overlaps == 0 and outcomes['error'] == 0 and busiest_day <= args.daily_limit
+    print('PASS' if ok else 'FAIL')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
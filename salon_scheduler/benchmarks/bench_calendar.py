@@ -0,0 +1,129 @@
+"""Availability latency with the local calendar mirror versus per-request Calendar API calls.
+
+Also reports the cost of pushing bookings to the calendar in batches and of
+incremental syncs compared with full listings, and checks that calendar
+blocks, cancellations and expired sync tokens are handled.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from calendar_manager import CalendarManager
+from config import SERVICES, STYLISTS
+from models import Appointment, AppointmentStatus, CalendarEvent, init_db
+from scheduler import Scheduler
+from sync_state import SyncStateStore
+from benchmarks.bench_availability import seed
+from benchmarks.common import measure, report, temp_session_factory
+from benchmarks.fake_calendar import FakeCalendarService
+
+
+def timed(label: str, calendar: FakeCalendarService, fn):
+    """Run fn once and print its wall time and API round trips."""
+    before = calendar.round_trips
+    started = time.perf_counter()
+    result = fn()
+    print(f'{label}: {(time.perf_counter() - started) * 1000:.0f} ms, '
+          f'{calendar.round_trips - before} round trips -> {result}')
+    return result
+
+
+def api_events(calendar: FakeCalendarService, start: datetime, end: datetime):
+    """What an availability check costs when it asks the Calendar API every time."""
+    events, page_token = [], None
+    while True:
+        results = calendar.events().list(
+            calendarId='primary', singleEvents=True, timeMin=start.isoformat(), timeMax=end.isoformat(),
+            maxResults=250, pageToken=page_token
+        ).execute()
+        events.extend(results.get('items', []))
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            return events
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--appointments', type=int, default=4000)
+    parser.add_argument('--blocks', type=int, default=300, help='events staff create directly in the calendar')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='per Calendar API round trip')
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(23)
+    Session, _ = temp_session_factory()
+    init_db(Session.kw['bind'])
+    scheduler = Scheduler(Session)
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    seed(Session, scheduler, args.appointments, now)
+
+    fake = FakeCalendarService(latency=args.latency_ms / 1000)
+    calendar = CalendarManager(Session, service=fake, state_store=SyncStateStore(Session))
+
+    timed('flush bookings (batched)', fake, calendar.flush)
+    for _ in range(args.blocks):
+        start = now + timedelta(days=rng.randint(0, 30), hours=rng.randint(-3, 3))
+        key = rng.choice([None] + list(STYLISTS))
+        fake.add_block(start, start + timedelta(minutes=rng.choice([30, 60, 120])), 'Staff block',
+                       attendee=f'{key}@salon.local' if key else None)
+    timed('initial full sync', fake, calendar.sync)
+
+    # Availability: local mirror vs. asking the API on every request
+    day = now + timedelta(days=3)
+    service = next(iter(SERVICES))
+    report('mirror availability (1 day)', measure(
+        lambda: scheduler.find_available_slots(service, day, now=now), runs=args.runs
+    ))
+    window_start = datetime.combine(day.date(), datetime.min.time())
+    report('API availability (1 day)', measure(
+        lambda: (api_events(fake, window_start, window_start + timedelta(days=1)),
+                 scheduler.find_available_slots(service, day, now=now)),
+        runs=args.runs
+    ))
+
+    # Incremental vs. full sync after a handful of changes
+    blocks = [event_id for event_id in fake.events_by_id if event_id.startswith('blk')]
+    for event_id in blocks[:10]:
+        start = now + timedelta(days=rng.randint(1, 30), hours=2)
+        fake.move(event_id, start, start + timedelta(hours=1))
+    for event_id in blocks[10:20]:
+        fake.remove(event_id)
+    timed('incremental sync (20 changes)', fake, calendar.sync)
+    fake.expire_sync_tokens()
+    timed('full sync after token expiry', fake, calendar.sync)
+
+    # Correctness checks
+    checks = {}
+    slots = scheduler.find_available_slots(service, day, now=now)
+    slot, stylists = slots[0]
+    fake.add_block(slot, slot + timedelta(minutes=30), 'Dentist', attendee=f'{stylists[0]}@salon.local')
+    calendar.sync()
+    after = dict(scheduler.find_available_slots(service, day, now=now))
+    checks['calendar block hides slot'] = stylists[0] not in after.get(slot, [])
+
+    session = Session()
+    target = session.query(Appointment).filter(
+        Appointment.status == AppointmentStatus.CONFIRMED,
+        Appointment.start_time > now + timedelta(days=2)
+    ).first()
+    event_id = target.event_id
+    session.close()
+    scheduler.cancel_appointment(event_id)
+    timed('flush cancellation', fake, calendar.flush)
+    checks['cancellation deletes event'] = fake.events_by_id[event_id]['status'] == 'cancelled'
+
+    calendar.sync()
+    session = Session()
+    mirrored = session.query(CalendarEvent).count()
+    session.close()
+    live = sum(1 for event in fake.events_by_id.values() if event['status'] != 'cancelled')
+    checks['mirror matches calendar'] = mirrored == live
+
+    print(', '.join(f'{k}: {"ok" if v else "FAILED"}' for k, v in checks.items()))
+    return 0 if all(checks.values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
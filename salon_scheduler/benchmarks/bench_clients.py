@@ -0,0 +1,138 @@
+"""Client resolution for large poll batches: per request against ClientResolver.
+
+Seeds --existing clients, then resolves batches of --batch requests whose
+senders are drawn from --senders addresses, about half of them already
+clients, written as From headers in mixed case. Each mode runs on its own
+freshly seeded database:
+
+- per request: look the address up, insert the client if missing, commit
+  (what booking did for every request before ClientResolver)
+- resolver (cold): one ClientResolver.resolve call for the batch
+- resolver (warm): the next batch from the same senders, answered from
+  the LRU cache
+
+"statements" counts round trips to the database. A last check has two
+threads create the same --race new clients at once, to show the per
+request flow failing on the unique email constraint where the upsert
+does not.
+"""
+import argparse
+import random
+import threading
+import time
+
+from sqlalchemy.exc import IntegrityError
+
+from models import Client
+from clients import ClientResolver, normalize_email
+from benchmarks.bench_reminders import QueryCounter
+from benchmarks.common import report, temp_session_factory
+
+
+def seeded(existing: int):
+    Session, _ = temp_session_factory()
+    if existing:
+        session = Session()
+        session.execute(Client.__table__.insert(), [
+            {'name': f'Client {n}', 'email': f'client{n}@example.com'} for n in range(existing)
+        ])
+        session.commit()
+        session.close()
+    return Session, QueryCounter(Session.kw['bind'])
+
+
+def batch(rng: random.Random, size: int, senders: int, existing: int):
+    """(From header, name, phone) per request; senders past `existing` are new clients."""
+    offset = existing - senders // 2
+    requests = []
+    for _ in range(size):
+        n = offset + rng.randrange(senders)
+        address = f'client{n}@example.com'
+        header = rng.choice([address, address.upper(), f'Client {n} <{address.capitalize()}>'])
+        requests.append((header, f'Client {n}', None))
+    return requests
+
+
+def per_request(Session, requests) -> int:
+    """Find or create each request's client as its own transaction; returns unique constraint failures."""
+    failures = 0
+    for email, name, phone in requests:
+        session = Session()
+        try:
+            address = normalize_email(email)
+            client = session.query(Client).filter_by(email=address).first()
+            if client is None:
+                session.add(Client(name=name, email=address, phone=phone))
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+            failures += 1
+        finally:
+            session.close()
+    return failures
+
+
+def timed_run(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def race(resolve, requests) -> int:
+    """Run the same requests from two threads at once and return the failures."""
+    failures = []
+    barrier = threading.Barrier(2)
+
+    def run():
+        barrier.wait()
+        try:
+            failures.append(resolve(requests) or 0)
+        except IntegrityError:
+            failures.append(1)
+    threads = [threading.Thread(target=run) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--existing', type=int, default=20000)
+    parser.add_argument('--senders', type=int, default=8000)
+    parser.add_argument('--batch', type=int, default=10000)
+    parser.add_argument('--race', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=9)
+    args = parser.parse_args()
+
+    requests = batch(random.Random(args.seed), args.batch, args.senders, args.existing)
+    second = batch(random.Random(args.seed + 1), args.batch, args.senders, args.existing)
+    print(f'{len(requests)} requests from {len({normalize_email(r[0]) for r in requests})} senders')
+
+    Session, counter = seeded(args.existing)
+    _, ms = timed_run(lambda: per_request(Session, requests))
+    clients = Session().query(Client).count()
+    report('per request', {'statements': counter.count, 'ms': ms, 'clients': clients})
+
+    Session, counter = seeded(args.existing)
+    resolver = ClientResolver(Session)
+    ids, ms = timed_run(lambda: resolver.resolve(requests))
+    report('resolver (cold)', {'statements': counter.count, 'ms': ms, 'clients': Session().query(Client).count()})
+    assert len(ids) == len({normalize_email(r[0]) for r in requests})
+    assert Session().query(Client).count() == clients, 'both flows should create the same clients'
+    before = counter.count
+    _, ms = timed_run(lambda: resolver.resolve(second))
+    report('resolver (warm)', {'statements': counter.count - before, 'ms': ms,
+                               'cached': len(resolver.ids)})
+
+    racing = [(f'racer{n}@example.com', f'Racer {n}', None) for n in range(args.race)]
+    Session, _ = seeded(0)
+    print(f'per request, two threads: {race(lambda r: per_request(Session, r), racing)} unique constraint failures')
+    Session, _ = seeded(0)
+    print(f'resolver, two threads: {race(lambda r: ClientResolver(Session).resolve(r) and 0, racing)} failures, '
+          f'{Session().query(Client).count()} clients')
+
+
+if __name__ == '__main__':
+    main()
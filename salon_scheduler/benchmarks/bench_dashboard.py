@@ -0,0 +1,42 @@
+"""Dashboard latency: uncached aggregate query and cached page render."""
+import argparse
+from datetime import datetime
+
+from models import init_db
+from scheduler import Scheduler
+from stats import dashboard_cache, dashboard_stats
+from benchmarks.bench_availability import seed
+from benchmarks.common import measure, report, temp_session_factory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--appointments', type=int, default=100000)
+    parser.add_argument('--runs', type=int, default=200)
+    args = parser.parse_args()
+
+    Session, path = temp_session_factory()
+    init_db(Session.kw['bind'])
+    scheduler = Scheduler(Session)
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    seed(Session, scheduler, args.appointments, now)
+    print(f'Seeded {args.appointments} appointments into {path}')
+    catalog = scheduler.catalog.get()
+
+    def uncached():
+        session = Session()
+        try:
+            return dashboard_stats(session, now, catalog)
+        finally:
+            session.close()
+
+    report('aggregate query (cache miss)', measure(uncached, runs=args.runs))
+
+    from admin import create_app
+    client = create_app(session_factory=Session, scheduler=scheduler).test_client()
+    dashboard_cache.invalidate()
+    report('GET / (cached)', measure(lambda: client.get('/'), runs=args.runs))
+
+
+if __name__ == '__main__':
+    main()
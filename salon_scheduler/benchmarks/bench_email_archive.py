@@ -0,0 +1,119 @@
+"""Database size and query latency before and after compacting EmailLog.
+
+Generates --years of history (the emails each booking produced included),
+then times queries that touch email_logs, compacts with EmailLogArchiver
+and times them again:
+
+- recipient search: every log for one address, as staff look one up
+- count: all logs in the table
+- reminder load: ReminderDispatcher.load, which checks logs for reminders sent
+- daily counts: sends per day over the last 90 days, archived or not
+
+The database file size includes the WAL, which is checkpointed first.
+Afterwards the same recipient is searched in the archive files with
+read_archive, and the archived logs are checked against the per-day
+counts kept in the database.
+"""
+import argparse
+import gc
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from models import EmailLog, EmailLogDay, init_db
+from email_archive import EmailLogArchiver, archive_dir, daily_counts, read_archive
+from reminders import ReminderDispatcher
+from benchmarks.common import measure, report, temp_session_factory
+from benchmarks.generate import generate
+
+
+def file_size(path: str) -> int:
+    return sum(os.path.getsize(name) for name in (path, path + '-wal') if os.path.exists(name))
+
+
+def checkpoint(Session):
+    session = Session()
+    session.connection().exec_driver_sql('PRAGMA wal_checkpoint(TRUNCATE)')
+    session.close()
+
+
+def queries(Session, recipient: str, now: datetime) -> dict:
+    def run(statement):
+        session = Session()
+        try:
+            return session.execute(statement).all()
+        finally:
+            session.close()
+
+    def daily():
+        session = Session()
+        try:
+            return daily_counts(session, (now - timedelta(days=89)).date(), now.date())
+        finally:
+            session.close()
+
+    return {
+        'recipient search': lambda: run(select(EmailLog).where(EmailLog.recipient == recipient)),
+        'count': lambda: run(select(func.count(EmailLog.id))),
+        'reminder load': lambda: ReminderDispatcher(Session, None).load(),
+        'daily counts 90d': daily
+    }
+
+
+def timings(Session, recipient: str, now: datetime, runs: int) -> dict:
+    # Generating and archiving leave garbage that would otherwise be collected mid-measurement
+    gc.collect()
+    return {name: measure(query, runs=runs, warmup=1) for name, query in queries(Session, recipient, now).items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stylists', type=int, default=20)
+    parser.add_argument('--years', type=float, default=3)
+    parser.add_argument('--bookings-per-day', type=int, default=200)
+    parser.add_argument('--retention-days', type=int, default=90)
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    Session, path = temp_session_factory()
+    init_db(Session.kw['bind'])
+    counts = generate(Session, args.stylists, args.years, args.bookings_per_day)
+    print(f"Generated {counts['appointments']} appointments and {counts['email_logs']} email logs into {path}")
+    checkpoint(Session)
+    now = datetime.utcnow()
+    recipient = 'client42@example.com'
+    before_size = file_size(path)
+    before = timings(Session, recipient, now, args.runs)
+    daily_before = queries(Session, recipient, now)['daily counts 90d']()
+
+    directory = archive_dir('main', os.path.join(os.path.dirname(path), 'archive'))
+    started = time.perf_counter()
+    result = EmailLogArchiver(Session, directory, retention_days=args.retention_days).compact(now=now)
+    compact_seconds = time.perf_counter() - started
+    after_size = file_size(path)
+    archive_size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+    print(f"Archived {result['archived']} logs into {len(result['months'])} files in {compact_seconds:.1f}s")
+    print(f'Database: {before_size / 2 ** 20:.1f} MB -> {after_size / 2 ** 20:.1f} MB; '
+          f'archives: {archive_size / 2 ** 20:.1f} MB')
+
+    after = timings(Session, recipient, now, args.runs)
+    for name in before:
+        report(f'{name} before', before[name])
+        report(f'{name} after', after[name])
+    assert queries(Session, recipient, now)['daily counts 90d']() == daily_before, 'daily counts changed'
+
+    started = time.perf_counter()
+    found = sum(1 for _ in read_archive(directory, recipient=recipient))
+    print(f'read_archive for {recipient}: {found} logs in {(time.perf_counter() - started) * 1000:.0f} ms '
+          f'across {len(result["months"])} months')
+    session = Session()
+    summarized = session.query(func.sum(EmailLogDay.count)).scalar()
+    session.close()
+    assert summarized == result['archived'], (summarized, result['archived'])
+    print('OK: per-day counts match the archived logs')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Reminder send throughput: serial send_email loop versus send_bulk."""
+import argparse
+import os
+import tempfile
+import time
+
+from email_handler import EmailHandler
+from models import EmailLog
+from rate_limit import RateLimiter
+from benchmarks.common import temp_session_factory
+from benchmarks.fake_gmail import FakeGmailService
+
+REMINDER_TEMPLATE = """<html><body>
+<p>Hi {{ client_name }},</p>
+<p>This is a reminder of your {{ service }} with {{ stylist }} on {{ start_time }}.</p>
+{% for line in notes %}<p>{{ line }}</p>{% endfor %}
+</body></html>"""
+
+
+def template_root() -> str:
+    root = tempfile.mkdtemp(prefix='salon-templates-')
+    os.makedirs(os.path.join(root, 'templates'))
+    with open(os.path.join(root, 'templates', 'reminder.html'), 'w') as f:
+        f.write(REMINDER_TEMPLATE)
+    return root
+
+
+def recipients(count: int):
+    return [
+        (f'client{n}@example.com', {
+            'appointment_id': n,
+            'client_name': f'Client {n}',
+            'service': 'haircut',
+            'stylist': 'Alice Johnson',
+            'start_time': '2030-03-04 10:00',
+            'notes': ['Please arrive 5 minutes early.', 'Reply to reschedule.']
+        })
+        for n in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--emails', type=int, default=200)
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--rate', type=float, default=1000.0,
+                        help='send rate limit; the production default follows the Gmail quota')
+    args = parser.parse_args()
+
+    root = template_root()
+    batch = recipients(args.emails)
+
+    gmail = FakeGmailService(args.latency_ms / 1000)
+    handler = EmailHandler(service=gmail, template_root=root)
+    start = time.perf_counter()
+    for to, context in batch:
+        handler.send_email(to, 'Reminder', 'templates/reminder.html', context)
+    serial = args.emails / (time.perf_counter() - start)
+    print(f'serial send_email: {serial:,.0f} msg/s')
+
+    Session, _ = temp_session_factory()
+    gmail = FakeGmailService(args.latency_ms / 1000)
+    handler = EmailHandler(service=gmail, template_root=root, session_factory=Session)
+    handler.rate_limiter = RateLimiter(args.rate, burst=int(args.rate))
+    start = time.perf_counter()
+    results = handler.send_bulk('templates/reminder.html', 'Reminder', batch, email_type='reminder')
+    bulk = args.emails / (time.perf_counter() - start)
+
+    session = Session()
+    logged = session.query(EmailLog).count()
+    session.close()
+    sent = sum(result['status'] == 'sent' for result in results)
+    print(f'send_bulk: {bulk:,.0f} msg/s ({sent} sent, {logged} log rows), {bulk / serial:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Peak memory of the streamed appointment export versus loading every row."""
+import argparse
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from models import Appointment, AppointmentStatus, Client, Service, Stylist
+from export import stream_appointments_csv, stream_appointments_ndjson
+from benchmarks.common import temp_session_factory
+
+
+def seed(Session, appointments: int):
+    """Insert synthetic appointments in large executemany batches."""
+    session = Session()
+    session.add_all([
+        Client(id=1, name='Bench Client', email='bench@example.com'),
+        Stylist(id=1, name='Bench Stylist', email='stylist@example.com'),
+        Service(id=1, name='haircut', duration=45, price=50.0)
+    ])
+    session.commit()
+
+    start = datetime(2020, 1, 1, 9, 0)
+    batch = []
+    for n in range(appointments):
+        slot = start + timedelta(hours=n)
+        batch.append({
+            'client_id': 1, 'stylist_id': 1, 'service_id': 1,
+            'start_time': slot, 'end_time': slot + timedelta(minutes=45),
+            'status': AppointmentStatus.COMPLETED
+        })
+        if len(batch) == 50000:
+            session.execute(Appointment.__table__.insert(), batch)
+            batch = []
+    if batch:
+        session.execute(Appointment.__table__.insert(), batch)
+    session.commit()
+    session.close()
+
+
+def profile(label: str, produce):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = produce()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{label}: {size / 1e6:.1f} MB in {elapsed:.1f}s, peak memory {peak / 1e6:.1f} MB')
+
+
+def drain(chunks) -> int:
+    return sum(len(chunk) for chunk in chunks)
+
+
+def load_all(Session) -> int:
+    """The pre-streaming approach: materialize every ORM object first."""
+    session = Session()
+    rows = session.query(Appointment).order_by(Appointment.start_time.desc()).all()
+    size = sum(len(str(row.start_time)) for row in rows)
+    session.close()
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--appointments', type=int, default=1000000)
+    parser.add_argument('--compare-all', action='store_true',
+                        help='also measure loading every row with .all()')
+    args = parser.parse_args()
+
+    Session, path = temp_session_factory()
+    seed(Session, args.appointments)
+    print(f'Seeded {args.appointments} appointments into {path}')
+
+    profile('csv export', lambda: drain(stream_appointments_csv(Session)))
+    profile('ndjson export', lambda: drain(stream_appointments_ndjson(Session)))
+    if args.compare_all:
+        profile('query(...).all()', lambda: load_all(Session))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Cost of setting up the Gmail and Calendar clients, before and after sharing them.
+
+Writes a token file that needs no refresh, then times what the daemon did
+per handler before (load the token file and build the client, once for
+Gmail and once for Calendar) against GoogleServices cold (first load and
+builds in a fresh provider) and warm (every later EmailHandler or
+CalendarManager in the process). Nothing here touches the network.
+"""
+import argparse
+import json
+import os
+import tempfile
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+
+from google_services import SCOPES, GoogleServices
+from benchmarks.common import measure, report
+
+
+def token_file() -> str:
+    path = os.path.join(tempfile.mkdtemp(prefix='salon-token-'), 'token.json')
+    with open(path, 'w') as f:
+        json.dump({
+            'token': 'bench-token',
+            'refresh_token': 'bench-refresh',
+            'client_id': 'bench-client',
+            'client_secret': 'bench-secret',
+            'token_uri': 'https://oauth2.googleapis.com/token',
+            'expiry': '2099-01-01T00:00:00Z'
+        }, f)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=200)
+    args = parser.parse_args()
+    path = token_file()
+
+    def per_handler():
+        gmail = build('gmail', 'v1', credentials=Credentials.from_authorized_user_file(path, SCOPES[:1]))
+        calendar = build('calendar', 'v3', credentials=Credentials.from_authorized_user_file(path, SCOPES[1:]))
+        return gmail, calendar
+
+    def cold():
+        provider = GoogleServices(path)
+        clients = provider.gmail(), provider.calendar()
+        provider.stop()
+        return clients
+
+    warm_provider = GoogleServices(path)
+    report('load and build per handler', measure(per_handler, runs=args.runs))
+    report('shared provider, cold', measure(cold, runs=args.runs))
+    report('shared provider, warm', measure(lambda: (warm_provider.gmail(), warm_provider.calendar()),
+                                            runs=args.runs))
+    warm_provider.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Import time of each entry point, checked against a budget.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter
+several times per module and keeps the fastest run, so the numbers are
+cold imports without the noise. Each module has a time budget and a list
+of heavy packages it must not pull in (a reminder or stats job has no use
+for Flask or the Google client libraries). Exits non-zero if any module
+goes over budget or imports something it should not:
+
+    python -m benchmarks.bench_import_time --runs 5
+    python -m benchmarks.bench_import_time --scale 2   # slower machine
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, Set, Tuple
+
+GOOGLE = ('googleapiclient', 'google_auth_httplib2', 'google.oauth2', 'httplib2')
+
+# module: (budget in ms, packages it must not import)
+BUDGETS: Dict[str, Tuple[float, Tuple[str, ...]]] = {
+    'cli': (60, ('sqlalchemy', 'flask', 'jinja2') + GOOGLE),
+    'config': (100, ('sqlalchemy', 'flask') + GOOGLE),
+    'instrumentation': (150, ('sqlalchemy', 'flask', 'http.server') + GOOGLE),
+    'google_services': (150, ('sqlalchemy', 'flask') + GOOGLE),
+    'scheduler': (800, ('flask', 'jinja2') + GOOGLE),
+    'stats': (800, ('flask', 'jinja2') + GOOGLE),
+    'reminders': (800, ('flask', 'jinja2') + GOOGLE),
+    'email_handler': (800, ('flask', 'jinja2') + GOOGLE),
+    'calendar_manager': (850, ('flask', 'jinja2') + GOOGLE),
+    'admin': (1100, ('numpy',) + GOOGLE),
+    'main': (1100, ('flask',) + GOOGLE),
+}
+
+LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$')
+
+
+def import_profile(module: str) -> Tuple[float, Set[str]]:
+    """Cumulative import time of a module in ms, and every module it imported."""
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, cwd=here, check=True
+    )
+    total, imported = 0.0, set()
+    for line in process.stderr.splitlines():
+        match = LINE.match(line)
+        if not match:
+            continue
+        name = match.group(4)
+        imported.add(name)
+        if name == module and len(match.group(3)) == 1:  # Top level, not a nested import of the same name
+            total = int(match.group(2)) / 1000
+    return total, imported
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply every budget, for slower machines')
+    parser.add_argument('--only', default='', help='comma-separated modules')
+    args = parser.parse_args()
+
+    modules = [module for module in args.only.split(',') if module] or list(BUDGETS)
+    failures = []
+    for module in modules:
+        budget, forbidden = BUDGETS[module]
+        budget *= args.scale
+        profiles = [import_profile(module) for _ in range(args.runs)]
+        fastest = min(total for total, _ in profiles)
+        leaked = sorted({
+            name for _, imported in profiles for name in imported
+            if any(name == package or name.startswith(package + '.') for package in forbidden)
+        })
+        status = 'ok'
+        if fastest > budget:
+            status = 'OVER BUDGET'
+            failures.append(module)
+        if leaked:
+            status = f'imports {", ".join(leaked[:3])}{"..." if len(leaked) > 3 else ""}'
+            failures.append(module)
+        print(f'{module:<18} {fastest:8.1f} ms  (budget {budget:6.0f} ms)  {status}')
+
+    print('PASS' if not failures else f'FAIL: {", ".join(sorted(set(failures)))}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""Inbox drain throughput: batched monitor_inbox versus a serial get/modify loop."""
+import argparse
+import time
+
+from email_handler import EmailHandler
+from sync_state import SyncStateStore
+from benchmarks.common import temp_session_factory
+from benchmarks.fake_gmail import FakeGmailService
+
+REQUEST_BODY = """Hi,
+
+Name: Client {n}
+Service: haircut
+Date: 2030-03-{day:02d}
+Time: 2:30 PM
+Phone: 555-01{n:04d}
+"""
+
+
+def fill_inbox(gmail: FakeGmailService, count: int, start: int = 0):
+    for n in range(start, start + count):
+        gmail.deliver(f'client{n}@example.com', REQUEST_BODY.format(n=n, day=n % 28 + 1))
+
+
+def serial_drain(handler: EmailHandler) -> int:
+    """One list call per page, then a get and a modify round trip per message."""
+    drained = 0
+    for message_id in handler._list_message_ids():
+        email_data, _ = handler.parse_email_request(message_id)
+        if email_data:
+            handler.service.users().messages().modify(
+                userId='me',
+                id=message_id,
+                body={'removeLabelIds': ['UNREAD']}
+            ).execute()
+            drained += 1
+    return drained
+
+
+def run(label: str, gmail: FakeGmailService, drain) -> float:
+    start = time.perf_counter()
+    drained = drain()
+    elapsed = time.perf_counter() - start
+    rate = drained / elapsed if elapsed else float('inf')
+    print(f'{label}: {drained} messages in {elapsed:.2f}s ({rate:.0f} msg/s, {gmail.round_trips} round trips)')
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    args = parser.parse_args()
+    latency = args.latency_ms / 1000
+
+    gmail = FakeGmailService(latency)
+    fill_inbox(gmail, args.messages)
+    serial = run('serial', gmail, lambda: serial_drain(EmailHandler(service=gmail)))
+
+    gmail = FakeGmailService(latency)
+    fill_inbox(gmail, args.messages)
+    Session, _ = temp_session_factory()
+    handler = EmailHandler(service=gmail, state_store=SyncStateStore(Session))
+    batched = run('batched', gmail, lambda: len(handler.monitor_inbox()))
+    print(f'speedup: {batched / serial:.1f}x')
+
+    fill_inbox(gmail, 10, start=args.messages)
+    gmail.round_trips = 0
+    run('incremental (10 new)', gmail, lambda: len(handler.monitor_inbox()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""How cross-location slot search scales as locations are added.
+
+Seeds one SQLite shard per location, then for 1, 2, 4, ... locations times
+LocationRouter.find_nearest_slots searching them in turn and fanned out to
+a process pool with one worker per location (capped at --workers and the
+core count; with one core the router searches in turn). Each location's
+search only reads its own shard, so with a free core per location the
+fan-out latency should stay flat and the locations searched per second
+should grow linearly; past the core count it grows no further.
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+from scheduler import Scheduler
+from locations import LocationRouter
+from benchmarks.bench_availability import seed
+from benchmarks.common import measure, report, temp_session_factory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--locations', default='1,2,4,8', help='comma-separated location counts')
+    parser.add_argument('--appointments', type=int, default=20000, help='appointments per location')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--runs', type=int, default=30)
+    args = parser.parse_args()
+
+    counts = sorted(int(n) for n in args.locations.split(','))
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    locations = {}
+    for n in range(counts[-1]):
+        Session, path = temp_session_factory(f'location{n}.db')
+        location_id = f'branch{n}'
+        seed(Session, Scheduler(Session, location_id), args.appointments, now, seed_value=n)
+        locations[location_id] = {'name': f'Branch {n}', 'database_url': f'sqlite:///{path}', 'calendar_id': None}
+    print(f'Seeded {len(locations)} shards with {args.appointments} appointments each; '
+          f'{os.cpu_count()} CPUs, up to {args.workers} workers')
+
+    preferred = now + timedelta(days=2, hours=3)
+    baseline = None
+    for count in counts:
+        subset = {key: locations[key] for key in list(locations)[:count]}
+
+        def search(router):
+            return router.find_nearest_slots('haircut', preferred, days=args.days, now=now)
+
+        sequential = LocationRouter(subset, workers=0)
+        report(f'{count} locations, in turn', measure(lambda: search(sequential), runs=args.runs))
+
+        parallel = LocationRouter(subset, workers=min(count, args.workers))
+        result = measure(lambda: search(parallel), runs=args.runs, warmup=max(5, 2 * count))
+        report(f'{count} locations, fan-out', result)
+        started = time.perf_counter()
+        for _ in range(args.runs):
+            search(parallel)
+        throughput = count * args.runs / (time.perf_counter() - started)
+        parallel.close()
+
+        baseline = baseline or throughput / count
+        print(f'  {throughput:.1f} location searches/s, {throughput / (baseline * count):.0%} of linear')
+
+
+if __name__ == '__main__':
+    main()
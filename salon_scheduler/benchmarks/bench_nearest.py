@@ -0,0 +1,104 @@
+"""Nearest-alternative search against enumerating the whole booking window.
+
+Uses the configured booking window (MAX_ADVANCE_DAYS, a month by default;
+--window overrides it), seeds a normal diary, then books every stylist
+solid for the --full-days days around the requested time. Each search
+runs cold (slot cache cleared) and compares:
+
+- enumerate: find_available_slots over the whole window, sorted by distance
+- nearest: find_nearest_slots, which stops once k slots are certain
+
+for a requested time in the open diary and in the middle of the fully
+booked stretch, and several k. "days" is how many days each search had to
+build. When the requested day has no slots the nearest search has nothing
+to size its next step by and takes the rest of the window, so it costs
+one day's load more than enumerating.
+"""
+import argparse
+from datetime import datetime, timedelta
+
+import scheduler as scheduler_module
+from config import BUSINESS_HOURS, MAX_ADVANCE_DAYS, SERVICES, STYLISTS
+from models import Appointment, AppointmentStatus, Client
+from availability import WEEKDAYS
+from scheduler import Scheduler
+from benchmarks.bench_availability import seed
+from benchmarks.common import measure, report, temp_session_factory
+
+
+def book_solid(Session, scheduler: Scheduler, first_day, days: int):
+    """One appointment from opening to closing for every stylist on every day."""
+    catalog = scheduler.catalog.get()
+    session = Session()
+    client = Client(name='Solid Client', email='solid@example.com')
+    session.add(client)
+    session.flush()
+    rows = []
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        hours = BUSINESS_HOURS[WEEKDAYS[day.weekday()]]
+        if not hours:
+            continue
+        for key in STYLISTS:
+            rows.append({
+                'client_id': client.id,
+                'stylist_id': catalog.stylist_ids[key],
+                'service_id': catalog.service_ids[STYLISTS[key]['specialties'][0]],
+                'start_time': datetime.combine(day, hours['start']),
+                'end_time': datetime.combine(day, hours['end']),
+                'status': AppointmentStatus.CONFIRMED
+            })
+    session.bulk_insert_mappings(Appointment, rows)
+    session.commit()
+    session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--window', type=int, default=MAX_ADVANCE_DAYS, help='booking window in days')
+    parser.add_argument('--full-days', type=int, default=10)
+    parser.add_argument('--appointments', type=int, default=5000)
+    parser.add_argument('--k', default='1,3,10', help='comma-separated')
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    scheduler_module.MAX_ADVANCE_DAYS = args.window
+    Session, path = temp_session_factory()
+    scheduler = Scheduler(Session)
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    seed(Session, scheduler, args.appointments, now)
+    full_start = (now + timedelta(days=args.window // 2 - args.full_days // 2)).date()
+    book_solid(Session, scheduler, full_start, args.full_days)
+    print(f'Seeded {path}; every stylist is booked solid from {full_start} for {args.full_days} days')
+
+    service = next(iter(SERVICES))
+    cache = scheduler.slot_cache
+    requests = {
+        'open diary': now + timedelta(days=3, hours=2),
+        'fully booked month': datetime.combine(full_start + timedelta(days=args.full_days // 2), datetime.min.time())
+        + timedelta(hours=12)
+    }
+
+    def days_built(search) -> int:
+        cache.entries.invalidate()
+        misses = cache.misses
+        search()
+        return cache.misses - misses
+
+    for label, requested in requests.items():
+        for k in [int(k) for k in args.k.split(',')]:
+            def enumerate_window():
+                slots = scheduler.find_available_slots(service, now, days=args.window + 1, now=now)
+                return sorted(slots, key=lambda slot: (abs(slot[0] - requested), slot[0]))[:k]
+
+            def nearest():
+                return scheduler.find_nearest_slots(service, requested, k=k, now=now)
+
+            assert enumerate_window() == nearest()
+            for name, search in (('enumerate', enumerate_window), ('nearest', nearest)):
+                result = measure(lambda: (cache.entries.invalidate(), search()), runs=args.runs)
+                report(f'{label} k={k} {name}', dict(days=days_built(search), **result))
+
+
+if __name__ == '__main__':
+    main()
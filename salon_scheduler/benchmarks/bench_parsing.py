@@ -0,0 +1,82 @@
+"""Email parsing throughput over a synthetic request corpus."""
+import argparse
+import base64
+import re
+import time
+
+from config import SERVICES
+from email_parser import EmailRequestParser, gmail_body_text
+from benchmarks.emails import corpus_lists
+
+
+def legacy_parse(message: dict):
+    """The original per-field regex parser, kept for comparison."""
+    headers = message['payload']['headers']
+    email_data = {
+        'from_email': next(h['value'] for h in headers if h['name'].lower() == 'from'),
+        'subject': next(h['value'] for h in headers if h['name'].lower() == 'subject'),
+        'date': next(h['value'] for h in headers if h['name'].lower() == 'date')
+    }
+    if 'parts' in message['payload']:
+        parts = message['payload']['parts']
+        body = next(
+            (part['body']['data'] for part in parts if part['mimeType'] == 'text/plain'),
+            message['payload']['body'].get('data', '')
+        )
+    else:
+        body = message['payload']['body'].get('data', '')
+    decoded_body = base64.urlsafe_b64decode(body.encode('ASCII')).decode('utf-8')
+    patterns = {
+        'name': r'(?i)name:\s*([^\n]+)',
+        'service': r'(?i)service:\s*([^\n]+)',
+        'date': r'(?i)date:\s*([^\n]+)',
+        'time': r'(?i)time:\s*([^\n]+)',
+        'phone': r'(?i)phone:\s*([^\n]+)'
+    }
+    extracted_data, missing_fields = {}, []
+    for field, pattern in patterns.items():
+        match = re.search(pattern, decoded_body)
+        if match:
+            extracted_data[field] = match.group(1).strip()
+        else:
+            missing_fields.append(field)
+    if 'service' in extracted_data and extracted_data['service'].lower() not in SERVICES:
+        missing_fields.append('valid_service')
+    email_data.update(extracted_data)
+    return email_data, missing_fields
+
+
+def throughput(label: str, parse, items) -> float:
+    start = time.perf_counter()
+    complete = 0
+    for item in items:
+        try:
+            _, missing = parse(item)
+            complete += not missing
+        except Exception:
+            pass
+    elapsed = time.perf_counter() - start
+    rate = len(items) / elapsed
+    print(f'{label}: {rate:,.0f} emails/s ({complete}/{len(items)} complete requests)')
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--emails', type=int, default=20000)
+    args = parser.parse_args()
+
+    corpus = corpus_lists(args.emails)
+    gmail = [item['gmail'] for item in corpus]
+    raw = [item['raw'] for item in corpus]
+    request_parser = EmailRequestParser()
+
+    throughput('legacy regex parser (gmail payload)', legacy_parse, gmail)
+    throughput('EmailRequestParser (gmail payload)', request_parser.parse_gmail_message, gmail)
+    throughput('EmailRequestParser (raw RFC822)', request_parser.parse_rfc822, raw)
+    bodies = [gmail_body_text(m['payload']) for m in gmail]
+    throughput('field extraction only', request_parser.parse_text, bodies)
+
+
+if __name__ == '__main__':
+    main()
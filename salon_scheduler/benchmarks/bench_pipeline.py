@@ -0,0 +1,110 @@
+"""Burst throughput of the async booking pipeline with slow Gmail calls mixed in."""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from email_handler import EmailHandler
+from models import init_db
+from pipeline import BookingPipeline
+from rate_limit import RateLimiter
+from scheduler import Scheduler
+from benchmarks.common import temp_session_factory
+from benchmarks.fake_gmail import FakeGmailService
+
+BODY = """Name: Client {n}
+Service: {service}
+Date: {date}
+Time: {time}
+Phone: 555-0{n:04d}
+"""
+
+
+class SlowSendGmail(FakeGmailService):
+    """Fake Gmail where a fraction of sends hang for several seconds."""
+
+    def __init__(self, latency: float, slow_ratio: float, slow_seconds: float, seed: int = 3):
+        super().__init__(latency)
+        self.rng = random.Random(seed)
+        self.slow_ratio = slow_ratio
+        self.slow_seconds = slow_seconds
+
+    def messages(self):
+        messages = super().messages()
+        send = messages.send
+
+        def slow_send(userId, body):
+            request = send(userId=userId, body=body)
+            if self.rng.random() < self.slow_ratio:
+                call = request.call
+                request.call = lambda: (time.sleep(self.slow_seconds), call())[1]
+            return request
+        messages.send = slow_send
+        return messages
+
+
+def fill_inbox(gmail: FakeGmailService, count: int):
+    rng = random.Random(5)
+    start = datetime.now() + timedelta(days=2)
+    for n in range(count):
+        day = start + timedelta(days=rng.randint(0, 20))
+        gmail.deliver(f'Client {n} <client{n}@example.com>', BODY.format(
+            n=n,
+            service=rng.choice(['haircut', 'color', 'styling', 'manicure']),
+            date=day.strftime('%Y-%m-%d'),
+            time=f'{rng.randint(9, 15)}:{rng.choice(["00", "15", "30", "45"])}'
+        ))
+
+
+async def drive(pipeline: BookingPipeline, expected: int):
+    """Stop the pipeline once every request has been replied to."""
+    while pipeline.metrics['reply'].processed < expected:
+        await asyncio.sleep(0.05)
+    pipeline.stop()
+
+
+async def main_async(args):
+    Session, _ = temp_session_factory()
+    init_db(Session.kw['bind'])
+    gmail = SlowSendGmail(args.latency_ms / 1000, args.slow_ratio, args.slow_seconds)
+    fill_inbox(gmail, args.requests)
+
+    handler = EmailHandler(service=gmail, session_factory=Session)
+    handler.rate_limiter = RateLimiter(1e9, burst=10 ** 9)
+    handler.templates.update({
+        path: handler.jinja_env.from_string('{{ client_name }}') for path in list(handler.templates) + [
+            'templates/acknowledgment.html', 'templates/confirmation.html', 'templates/missing_info.html',
+            'templates/alternatives.html'
+        ]
+    })
+    pipeline = BookingPipeline(
+        handler, Scheduler(Session), poll_seconds=0.5,
+        workers={'parse': 1, 'booking': args.booking_workers, 'reply': args.reply_workers},
+        batch_booking=not args.one_by_one
+    )
+
+    started = time.perf_counter()
+    await asyncio.gather(pipeline.run(), drive(pipeline, args.requests))
+    elapsed = time.perf_counter() - started
+
+    print(f'{args.requests} requests in {elapsed:.2f}s ({args.requests / elapsed:.0f} req/s)')
+    for stage in pipeline.snapshot():
+        print(f"  {stage['stage']}: processed={stage['processed']} failed={stage['failed']} "
+              f"mean={stage['mean_latency_ms']:.1f}ms max={stage['max_latency_ms']:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--slow-ratio', type=float, default=0.02)
+    parser.add_argument('--slow-seconds', type=float, default=2.0)
+    parser.add_argument('--booking-workers', type=int, default=4)
+    parser.add_argument('--reply-workers', type=int, default=8)
+    parser.add_argument('--one-by-one', action='store_true', help='book each request on its own instead of in batches')
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""Simulated-clock harness for ReminderDispatcher.
+
+Seeds confirmed appointments over the booking window, then advances a fake
+clock tick by tick. Checks that every reminder is sent exactly once, that
+cancellations and late bookings are honoured, and reports the startup cost
+and the per-tick query count and latency. tests/test_reminders.py runs the
+same simulation at a smaller scale and asserts the checks.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from models import Appointment, AppointmentStatus, Client, EmailLog, Service, Stylist, init_db
+from email_handler import EmailHandler
+from rate_limit import RateLimiter
+from reminders import ReminderDispatcher
+from benchmarks.common import percentiles, report, temp_session_factory
+from benchmarks.fake_gmail import FakeGmailService
+from benchmarks.bench_email_send import template_root
+
+
+class SimulatedClock:
+    def __init__(self, start: datetime):
+        self.now = start
+
+    def __call__(self) -> datetime:
+        return self.now
+
+    def advance(self, delta: timedelta):
+        self.now += delta
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def seed(Session, appointments: int, start: datetime, days: int, rng: random.Random):
+    session = Session()
+    session.add_all([
+        Stylist(id=1, name='Bench Stylist', email='stylist@example.com'),
+        Service(id=1, name='haircut', duration=45, price=50.0)
+    ])
+    session.execute(Client.__table__.insert(), [
+        {'id': n, 'name': f'Client {n}', 'email': f'client{n}@example.com'} for n in range(1, 1001)
+    ])
+    rows = []
+    for _ in range(appointments):
+        slot = start + timedelta(minutes=15 * rng.randrange(days * 24 * 4))
+        rows.append({
+            'client_id': rng.randint(1, 1000), 'stylist_id': 1, 'service_id': 1,
+            'start_time': slot, 'end_time': slot + timedelta(minutes=45),
+            'status': AppointmentStatus.CONFIRMED,
+            'updated_at': datetime.utcnow() - timedelta(days=1)
+        })
+    session.execute(Appointment.__table__.insert(), rows)
+    session.commit()
+    session.close()
+
+
+def simulate(Session, appointments: int, days: int, tick_minutes: int, templates: str) -> dict:
+    """Seed an initialized database, run the dispatcher over `days` simulated days and return what happened.
+
+    The result holds the load cost, per-tick latencies and query counts,
+    the number of reminders sent and a pass/fail per check.
+    """
+    rng = random.Random(11)
+    engine = Session.kw['bind']
+    clock = SimulatedClock(datetime(2030, 1, 7, 8, 0))
+    seed(Session, appointments, clock.now, 30, rng)
+
+    handler = EmailHandler(service=FakeGmailService(), session_factory=Session, template_root=templates)
+    handler.rate_limiter = RateLimiter(1e9, burst=10 ** 9)
+    handler.templates['templates/reminder.html'] = handler.jinja_env.from_string('{{ client_name }} {{ start_time }}')
+    dispatcher = ReminderDispatcher(Session, handler, clock=clock)
+    queries = QueryCounter(engine)
+
+    started = time.perf_counter()
+    dispatcher.load()
+    result = {'load_ms': (time.perf_counter() - started) * 1000, 'load_queries': queries.count,
+              'loaded': len(dispatcher)}
+
+    # Cancel one appointment and book one late, to exercise incremental updates
+    session = Session()
+    cancelled = session.query(Appointment).filter(Appointment.start_time > clock.now + timedelta(hours=30)).first()
+    cancelled.status = AppointmentStatus.CANCELLED
+    late = Appointment(client_id=1, stylist_id=1, service_id=1, status=AppointmentStatus.CONFIRMED,
+                       start_time=clock.now + timedelta(hours=30), end_time=clock.now + timedelta(hours=31))
+    session.add(late)
+    session.commit()
+    cancelled_id, late_id = cancelled.id, late.id
+    session.close()
+
+    samples, per_tick_queries, sent = [], [], 0
+    for _ in range(days * 24 * 60 // tick_minutes):
+        clock.advance(timedelta(minutes=tick_minutes))
+        before = queries.count
+        started = time.perf_counter()
+        dispatcher.refresh()
+        sent += len(dispatcher.tick())
+        samples.append(time.perf_counter() - started)
+        per_tick_queries.append(queries.count - before)
+
+    session = Session()
+    logged = [row[0] for row in session.query(EmailLog.appointment_id).filter_by(email_type='reminder')]
+    expected = session.query(Appointment.id).filter(
+        Appointment.status == AppointmentStatus.CONFIRMED,
+        Appointment.start_time > datetime(2030, 1, 7, 8, 0),
+        Appointment.start_time <= clock.now + dispatcher.lead_time
+    ).count()
+    session.close()
+
+    result.update(samples=samples, per_tick_queries=per_tick_queries, sent=sent, checks={
+        'every due reminder sent': len(set(logged)) == expected,
+        'no duplicates': len(logged) == len(set(logged)),
+        'cancelled appointment skipped': cancelled_id not in logged,
+        'late booking reminded': late_id in logged
+    })
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--appointments', type=int, default=20000)
+    parser.add_argument('--days', type=int, default=3, help='simulated days to run')
+    parser.add_argument('--tick-minutes', type=int, default=5)
+    args = parser.parse_args()
+
+    Session, _ = temp_session_factory()
+    init_db(Session.kw['bind'])
+    result = simulate(Session, args.appointments, args.days, args.tick_minutes, template_root())
+    print(f"load: {result['loaded']} reminders in {result['load_ms']:.1f} ms, {result['load_queries']} queries")
+    report('tick', percentiles(result['samples']))
+    per_tick_queries = result['per_tick_queries']
+    print(f'queries per tick: max {max(per_tick_queries)}, mean {sum(per_tick_queries) / len(per_tick_queries):.2f}')
+    checks = result['checks']
+    print(f"sent {result['sent']} reminders; " + ', '.join(
+        f'{k}: {"ok" if v else "FAILED"}' for k, v in checks.items()))
+    return 0 if all(checks.values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
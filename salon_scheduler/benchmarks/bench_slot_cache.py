@@ -0,0 +1,93 @@
+"""Throughput of /api/available-slots with and without the slot cache.
+
+Replays the booking widget: customers pick a service and one of the next
+--horizon days, polling GET /api/available-slots, and every --book-every
+requests one of them books a slot they were shown, which bumps that
+stylist's day. The same request sequence runs three times, each on its
+own copy of one seeded database:
+
+- no cache: every request searches the database (SlotCache with a zero budget)
+- cache: days are served from the slot cache until a booking changes them
+- cache + ETag: the client also sends the ETag it last saw for each URL,
+  so an unchanged answer comes back as an empty 304
+"""
+import argparse
+import random
+import shutil
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import sessionmaker
+
+from config import SERVICES
+from db import create_db_engine
+from scheduler import Scheduler
+from slot_cache import SlotCache
+from benchmarks.bench_availability import seed
+from benchmarks.common import temp_session_factory
+
+
+def replay(Session, now: datetime, cache_bytes, etags: bool, args) -> dict:
+    scheduler = Scheduler(Session)
+    if cache_bytes is not None:
+        scheduler.slot_cache = SlotCache(scheduler.location_id, max_bytes=cache_bytes)
+    from admin import create_app
+    client = create_app(session_factory=Session, scheduler=scheduler).test_client()
+
+    rng = random.Random(args.seed)
+    seen = {}
+    statuses = {}
+    booked = 0
+    started = time.perf_counter()
+    for n in range(args.requests):
+        day = (now + timedelta(days=rng.randint(1, args.horizon))).strftime('%Y-%m-%d')
+        url = f'/api/available-slots?service={rng.choice(list(SERVICES))}&date={day}&days={args.days}'
+        headers = {'If-None-Match': seen[url][0]} if etags and url in seen else {}
+        response = client.get(url, headers=headers)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        if response.status_code == 200:
+            seen[url] = (response.headers['ETag'], response.get_json()['slots'])
+        if n % args.book_every == 0 and seen[url][1]:
+            slot = rng.choice(seen[url][1])
+            result = client.post('/api/schedule-appointment', json={
+                'client_name': f'Widget {n}', 'client_email': f'widget{n}@example.com',
+                'service': url.split('service=')[1].split('&')[0],
+                'datetime': slot['datetime'], 'stylist_id': slot['stylists'][0]
+            })
+            booked += result.status_code == 200
+    elapsed = time.perf_counter() - started
+    return {
+        'qps': args.requests / elapsed,
+        'statuses': statuses,
+        'booked': booked,
+        'hit_ratio': scheduler.slot_cache.hit_ratio()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--appointments', type=int, default=20000)
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--horizon', type=int, default=14, help='days ahead customers look at')
+    parser.add_argument('--days', type=int, default=1, help='days per search')
+    parser.add_argument('--book-every', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    Session, path = temp_session_factory()
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    seed(Session, Scheduler(Session), args.appointments, now)
+    print(f'Seeded {args.appointments} appointments into {path}')
+    Session.kw['bind'].dispose()  # Checkpoints the WAL, so copies of the file are complete
+
+    for n, (label, cache_bytes, etags) in enumerate((('no cache', 0, False), ('cache', None, False),
+                                                     ('cache + ETag', None, True))):
+        copy = path.replace('bench.db', f'run{n}.db')
+        shutil.copy(path, copy)
+        result = replay(sessionmaker(bind=create_db_engine(f'sqlite:///{copy}')), now, cache_bytes, etags, args)
+        print(f"{label}: {result['qps']:.0f} req/s, hit ratio {result['hit_ratio']:.2f}, "
+              f"booked {result['booked']}, responses {result['statuses']}")
+
+
+if __name__ == '__main__':
+    main()
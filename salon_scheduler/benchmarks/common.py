@@ -0,0 +1,53 @@
+import os
+import statistics
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from sqlalchemy.orm import sessionmaker
+
+from db import create_db_engine
+from models import Base
+
+
+def temp_session_factory(filename: str = 'bench.db'):
+    """Create a fresh SQLite database in a temporary directory."""
+    path = os.path.join(tempfile.mkdtemp(prefix='salon-bench-'), filename)
+    engine = create_db_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine), path
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Summarize latency samples (in seconds) as milliseconds."""
+    ordered = sorted(samples)
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return {
+        'runs': len(ordered),
+        'mean_ms': statistics.fmean(ordered) * 1000,
+        'p50_ms': pick(0.50),
+        'p99_ms': pick(0.99),
+        'max_ms': ordered[-1] * 1000
+    }
+
+
+def measure(fn: Callable[[], object], runs: int = 100, warmup: int = 3) -> Dict[str, float]:
+    """Call fn repeatedly and return its latency percentiles."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def report(name: str, result: Dict[str, float]):
+    """Print one benchmark result line."""
+    fields = ', '.join(
+        f'{key}={value:.3f}' if isinstance(value, float) else f'{key}={value}'
+        for key, value in result.items()
+    )
+    print(f'{name}: {fields}')
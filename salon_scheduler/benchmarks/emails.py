@@ -0,0 +1,100 @@
+"""Deterministic synthetic appointment-request emails.
+
+Produces both Gmail API payloads (format='full') and raw RFC822 bytes, in
+a mix of plain, multipart/alternative and nested multipart/mixed layouts.
+"""
+import base64
+import random
+from datetime import date, timedelta
+from email.message import EmailMessage
+from typing import Iterator, List
+
+from config import SERVICES
+
+FIRST_NAMES = ['Ava', 'Ben', 'Chloe', 'Dev', 'Ella', 'Finn', 'Grace', 'Hugo', 'Isla', 'Jack']
+LAST_NAMES = ['Brown', 'Garcia', 'Khan', 'Lee', 'Martin', 'Nguyen', 'Okafor', 'Smith']
+TIME_FORMATS = ['{h12}:{m:02d} {ampm}', '{h24:02d}:{m:02d}', '{h12}{ampm_lower}']
+DATE_FORMATS = ['%Y-%m-%d', '%B %d, %Y', '%m/%d/%Y', '%A %d %B %Y']
+
+
+def request_body(rng: random.Random, start: date, complete: bool = True) -> str:
+    """Build one request body in the Field: value format the parser expects."""
+    day = start + timedelta(days=rng.randint(1, 30))
+    hour, minute = rng.randint(9, 16), rng.choice([0, 15, 30, 45])
+    fields = [
+        ('Name', f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'),
+        ('Service', rng.choice(list(SERVICES)).title()),
+        ('Date', day.strftime(rng.choice(DATE_FORMATS))),
+        ('Time', rng.choice(TIME_FORMATS).format(
+            h12=(hour - 1) % 12 + 1, h24=hour, m=minute,
+            ampm='PM' if hour >= 12 else 'AM', ampm_lower='pm' if hour >= 12 else 'am'
+        )),
+        ('Phone', f'555-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}')
+    ]
+    if not complete:
+        fields.pop(rng.randrange(len(fields)))
+    lines = ['Hello,', '', 'I would like to book an appointment.', '']
+    lines += [f'{label}: {value}' for label, value in fields]
+    lines += ['', 'Thanks!']
+    return '\n'.join(lines)
+
+
+def _b64(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode('utf-8')).decode('ascii')
+
+
+def gmail_message(message_id: str, sender: str, body: str, layout: str) -> dict:
+    """Wrap a body in a Gmail API payload with the given MIME layout."""
+    headers = [
+        {'name': 'From', 'value': sender},
+        {'name': 'Subject', 'value': 'Appointment Request'},
+        {'name': 'Date', 'value': 'Mon, 06 Jan 2025 09:30:00 -0500'}
+    ]
+    plain = {'mimeType': 'text/plain', 'body': {'data': _b64(body)}}
+    html = {'mimeType': 'text/html', 'body': {'data': _b64('<p>' + body.replace('\n', '<br>') + '</p>')}}
+    if layout == 'plain':
+        payload = dict(plain, headers=headers)
+    elif layout == 'alternative':
+        payload = {'mimeType': 'multipart/alternative', 'headers': headers, 'body': {}, 'parts': [plain, html]}
+    else:
+        payload = {
+            'mimeType': 'multipart/mixed', 'headers': headers, 'body': {},
+            'parts': [
+                {'mimeType': 'multipart/alternative', 'body': {}, 'parts': [html, plain]},
+                {'mimeType': 'application/pdf', 'filename': 'id.pdf', 'body': {'attachmentId': 'a1', 'size': 1024}}
+            ]
+        }
+    return {'id': message_id, 'threadId': message_id, 'labelIds': ['INBOX', 'UNREAD'], 'payload': payload}
+
+
+def rfc822_message(sender: str, body: str, layout: str) -> bytes:
+    """Build raw RFC822 bytes for a body with the given MIME layout."""
+    message = EmailMessage()
+    message['From'] = sender
+    message['To'] = 'salon@example.com'
+    message['Subject'] = 'Appointment Request'
+    message['Date'] = 'Mon, 06 Jan 2025 09:30:00 -0500'
+    message.set_content(body)
+    if layout != 'plain':
+        message.add_alternative('<p>' + body.replace('\n', '<br>') + '</p>', subtype='html')
+    if layout == 'mixed':
+        message.add_attachment(b'%PDF-1.4', maintype='application', subtype='pdf', filename='id.pdf')
+    return message.as_bytes()
+
+
+def request_corpus(count: int, seed: int = 7, incomplete_ratio: float = 0.1) -> Iterator[dict]:
+    """Yield dicts with a Gmail payload and the equivalent RFC822 bytes."""
+    rng = random.Random(seed)
+    start = date(2025, 1, 6)
+    for n in range(count):
+        sender = f'Client {n} <client{n}@example.com>'
+        body = request_body(rng, start, complete=rng.random() >= incomplete_ratio)
+        layout = rng.choice(['plain', 'alternative', 'mixed'])
+        yield {
+            'gmail': gmail_message(f'msg-{n}', sender, body, layout),
+            'raw': rfc822_message(sender, body, layout)
+        }
+
+
+def corpus_lists(count: int, seed: int = 7) -> List[dict]:
+    return list(request_corpus(count, seed))
@@ -0,0 +1,151 @@
+"""In-process stand-in for the Google Calendar API client used by CalendarManager.
+
+Supports `events().list/get/insert/delete`, batch requests, pagination and
+incremental sync tokens, including expired tokens (HTTP 410). Deleted
+events are kept as cancelled tombstones so incremental syncs report them.
+Every HTTP round trip is charged a fixed latency.
+"""
+import copy
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+import httplib2
+from dateutil import parser as date_parser
+from googleapiclient.errors import HttpError
+
+from benchmarks.fake_gmail import _Batch, _Request
+
+
+def _error(status: int, reason: bytes) -> HttpError:
+    return HttpError(httplib2.Response({'status': status}), reason)
+
+
+def _when(value: dict) -> datetime:
+    """Naive comparison key for an event start or end."""
+    text = value.get('dateTime') or value['date']
+    return date_parser.isoparse(text).replace(tzinfo=None)
+
+
+class _Events:
+    def __init__(self, calendar: 'FakeCalendarService'):
+        self.calendar = calendar
+
+    def list(self, calendarId: str, syncToken: Optional[str] = None, pageToken: Optional[str] = None,
+             maxResults: int = 250, singleEvents: bool = False, showDeleted: bool = False,
+             timeMin: Optional[str] = None, timeMax: Optional[str] = None):
+        def call():
+            calendar = self.calendar
+            if syncToken is not None:
+                if int(syncToken) < calendar.oldest_sync_sequence:
+                    raise _error(410, b'Sync token is no longer valid, a full sync is required.')
+                events = [e for e in calendar.events_by_id.values() if e['_sequence'] > int(syncToken)]
+            else:
+                events = [
+                    e for e in calendar.events_by_id.values()
+                    if showDeleted or e['status'] != 'cancelled'
+                ]
+            if timeMin:
+                lower = date_parser.isoparse(timeMin).replace(tzinfo=None)
+                events = [e for e in events if e['status'] == 'cancelled' or _when(e['end']) > lower]
+            if timeMax:
+                upper = date_parser.isoparse(timeMax).replace(tzinfo=None)
+                events = [e for e in events if e['status'] == 'cancelled' or _when(e['start']) < upper]
+
+            offset = int(pageToken or 0)
+            page = events[offset:offset + maxResults]
+            result = {'items': [calendar.public(e) for e in page]}
+            if offset + maxResults < len(events):
+                result['nextPageToken'] = str(offset + maxResults)
+            else:
+                result['nextSyncToken'] = str(calendar.sequence)
+            return result
+        return _Request(self.calendar, call)
+
+    def get(self, calendarId: str, eventId: str):
+        def call():
+            event = self.calendar.events_by_id.get(eventId)
+            if event is None:
+                raise _error(404, b'Not Found')
+            return self.calendar.public(event)
+        return _Request(self.calendar, call)
+
+    def insert(self, calendarId: str, body: dict):
+        def call():
+            event_id = body.get('id') or f'evt{self.calendar.sequence + 1}'
+            existing = self.calendar.events_by_id.get(event_id)
+            if existing is not None and existing['status'] != 'cancelled':
+                raise _error(409, b'The requested identifier already exists.')
+            return self.calendar.store(dict(copy.deepcopy(body), id=event_id, status='confirmed'))
+        return _Request(self.calendar, call)
+
+    def delete(self, calendarId: str, eventId: str):
+        def call():
+            event = self.calendar.events_by_id.get(eventId)
+            if event is None:
+                raise _error(404, b'Not Found')
+            if event['status'] == 'cancelled':
+                raise _error(410, b'Resource has been deleted')
+            self.calendar.store(dict(event, status='cancelled'))
+            return ''
+        return _Request(self.calendar, call)
+
+
+class FakeCalendarService:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.round_trips = 0
+        self.sequence = 0
+        self.oldest_sync_sequence = 0
+        self.events_by_id: Dict[str, dict] = {}
+
+    def round_trip(self):
+        self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def events(self):
+        return _Events(self)
+
+    def new_batch_http_request(self, callback=None):
+        return _Batch(self, callback)
+
+    def store(self, event: dict) -> dict:
+        """Save an event as the latest change."""
+        self.sequence += 1
+        event['_sequence'] = self.sequence
+        event['etag'] = f'"{self.sequence}"'
+        event['updated'] = datetime.utcnow().isoformat() + 'Z'
+        self.events_by_id[event['id']] = event
+        return self.public(event)
+
+    @staticmethod
+    def public(event: dict) -> dict:
+        return {k: copy.deepcopy(v) for k, v in event.items() if not k.startswith('_')}
+
+    def add_block(self, start: datetime, end: datetime, summary: str = 'Blocked',
+                  attendee: Optional[str] = None) -> str:
+        """Create an event directly in the calendar, as staff would."""
+        event = {
+            'id': f'blk{self.sequence + 1}',
+            'status': 'confirmed',
+            'summary': summary,
+            'start': {'dateTime': start.isoformat(), 'timeZone': 'America/New_York'},
+            'end': {'dateTime': end.isoformat(), 'timeZone': 'America/New_York'}
+        }
+        if attendee:
+            event['attendees'] = [{'email': attendee}]
+        return self.store(event)['id']
+
+    def move(self, event_id: str, start: datetime, end: datetime):
+        event = self.events_by_id[event_id]
+        self.store(dict(event, start=dict(event['start'], dateTime=start.isoformat()),
+                        end=dict(event['end'], dateTime=end.isoformat())))
+
+    def remove(self, event_id: str):
+        self.store(dict(self.events_by_id[event_id], status='cancelled'))
+
+    def expire_sync_tokens(self):
+        """Invalidate every sync token handed out so far."""
+        self.sequence += 1
+        self.oldest_sync_sequence = self.sequence
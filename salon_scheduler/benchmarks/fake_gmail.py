@@ -0,0 +1,180 @@
+"""In-process stand-in for the Gmail API client used by EmailHandler.
+
+Mirrors the `service.users().messages()...execute()` call chain closely
+enough to exercise pagination, batch requests, batchModify and the history
+API, and charges a fixed latency for every HTTP round trip. Sends and
+message fetches can be made to fail on demand.
+"""
+import base64
+import copy
+import time
+from typing import Callable, Dict, List, Optional, Set
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+
+class _Request:
+    def __init__(self, gmail: 'FakeGmailService', call: Callable[[], dict]):
+        self.gmail = gmail
+        self.call = call
+
+    def execute(self) -> dict:
+        self.gmail.round_trip()
+        return self.call()
+
+
+class _Batch:
+    def __init__(self, gmail: 'FakeGmailService', callback=None):
+        self.gmail = gmail
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request: _Request, callback=None, request_id: Optional[str] = None):
+        self.requests.append((request_id or str(len(self.requests)), request, callback or self.callback))
+
+    def execute(self):
+        self.gmail.round_trip()
+        for request_id, request, callback in self.requests:
+            try:
+                response, exception = request.call(), None
+            except HttpError as e:
+                response, exception = None, e
+            callback(request_id, response, exception)
+
+
+class _Messages:
+    def __init__(self, gmail: 'FakeGmailService'):
+        self.gmail = gmail
+
+    def list(self, userId: str, q: str = None, pageToken: Optional[str] = None, maxResults: int = 100):
+        def call():
+            matches = [m for m in self.gmail.mailbox.values() if self.gmail.matches_inbox_query(m)]
+            offset = int(pageToken or 0)
+            page = matches[offset:offset + maxResults]
+            result = {'messages': [{'id': m['id'], 'threadId': m['threadId']} for m in page]}
+            if offset + maxResults < len(matches):
+                result['nextPageToken'] = str(offset + maxResults)
+            return result
+        return _Request(self.gmail, call)
+
+    def get(self, userId: str, id: str, format: str = 'full'):
+        def call():
+            if id not in self.gmail.mailbox:
+                raise HttpError(httplib2.Response({'status': 404}), b'Not Found')
+            if id in self.gmail.get_failures:
+                raise HttpError(httplib2.Response({'status': 500}), b'Backend Error')
+            return copy.deepcopy(self.gmail.mailbox[id])
+        return _Request(self.gmail, call)
+
+    def modify(self, userId: str, id: str, body: dict):
+        return _Request(self.gmail, lambda: self.gmail.relabel([id], body))
+
+    def batchModify(self, userId: str, body: dict):
+        return _Request(self.gmail, lambda: self.gmail.relabel(body['ids'], body))
+
+    def send(self, userId: str, body: dict):
+        def call():
+            if self.gmail.send_failures:
+                self.gmail.send_failures -= 1
+                raise HttpError(httplib2.Response({'status': 503}), b'Backend Error')
+            self.gmail.sent.append(body)
+            return {'id': f'sent-{len(self.gmail.sent)}'}
+        return _Request(self.gmail, call)
+
+
+class _History:
+    def __init__(self, gmail: 'FakeGmailService'):
+        self.gmail = gmail
+
+    def list(self, userId: str, startHistoryId: str, historyTypes=None, labelId=None,
+             pageToken: Optional[str] = None, maxResults: int = 100):
+        def call():
+            start = int(startHistoryId)
+            if start < self.gmail.oldest_history_id:
+                raise HttpError(httplib2.Response({'status': 404}), b'Requested entity was not found.')
+            records = [r for r in self.gmail.history_records if r['id'] > start]
+            offset = int(pageToken or 0)
+            page = records[offset:offset + maxResults]
+            result = {
+                'history': [
+                    {'id': str(r['id']), 'messagesAdded': [{'message': {'id': r['message_id']}}]}
+                    for r in page
+                ],
+                'historyId': str(self.gmail.history_id)
+            }
+            if offset + maxResults < len(records):
+                result['nextPageToken'] = str(offset + maxResults)
+            return result
+        return _Request(self.gmail, call)
+
+
+class FakeGmailService:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.round_trips = 0
+        self.mailbox: Dict[str, dict] = {}
+        self.history_records: List[dict] = []
+        self.history_id = 1
+        self.oldest_history_id = 1
+        self.sent: List[dict] = []
+        self.send_failures = 0  # How many of the next sends fail with a 503
+        self.get_failures: Set[str] = set()  # Message ids whose get fails with a 500
+
+    def round_trip(self):
+        self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return _Messages(self)
+
+    def history(self):
+        return _History(self)
+
+    def getProfile(self, userId: str):
+        return _Request(self, lambda: {'historyId': str(self.history_id)})
+
+    def new_batch_http_request(self, callback=None):
+        return _Batch(self, callback)
+
+    def deliver(self, sender: str, body: str, subject: str = 'Appointment Request') -> str:
+        """Add an unread inbox message and record it in the mailbox history."""
+        self.history_id += 1
+        message_id = f'msg-{self.history_id}'
+        self.mailbox[message_id] = {
+            'id': message_id,
+            'threadId': message_id,
+            'historyId': str(self.history_id),
+            'labelIds': ['INBOX', 'UNREAD'],
+            'payload': {
+                'mimeType': 'text/plain',
+                'headers': [
+                    {'name': 'From', 'value': sender},
+                    {'name': 'Subject', 'value': subject},
+                    {'name': 'Date', 'value': time.strftime('%a, %d %b %Y %H:%M:%S +0000', time.gmtime())}
+                ],
+                'body': {'data': base64.urlsafe_b64encode(body.encode('utf-8')).decode('ascii')}
+            }
+        }
+        self.history_records.append({'id': self.history_id, 'message_id': message_id})
+        return message_id
+
+    def relabel(self, message_ids: List[str], body: dict) -> dict:
+        for message_id in message_ids:
+            labels = self.mailbox[message_id]['labelIds']
+            for label in body.get('removeLabelIds', []):
+                if label in labels:
+                    labels.remove(label)
+            labels.extend(l for l in body.get('addLabelIds', []) if l not in labels)
+        self.history_id += 1
+        return {}
+
+    @staticmethod
+    def matches_inbox_query(message: dict) -> bool:
+        labels = message['labelIds']
+        subject = next(h['value'] for h in message['payload']['headers'] if h['name'] == 'Subject')
+        return 'INBOX' in labels and 'UNREAD' in labels and 'appointment request' in subject.lower()
@@ -0,0 +1,151 @@
+"""Deterministic synthetic salon data at configurable scale.
+
+Fills Client, Stylist, Service, Appointment and EmailLog with the same
+rows for the same arguments: the configured stylists and services plus any
+number of extra stylists, a client base, and `years` of history up to the
+anchor day followed by a month of future bookings, each with the emails a
+booking produces. Run it on its own to build a database to poke at:
+
+    python -m benchmarks.generate --stylists 12 --years 2 --bookings-per-day 60
+"""
+import argparse
+import random
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+
+from config import BUSINESS_HOURS, MAX_ADVANCE_DAYS, SERVICES, STYLISTS
+from models import Appointment, AppointmentStatus, Client, EmailLog, Stylist
+from availability import WEEKDAYS
+from scheduler import Scheduler
+from benchmarks.emails import FIRST_NAMES, LAST_NAMES
+from benchmarks.common import temp_session_factory
+
+INSERT_BATCH = 50000
+
+
+def _insert(session, table, rows: List[dict]):
+    for start in range(0, len(rows), INSERT_BATCH):
+        session.execute(table.insert(), rows[start:start + INSERT_BATCH])
+
+
+def generate(Session, stylists: int = len(STYLISTS), years: float = 1, bookings_per_day: int = 30,
+             clients: int = 5000, anchor: Optional[date] = None, future_days: int = MAX_ADVANCE_DAYS,
+             future_fill: float = 0.5, seed: int = 42) -> Dict[str, int]:
+    """Fill an empty database and return how many rows of each kind were written.
+
+    `stylists` counts the configured ones first; extra stylists get random
+    specialties and the salon's business hours. Past appointments are
+    mostly completed with some cancellations. Days from the anchor on are
+    only `future_fill` as busy, as a real diary is, and confirmed.
+    """
+    rng = random.Random(seed)
+    anchor = anchor or date.today()
+    session = Session()
+    try:
+        catalog = Scheduler(Session).catalog.get()
+
+        staff = [(catalog.stylist_ids[key], info['specialties']) for key, info in STYLISTS.items()]
+        extra = []
+        for n in range(len(staff), stylists):
+            specialties = rng.sample(list(SERVICES), rng.randint(1, 3))
+            extra.append((Stylist(name=f'Synthetic Stylist {n}', email=f'stylist{n}@salon.local',
+                                  specialties=','.join(specialties)), specialties))
+        session.add_all([row for row, _ in extra])
+        session.flush()
+        staff += [(row.id, specialties) for row, specialties in extra]
+
+        client_rows = [
+            {
+                'name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                'email': f'client{n}@example.com',
+                'phone': f'555-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}',
+                'created_at': datetime.combine(anchor, datetime.min.time()) - timedelta(days=rng.randint(0, 365 * 5))
+            }
+            for n in range(clients)
+        ]
+        _insert(session, Client.__table__, client_rows)
+        client_ids = [row[0] for row in session.query(Client.id).order_by(Client.id).all()]
+
+        first_day = anchor - timedelta(days=int(years * 365))
+        appointments = []
+        day = first_day
+        while day <= anchor + timedelta(days=future_days):
+            hours = BUSINESS_HOURS[WEEKDAYS[day.weekday()]]
+            if hours and day not in catalog.holidays:
+                # Each stylist works through the day from opening, so bookings never overlap
+                cursors = {index: datetime.combine(day, hours['start']) for index in range(len(staff))}
+                close = datetime.combine(day, hours['end'])
+                for _ in range(bookings_per_day if day < anchor else int(bookings_per_day * future_fill)):
+                    index = rng.randrange(len(staff))
+                    stylist_id, specialties = staff[index]
+                    service = rng.choice(specialties)
+                    start = cursors[index] + timedelta(minutes=rng.choice([0, 0, 15, 30]))
+                    end = start + timedelta(minutes=SERVICES[service]['duration'])
+                    if end > close:
+                        continue
+                    cursors[index] = end + timedelta(minutes=15)
+                    if day >= anchor:
+                        status = AppointmentStatus.CONFIRMED
+                    else:
+                        status = AppointmentStatus.CANCELLED if rng.random() < 0.08 else AppointmentStatus.COMPLETED
+                    appointments.append({
+                        'client_id': rng.choice(client_ids),
+                        'stylist_id': stylist_id,
+                        'service_id': catalog.service_ids[service],
+                        'start_time': start,
+                        'end_time': end,
+                        'status': status,
+                        'created_at': start - timedelta(days=rng.randint(1, 30))
+                    })
+            day += timedelta(days=1)
+        # Rows inserted in one go get consecutive ids after the current highest
+        first_id = (session.query(func.max(Appointment.id)).scalar() or 0) + 1
+        _insert(session, Appointment.__table__, appointments)
+
+        emails = []
+        for offset, row in enumerate(appointments):
+            appointment_id = first_id + offset
+            emails.append({
+                'appointment_id': appointment_id, 'email_type': 'confirmation',
+                'recipient': f"client{row['client_id']}@example.com", 'subject': 'Appointment Confirmation',
+                'sent_at': row['created_at'], 'status': 'sent'
+            })
+            if row['status'] == AppointmentStatus.COMPLETED:
+                emails.append({
+                    'appointment_id': appointment_id, 'email_type': 'reminder',
+                    'recipient': f"client{row['client_id']}@example.com", 'subject': 'Appointment Reminder',
+                    'sent_at': row['start_time'] - timedelta(days=1),
+                    'status': 'failed' if rng.random() < 0.01 else 'sent'
+                })
+        _insert(session, EmailLog.__table__, emails)
+        session.commit()
+        return {
+            'stylists': len(staff),
+            'clients': len(client_rows),
+            'appointments': len(appointments),
+            'email_logs': len(emails)
+        }
+    finally:
+        session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stylists', type=int, default=len(STYLISTS))
+    parser.add_argument('--years', type=float, default=1)
+    parser.add_argument('--bookings-per-day', type=int, default=30)
+    parser.add_argument('--clients', type=int, default=5000)
+    parser.add_argument('--anchor', type=date.fromisoformat, default=None, help='last day of history (default today)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    Session, path = temp_session_factory()
+    counts = generate(Session, args.stylists, args.years, args.bookings_per_day, args.clients, anchor=args.anchor,
+                      seed=args.seed)
+    print(f"{path}: " + ', '.join(f'{count} {kind}' for kind, count in counts.items()))
+
+
+if __name__ == '__main__':
+    main()
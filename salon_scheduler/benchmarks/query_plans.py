@@ -0,0 +1,119 @@
+"""Query-plan regression check for the hot appointment and email log queries.
+
+Runs the real query paths against a SQLite database, captures
+`EXPLAIN QUERY PLAN` for every statement they issue and exits non-zero if
+any of them falls back to a full scan of a large table. The database is
+filled by benchmarks.generate and ANALYZEd first: on empty tables the
+planner has no statistics and may pick plans it never would on real data.
+tests/test_query_plans.py runs the same check under pytest.
+"""
+import re
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+from sqlalchemy import event
+
+from models import Appointment, AppointmentStatus, EmailLog, init_db
+from scheduler import Scheduler
+from pagination import appointments_page, clients_page, encode_cursor
+from benchmarks.common import temp_session_factory
+from benchmarks.generate import generate
+
+LARGE_TABLES = ('appointments', 'email_logs')
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+@contextmanager
+def capture_plans(engine, plans: List[Tuple[str, List[str]]]):
+    """Record the query plan of every SELECT executed on the engine."""
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+            plans.append((statement, [row[3] for row in cursor.fetchall()]))
+
+    event.listen(engine, 'before_cursor_execute', explain)
+    try:
+        yield plans
+    finally:
+        event.remove(engine, 'before_cursor_execute', explain)
+
+
+def hot_queries(Session, scheduler: Scheduler):
+    """Exercise every query on the booking and admin hot paths."""
+    now = datetime.now()
+    scheduler.find_available_slots('haircut', days=30)
+    scheduler.find_available_slots('color', preferred_date=now + timedelta(days=3), stylist_id='alice')
+    scheduler.get_upcoming_appointments(7)
+
+    session = Session()
+    day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    # admin.dashboard(): today's appointments
+    session.query(Appointment).filter(
+        Appointment.start_time >= day_start,
+        Appointment.start_time < day_start + timedelta(days=1)
+    ).all()
+    # admin.appointments() and /api/appointments: keyset pages, newest first
+    appointments_page(session)
+    appointments_page(session, encode_cursor(now, 1000))
+    clients_page(session, encode_cursor(1000))
+    # Upcoming confirmed appointments by status
+    session.query(Appointment).filter(
+        Appointment.status == AppointmentStatus.CONFIRMED,
+        Appointment.start_time >= now
+    ).all()
+    # Per-stylist schedule
+    session.query(Appointment).filter(
+        Appointment.stylist_id == 1,
+        Appointment.start_time >= day_start,
+        Appointment.start_time < day_start + timedelta(days=1)
+    ).all()
+    # Has a given email already been sent for an appointment?
+    session.query(EmailLog).filter_by(appointment_id=1, email_type='reminder').first()
+    session.close()
+
+
+def seeded_database(years: float = 0.25, bookings_per_day: int = 30):
+    """A temporary database with a few months of generated history and planner statistics."""
+    Session, path = temp_session_factory()
+    engine = Session.kw['bind']
+    init_db(engine)
+    generate(Session, years=years, bookings_per_day=bookings_per_day, clients=1000)
+    with engine.connect() as connection:
+        connection.exec_driver_sql('ANALYZE')
+    return Session, path
+
+
+def hot_query_plans(Session) -> List[Tuple[str, List[str]]]:
+    """(statement, plan details) for every SELECT the hot paths issue."""
+    plans: List[Tuple[str, List[str]]] = []
+    with capture_plans(Session.kw['bind'], plans):
+        hot_queries(Session, Scheduler(Session))
+    return plans
+
+
+def full_scans(details: List[str]) -> List[str]:
+    """The plan steps that scan a whole large table."""
+    return [d for d in details if FULL_SCAN.match(d) and FULL_SCAN.match(d).group(1) in LARGE_TABLES]
+
+
+def main() -> int:
+    Session, path = seeded_database()
+    plans = hot_query_plans(Session)
+
+    failures = 0
+    for statement, details in plans:
+        scans = full_scans(details)
+        status = 'FULL SCAN' if scans else 'ok'
+        failures += bool(scans)
+        print(f"[{status}] {' '.join(statement.split())[:120]}")
+        for detail in details:
+            print(f'    {detail}')
+
+    print(f'{len(plans)} queries checked, {failures} full scans')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""Reproducible benchmark suite with JSON results.
+
+Generates a salon database with benchmarks.generate, then times slot
+search, booking, dashboard queries and rendering, email parsing and email
+template rendering. Results go to a JSON file (benchmarks/results/ by
+default) together with the dataset size, git commit and Python version,
+and --compare prints how each case moved against an earlier run:
+
+    python -m benchmarks.suite --years 2 --bookings-per-day 40
+    python -m benchmarks.suite --compare benchmarks/results/<earlier>.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List
+
+from config import EMAIL_TEMPLATES, SERVICES, STYLISTS
+from email_handler import EmailHandler
+from email_parser import EmailRequestParser
+from scheduler import Scheduler
+from stats import dashboard_cache, dashboard_stats
+from benchmarks.common import measure, temp_session_factory
+from benchmarks.emails import corpus_lists
+from benchmarks.fake_gmail import FakeGmailService
+from benchmarks.generate import generate
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+EMAIL_TEMPLATE_SOURCES = {
+    'acknowledgment': '<p>Hi {{ client_name }},</p><p>{{ salon_name }} has your request.</p>'
+                      '<p>&copy; {{ current_year }}</p>',
+    'confirmation': '<p>Hi {{ client_name }},</p><p>Your {{ service }} with {{ stylist_name }} is confirmed '
+                    'for {{ start_time }} until {{ end_time }}.</p>',
+    'reminder': '<p>Hi {{ client_name }},</p><p>See you at {{ start_time }} for your {{ service }}.</p>',
+    'missing_info': '<p>Please send:</p><ul>{% for field in missing_fields %}<li>{{ field }}</li>{% endfor %}</ul>'
+                    '<p>We offer {{ services_list | join(", ") }}.</p>',
+    'alternatives': '<p>Hi {{ client_name }}, {{ requested_time }} is taken.</p><ul>'
+                    '{% for slot in alternative_slots %}<li>{{ slot.strftime("%A %d %B, %H:%M") }}</li>{% endfor %}'
+                    '</ul>'
+}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def slot_search_cases(scheduler: Scheduler, now: datetime) -> Dict[str, Callable]:
+    # Searches run uncached, so results stay comparable with runs from before the slot cache
+    cache = scheduler.slot_cache.entries
+    cases = {}
+    for service in SERVICES:
+        cases[f'slot_search.{service}.1_day'] = lambda service=service: (
+            cache.invalidate(), scheduler.find_available_slots(service, now + timedelta(days=2), now=now))
+        cases[f'slot_search.{service}.30_days'] = lambda service=service: (
+            cache.invalidate(), scheduler.find_available_slots(service, days=30, now=now))
+    return cases
+
+
+def booking_case(scheduler: Scheduler) -> Callable:
+    """Each call books the next free slot, as a client replying to an offer would."""
+    openings = []
+    for service in SERVICES:
+        for slot, stylists in scheduler.find_available_slots(service, days=30):
+            openings.append((slot, service, stylists[0]))
+    # Spread across the month so no day hits the daily limit before the runs are done
+    openings.sort(key=lambda opening: (opening[0].hour, opening[0].minute, opening[0]))
+    calls = iter(range(len(openings)))
+
+    def book():
+        while True:
+            slot, service, stylist = openings[next(calls)]
+            try:
+                n = slot.toordinal() + slot.hour * 60 + slot.minute
+                return scheduler.schedule_appointment(f'Bench {n}', service, slot, stylist,
+                                                      client_email=f'bench{n}@example.com')
+            except ValueError:
+                continue
+    return book
+
+
+def template_root() -> str:
+    root = tempfile.mkdtemp(prefix='salon-templates-')
+    for kind, source in EMAIL_TEMPLATE_SOURCES.items():
+        path = os.path.join(root, EMAIL_TEMPLATES[kind])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(source)
+    return root
+
+
+def template_cases(now: datetime) -> Dict[str, Callable]:
+    handler = EmailHandler(service=FakeGmailService(0), template_root=template_root())
+    appointment = {
+        'client_name': 'Ava Brown', 'service': 'color', 'stylist_name': STYLISTS['alice']['name'],
+        'start_time': now.isoformat(), 'end_time': (now + timedelta(hours=2)).isoformat()
+    }
+    contexts = {
+        'acknowledgment': {'client_name': 'Ava Brown', 'salon_name': 'Our Salon', 'current_year': now.year},
+        'confirmation': appointment,
+        'reminder': appointment,
+        'missing_info': {'missing_fields': ['date', 'time'], 'services_list': list(SERVICES)},
+        'alternatives': {'client_name': 'Ava Brown', 'requested_time': now,
+                         'alternative_slots': [now + timedelta(hours=h) for h in (1, 2, 3)]}
+    }
+    return {
+        f'template_render.{kind}': lambda kind=kind: handler._get_template(EMAIL_TEMPLATES[kind]).render(
+            **contexts[kind])
+        for kind in contexts
+    }
+
+
+def parsing_case(count: int) -> Callable:
+    messages = [item['gmail'] for item in corpus_lists(count)]
+    parser = EmailRequestParser()
+    return lambda: [parser.parse_gmail_message(message) for message in messages]
+
+
+def dashboard_cases(Session, scheduler: Scheduler, now: datetime) -> Dict[str, Callable]:
+    from admin import create_app
+    client = create_app(session_factory=Session, scheduler=scheduler).test_client()
+    catalog = scheduler.catalog.get()
+
+    def stats():
+        session = Session()
+        try:
+            return dashboard_stats(session, now, catalog)
+        finally:
+            session.close()
+
+    def render_uncached():
+        dashboard_cache.invalidate()
+        return client.get('/')
+
+    return {
+        'dashboard.stats_query': stats,
+        'dashboard.render_uncached': render_uncached,
+        'dashboard.render_cached': lambda: client.get('/')
+    }
+
+
+def compare(previous: dict, current: dict) -> List[str]:
+    """One line per case: p50 before and after."""
+    lines = []
+    for name, result in current['results'].items():
+        before = previous.get('results', {}).get(name)
+        if before is None:
+            lines.append(f'{name}: new, p50 {result["p50_ms"]:.3f} ms')
+            continue
+        change = (result['p50_ms'] / before['p50_ms'] - 1) * 100 if before['p50_ms'] else 0.0
+        lines.append(f'{name}: p50 {before["p50_ms"]:.3f} -> {result["p50_ms"]:.3f} ms ({change:+.1f}%)')
+    return lines
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stylists', type=int, default=len(STYLISTS))
+    parser.add_argument('--years', type=float, default=1)
+    parser.add_argument('--bookings-per-day', type=int, default=30)
+    parser.add_argument('--clients', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--runs', type=int, default=100)
+    parser.add_argument('--emails', type=int, default=1000, help='messages per parsing run')
+    parser.add_argument('--only', default='', help='comma-separated case name prefixes to run')
+    parser.add_argument('--output', help='result file (default benchmarks/results/<timestamp>.json)')
+    parser.add_argument('--compare', help='earlier result file to compare against')
+    args = parser.parse_args()
+
+    Session, path = temp_session_factory()
+    now = datetime.combine(date.today(), datetime.min.time()) + timedelta(hours=8)
+    dataset = generate(Session, args.stylists, args.years, args.bookings_per_day, args.clients, seed=args.seed)
+    print(f"Generated {path}: " + ', '.join(f'{count} {kind}' for kind, count in dataset.items()))
+    scheduler = Scheduler(Session)
+
+    cases: Dict[str, Callable] = {}
+    cases.update(slot_search_cases(scheduler, now))
+    cases['booking.schedule_appointment'] = booking_case(scheduler)
+    cases.update(dashboard_cases(Session, scheduler, now))
+    cases[f'email_parse.{args.emails}_messages'] = parsing_case(args.emails)
+    cases.update(template_cases(now))
+    prefixes = [prefix for prefix in args.only.split(',') if prefix]
+    if prefixes:
+        cases = {name: fn for name, fn in cases.items() if any(name.startswith(p) for p in prefixes)}
+
+    results = {}
+    for name, fn in cases.items():
+        results[name] = measure(fn, runs=args.runs)
+        print(f"{name}: p50 {results[name]['p50_ms']:.3f} ms, p99 {results[name]['p99_ms']:.3f} ms")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'arguments': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')}
+        },
+        'dataset': dataset,
+        'results': results
+    }
+    output = args.output or os.path.join(RESULTS_DIR, datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Wrote {output}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            print('\n'.join(compare(json.load(f), report)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Thread-safe in-process cache whose entries expire after a fixed time."""
+
+    def __init__(self, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] <= self.clock():
+                del self._entries[key]
+                return default
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            now = self.clock()
+            # Drop expired entries too, so keys that are never read again do not pile up
+            for stale in [k for k, (expires, _) in self._entries.items() if expires <= now]:
+                del self._entries[stale]
+            self._entries[key] = (now + self.ttl, value)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached value, computing and storing it on a miss."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Hashable = None):
+        """Drop one entry, or every entry when no key is given."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+class LRUCache:
+    """Thread-safe cache held to a size budget, evicting the least recently used entries first.
+
+    `size` estimates an entry's bytes; entries also expire after `ttl`
+    seconds when one is given.
+    """
+
+    def __init__(self, max_bytes: int, size: Callable[[Any], int] = sys.getsizeof, ttl: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_bytes = max_bytes
+        self.size = size
+        self.ttl = ttl
+        self.clock = clock
+        self.bytes = 0
+        self.evictions = 0
+        self._entries: 'OrderedDict[Hashable, Tuple[Optional[float], int, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] is not None and entry[0] <= self.clock():
+                self._remove(key)
+                return default
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, key: Hashable, value: Any):
+        size = self.size(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+            expires = self.clock() + self.ttl if self.ttl is not None else None
+            self._entries[key] = (expires, size, value)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable = None):
+        """Drop one entry, or every entry when no key is given."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self.bytes = 0
+            elif key in self._entries:
+                self._remove(key)
+
+    def _remove(self, key: Hashable):
+        self.bytes -= self._entries.pop(key)[1]
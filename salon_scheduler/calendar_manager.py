@@ -0,0 +1,324 @@
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pytz
+from dateutil import parser as date_parser
+from sqlalchemy import bindparam, delete, select, update
+
+from config import CALENDAR_TIMEZONE, DEFAULT_LOCATION, GOOGLE_CALENDAR_ID, SERVICES
+from models import Appointment, AppointmentStatus, CalendarEvent, Client, Service, Stylist
+from instrumentation import api_method, timed
+from google_services import google_services
+from slot_cache import slot_versions
+
+SYNC_TOKEN_KEY = 'calendar_sync_token'
+CALENDAR_BATCH_SIZE = 50   # Calls per batch HTTP request
+LIST_PAGE_SIZE = 2500      # Largest page events.list returns
+EVENT_ID_PREFIX = 'salon'  # Event ids may only use the characters a-v and 0-9
+
+
+def appointment_event_id(appointment_id: int, location_id: str = DEFAULT_LOCATION) -> str:
+    """Deterministic event id for an appointment, so a repeated insert is harmless.
+
+    Appointment ids are only unique within a location's database, and
+    locations may share a calendar, so the id also carries the location,
+    hex-encoded and ended by a 'v' (which hex never uses).
+    """
+    return f'{EVENT_ID_PREFIX}{location_id.encode("utf-8").hex()}v{appointment_id:06d}'
+
+
+class CalendarManager:
+    """Keeps Google Calendar and a local mirror of it in step.
+
+    Availability checks read the calendar_events table and never call the
+    API. `sync` pulls changes into the mirror with the Calendar API's
+    incremental sync tokens, and `flush` pushes pending writes in batch
+    requests. Pending writes are derived from the appointments table:
+    confirmed appointments without an event need one created, and
+    cancelled appointments whose event is still mirrored need it deleted.
+    Events record the location that made them, and events made by another
+    location sharing the calendar are left out of the mirror.
+    """
+
+    def __init__(self, session_factory, token_path: Optional[str] = None, service=None,
+                 state_store=None, calendar_id: Optional[str] = None, location_id: str = DEFAULT_LOCATION):
+        self.credentials = None
+        if service is None:
+            provider = google_services(token_path)
+            self.credentials = provider.credentials
+            service = provider.calendar()
+        self.service = service
+        self.Session = session_factory
+        self.state_store = state_store
+        self.calendar_id = calendar_id or GOOGLE_CALENDAR_ID or 'primary'
+        self.location_id = location_id
+        self.timezone = pytz.timezone(CALENDAR_TIMEZONE)
+        self._local = threading.local()
+
+    def _execute(self, request):
+        """Execute an API request on this thread's own HTTP connection."""
+        with timed('calendar_request', method=api_method(request)):
+            if self.credentials is None:
+                return request.execute()
+            http = getattr(self._local, 'http', None)
+            if http is None:
+                import httplib2
+                from google_auth_httplib2 import AuthorizedHttp
+                http = self._local.http = AuthorizedHttp(self.credentials, http=httplib2.Http())
+            return request.execute(http=http)
+
+    # Reading the calendar
+
+    def _list_events(self, sync_token: Optional[str]) -> Tuple[List[dict], Optional[str]]:
+        """List every event, or only those changed since a sync token, following pagination."""
+        events = []
+        page_token = None
+        while True:
+            params = {
+                'calendarId': self.calendar_id,
+                'singleEvents': True,
+                'maxResults': LIST_PAGE_SIZE,
+                'pageToken': page_token
+            }
+            if sync_token:
+                params['syncToken'] = sync_token
+            results = self._execute(self.service.events().list(**params))
+            events.extend(results.get('items', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return events, results.get('nextSyncToken')
+
+    def _to_local(self, when: dict) -> Optional[datetime]:
+        """Convert an event start or end to naive salon-local time."""
+        if 'dateTime' in when:
+            value = date_parser.isoparse(when['dateTime'])
+            if value.tzinfo is None:
+                return value
+            return value.astimezone(self.timezone).replace(tzinfo=None)
+        if 'date' in when:
+            return datetime.combine(date_parser.isoparse(when['date']).date(), datetime.min.time())
+        return None
+
+    def _event_row(self, event: dict, stylists_by_email: Dict[str, int]) -> Optional[dict]:
+        """Map an event to a mirror row, or None if it does not take up time here."""
+        if event.get('status') == 'cancelled' or event.get('transparency') == 'transparent':
+            return None
+        start_time = self._to_local(event.get('start', {}))
+        end_time = self._to_local(event.get('end', {}))
+        if start_time is None or end_time is None:
+            return None
+
+        private = event.get('extendedProperties', {}).get('private', {})
+        # Another location's appointment, whose ids mean nothing in this database;
+        # events from before locations were recorded belong to the default one
+        if 'appointment_id' in private and private.get('location_id', DEFAULT_LOCATION) != self.location_id:
+            return None
+        stylist_id = int(private['stylist_id']) if 'stylist_id' in private else None
+        if stylist_id is None:
+            # Time blocked in the calendar belongs to a stylist who is invited
+            stylist_id = next((
+                stylists_by_email[attendee['email'].lower()]
+                for attendee in event.get('attendees', [])
+                if attendee.get('email', '').lower() in stylists_by_email
+            ), None)
+
+        return {
+            'event_id': event['id'],
+            'appointment_id': int(private['appointment_id']) if 'appointment_id' in private else None,
+            'stylist_id': stylist_id,
+            'summary': (event.get('summary') or '')[:500],
+            'start_time': start_time,
+            'end_time': end_time,
+            'etag': event.get('etag'),
+            'updated_at': datetime.utcnow()
+        }
+
+    @timed('calendar_sync')
+    def sync(self) -> int:
+        """Pull calendar changes into the mirror and return how many events changed.
+
+        Resumes from the stored sync token; without one, or once Google has
+        expired it (HTTP 410), the whole calendar is listed and the mirror
+        rebuilt.
+        """
+        from googleapiclient.errors import HttpError
+
+        sync_token = self.state_store.get(SYNC_TOKEN_KEY) if self.state_store else None
+        full = not sync_token
+        try:
+            events, next_token = self._list_events(sync_token)
+        except HttpError as e:
+            if full or e.resp.status != 410:
+                raise
+            full = True
+            events, next_token = self._list_events(None)
+
+        session = self.Session()
+        try:
+            stylists_by_email = {
+                email.lower(): stylist_id
+                for stylist_id, email in session.execute(select(Stylist.id, Stylist.email))
+            }
+            rows = [row for row in (self._event_row(event, stylists_by_email) for event in events) if row]
+            if full:
+                session.execute(delete(CalendarEvent))
+            else:
+                changed = [event['id'] for event in events]
+                for i in range(0, len(changed), 500):
+                    session.execute(delete(CalendarEvent).where(CalendarEvent.event_id.in_(changed[i:i + 500])))
+            if rows:
+                session.execute(CalendarEvent.__table__.insert(), rows)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+        if events:
+            # Blocks in the mirror close slots, and cached searches cannot tell which days moved
+            slot_versions.bump_all()
+        if self.state_store and next_token:
+            self.state_store.set(SYNC_TOKEN_KEY, next_token)
+        return len(events)
+
+    # Writing to the calendar
+
+    def _event_body(self, appointment_id: int, stylist_id: int, start_time: datetime, end_time: datetime,
+                    client_name: str, service_name: str, stylist_name: str, notes: Optional[str]) -> dict:
+        return {
+            'id': appointment_event_id(appointment_id, self.location_id),
+            'summary': f"{SERVICES.get(service_name, {}).get('description', service_name)} - {client_name}",
+            'description': f"Stylist: {stylist_name}" + (f"\n{notes}" if notes else ''),
+            'start': {'dateTime': start_time.isoformat(), 'timeZone': CALENDAR_TIMEZONE},
+            'end': {'dateTime': end_time.isoformat(), 'timeZone': CALENDAR_TIMEZONE},
+            'extendedProperties': {'private': {
+                'appointment_id': str(appointment_id),
+                'stylist_id': str(stylist_id),
+                'location_id': self.location_id
+            }}
+        }
+
+    def _pending_writes(self, now: datetime) -> Tuple[List[dict], List[str]]:
+        """Return event bodies to insert and event ids to delete."""
+        session = self.Session()
+        try:
+            to_create = session.execute(select(
+                Appointment.id, Appointment.stylist_id, Appointment.start_time, Appointment.end_time,
+                Client.name, Service.name, Stylist.name, Appointment.notes
+            ).join(Client, Appointment.client_id == Client.id).join(
+                Service, Appointment.service_id == Service.id
+            ).join(
+                Stylist, Appointment.stylist_id == Stylist.id
+            ).where(
+                Appointment.status == AppointmentStatus.CONFIRMED,
+                Appointment.start_time >= now - timedelta(days=1),
+                Appointment.event_id.is_(None)
+            )).all()
+            to_delete = session.execute(select(CalendarEvent.event_id).join(
+                Appointment, CalendarEvent.appointment_id == Appointment.id
+            ).where(Appointment.status == AppointmentStatus.CANCELLED)).scalars().all()
+        finally:
+            session.close()
+        return [self._event_body(*row) for row in to_create], list(to_delete)
+
+    def _run_batches(self, requests: List[Tuple[str, object]]) -> Dict[str, Tuple[Optional[dict], Optional[Exception]]]:
+        """Execute (request_id, request) pairs in batch HTTP requests."""
+        responses = {}
+
+        def store(request_id, response, exception):
+            responses[request_id] = (response, exception)
+
+        for i in range(0, len(requests), CALENDAR_BATCH_SIZE):
+            batch = self.service.new_batch_http_request(callback=store)
+            for request_id, request in requests[i:i + CALENDAR_BATCH_SIZE]:
+                batch.add(request, request_id=request_id)
+            self._execute(batch)
+        return responses
+
+    @timed('calendar_flush')
+    def flush(self, now: Optional[datetime] = None) -> Tuple[int, int]:
+        """Push pending event inserts and deletes, returning how many of each succeeded.
+
+        Failed writes stay pending and are retried by the next flush. Event
+        ids are derived from the location and appointment ids, so an insert
+        that reached Google but was not recorded here comes back as 409; it
+        counts as done once the existing event is read back and found to be
+        this location's event for the same appointment.
+        """
+        now = now or datetime.now(self.timezone).replace(tzinfo=None)
+        bodies, event_ids = self._pending_writes(now)
+        if not bodies and not event_ids:
+            return 0, 0
+
+        responses = self._run_batches(
+            [(body['id'], self.service.events().insert(calendarId=self.calendar_id, body=body)) for body in bodies]
+            + [(event_id, self.service.events().delete(calendarId=self.calendar_id, eventId=event_id))
+               for event_id in event_ids]
+        )
+
+        def failed_with(request_id: str) -> Optional[int]:
+            response, exception = responses.get(request_id, (None, None))
+            return exception.resp.status if exception is not None else None
+
+        def succeeded(request_id: str, done_statuses: Tuple[int, ...]) -> bool:
+            status = failed_with(request_id)
+            if status is None:
+                return request_id in responses
+            if status in done_statuses:
+                return True
+            if status != 409:
+                print(f"Error writing calendar event {request_id}: {str(responses[request_id][1])}")
+            return False
+
+        created = [body for body in bodies if succeeded(body['id'], ())]
+        created.extend(self._already_created([body for body in bodies if failed_with(body['id']) == 409]))
+        deleted = [event_id for event_id in event_ids if succeeded(event_id, (404, 410))]
+
+        session = self.Session()
+        try:
+            if created:
+                session.execute(
+                    update(Appointment.__table__)
+                    .where(Appointment.__table__.c.id == bindparam('appointment_id'))
+                    .values(event_id=bindparam('new_event_id')),
+                    [{'appointment_id': int(body['extendedProperties']['private']['appointment_id']),
+                      'new_event_id': body['id']} for body in created]
+                )
+                ids = [body['id'] for body in created]
+                session.execute(delete(CalendarEvent).where(CalendarEvent.event_id.in_(ids)))
+                session.execute(CalendarEvent.__table__.insert(), [
+                    self._event_row(dict(body, status='confirmed'), {}) for body in created
+                ])
+            if deleted:
+                session.execute(delete(CalendarEvent).where(CalendarEvent.event_id.in_(deleted)))
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+        return len(created), len(deleted)
+
+    def _already_created(self, bodies: List[dict]) -> List[dict]:
+        """Of the inserts that came back 409, those whose existing event is the one they would have made."""
+        if not bodies:
+            return []
+        responses = self._run_batches([
+            (body['id'], self.service.events().get(calendarId=self.calendar_id, eventId=body['id']))
+            for body in bodies
+        ])
+        done = []
+        for body in bodies:
+            event, exception = responses.get(body['id'], (None, None))
+            if event is None:
+                print(f"Error reading calendar event {body['id']}: {str(exception)}")
+                continue
+            private = event.get('extendedProperties', {}).get('private', {})
+            expected = body['extendedProperties']['private']
+            if all(private.get(key) == expected[key] for key in ('appointment_id', 'location_id')):
+                done.append(body)
+            else:
+                print(f"Error writing calendar event {body['id']}: the id belongs to another event")
+        return done
@@ -0,0 +1,216 @@
+"""Services, stylists and opening hours, with the lookups the hot paths need.
+
+config.py defines the catalog and the Service and Stylist tables mirror it
+so appointments can reference rows by id. CatalogStore builds an immutable
+Catalog snapshot once, writes any differences into those tables, and
+rebuilds the snapshot when config.py changes on disk (its mtime is checked
+at most every CATALOG_CHECK_SECONDS). Callers take one snapshot per
+request and use its precomputed dicts and sets instead of scanning
+STYLISTS or splitting Stylist.specialties. Each location's store reads the
+stylists listed under it in LOCATIONS, or STYLISTS if it lists none.
+"""
+import os
+import runpy
+import threading
+from datetime import date, datetime, time, timedelta
+from time import monotonic
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+import config
+from config import CATALOG_CHECK_SECONDS, DEFAULT_LOCATION
+from models import Service, Stylist
+from availability import WEEKDAYS
+
+Hours = Optional[Tuple[time, time]]
+
+
+def stylist_email(key: str) -> str:
+    """The address a configured stylist's row is stored and matched under."""
+    return f'{key}@salon.local'
+
+
+def holiday_dates(days: Iterable[str]) -> FrozenSet[date]:
+    """Parse HOLIDAYS-style 'YYYY-MM-DD' strings."""
+    return frozenset(datetime.strptime(day, '%Y-%m-%d').date() for day in days)
+
+
+class Catalog:
+    """One consistent view of the catalog and its indexes; never modified after it is built."""
+
+    def __init__(self, services: Dict[str, dict], stylists: Dict[str, dict], holidays: FrozenSet[date],
+                 business_hours: Dict[str, dict], stylist_ids: Dict[str, int], service_ids: Dict[str, int],
+                 generation: int = 0):
+        self.services = services
+        self.stylists = stylists
+        self.holidays = holidays
+        self.business_hours = business_hours
+        self.stylist_ids = stylist_ids
+        self.service_ids = service_ids
+        self.generation = generation  # Counts the store's builds, so a newer snapshot always differs
+        self.stylist_keys = {db_id: key for key, db_id in stylist_ids.items()}
+        self.stylist_keys_by_name = {info['name']: key for key, info in stylists.items()}
+        self.durations = {key: timedelta(minutes=info['duration']) for key, info in services.items()}
+        self.offers = {key: frozenset(info['specialties']) for key, info in stylists.items()}
+        self.eligible = {
+            service: tuple(key for key in stylists if service in self.offers[key])
+            for service in services
+        }
+        self.schedules = {key: info['schedule'] for key, info in stylists.items()}
+        self.weekly_hours: Dict[str, Tuple[Hours, ...]] = {
+            key: tuple(
+                (hours['start'], hours['end']) if hours else None
+                for hours in (schedule.get(day) for day in WEEKDAYS)
+            )
+            for key, schedule in self.schedules.items()
+        }
+
+    def service(self, service_name: str) -> Tuple[str, dict]:
+        """Normalize a service name and return (key, definition)."""
+        key = (service_name or '').strip().lower()
+        info = self.services.get(key)
+        if info is None:
+            raise ValueError(f"Unknown service: {service_name}")
+        return key, info
+
+    def eligible_stylists(self, service_key: str, stylist_id: Optional[str] = None) -> List[str]:
+        """Return the stylist keys that can perform a service, optionally just the named one."""
+        if stylist_id:
+            if stylist_id not in self.stylists:
+                raise ValueError(f"Unknown stylist: {stylist_id}")
+            return [stylist_id] if service_key in self.offers[stylist_id] else []
+        return list(self.eligible.get(service_key, ()))
+
+    def opening(self, stylist_id: str, day: date) -> Optional[Tuple[datetime, datetime]]:
+        """The stylist's working hours on a day, or None if they are off."""
+        if day in self.holidays:
+            return None
+        hours = self.weekly_hours[stylist_id][day.weekday()]
+        if hours is None:
+            return None
+        return datetime.combine(day, hours[0]), datetime.combine(day, hours[1])
+
+
+class CatalogStore:
+    """Hands out the current Catalog, rebuilding it when config.py changes."""
+
+    def __init__(self, session_factory, location_id: str = DEFAULT_LOCATION, config_path: Optional[str] = None,
+                 check_seconds: float = CATALOG_CHECK_SECONDS, clock: Callable[[], float] = monotonic):
+        self.Session = session_factory
+        self.location_id = location_id
+        self.config_path = config_path or config.__file__
+        self.check_seconds = check_seconds
+        self.clock = clock
+        self._catalog: Optional[Catalog] = None
+        self._generation = 0
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> Catalog:
+        """Return the current snapshot, reloading first if config.py has changed."""
+        catalog = self._catalog
+        if catalog is not None and self.clock() < self._next_check:
+            return catalog
+        with self._lock:
+            if self._catalog is None or self.clock() >= self._next_check:
+                mtime = self._config_mtime()
+                if self._catalog is None or mtime != self._mtime:
+                    definitions = self._read_config(reload=self._catalog is not None)
+                    if definitions is not None:
+                        try:
+                            self._catalog = self._build(*definitions)
+                        except Exception as e:
+                            if self._catalog is None:
+                                raise
+                            # Keep serving the last snapshot and try again at the next check
+                            print(f"Error rebuilding catalog from {self.config_path}: {str(e)}")
+                            mtime = self._mtime
+                    self._mtime = mtime
+                self._next_check = self.clock() + self.check_seconds
+            return self._catalog
+
+    def invalidate(self):
+        """Re-read config.py on the next get(), whatever its mtime."""
+        with self._lock:
+            self._mtime = None
+            self._next_check = 0.0
+
+    def _config_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.config_path).st_mtime
+        except OSError:
+            return None
+
+    def _read_config(self, reload: bool):
+        """The catalog settings: as imported at startup, or freshly executed from config.py."""
+        if not reload:
+            return (config.SERVICES, self._stylists(config.LOCATIONS, config.STYLISTS), config.HOLIDAYS,
+                    config.BUSINESS_HOURS)
+        try:
+            namespace = runpy.run_path(self.config_path)
+            stylists = self._stylists(namespace['LOCATIONS'], namespace['STYLISTS'])
+            return namespace['SERVICES'], stylists, namespace['HOLIDAYS'], namespace['BUSINESS_HOURS']
+        except Exception as e:
+            print(f"Error reloading catalog from {self.config_path}: {str(e)}")
+            return None
+
+    def _stylists(self, locations: Dict[str, dict], default: Dict[str, dict]) -> Dict[str, dict]:
+        return locations.get(self.location_id, {}).get('stylists', default)
+
+    def _build(self, services: Dict[str, dict], stylists: Dict[str, dict], holidays: List[str],
+               business_hours: Dict[str, dict]) -> Catalog:
+        """Bring the Service and Stylist rows in line with the definitions and index them."""
+        session = self.Session()
+        try:
+            try:
+                stylist_ids, service_ids = self._sync_rows(session, services, stylists)
+            except IntegrityError:
+                # Another process inserted the same rows first; theirs will do
+                session.rollback()
+                stylist_ids, service_ids = self._sync_rows(session, services, stylists)
+        finally:
+            session.close()
+        self._generation += 1
+        return Catalog(services, stylists, holiday_dates(holidays), business_hours, stylist_ids, service_ids,
+                       self._generation)
+
+    def _sync_rows(self, session, services: Dict[str, dict],
+                   stylists: Dict[str, dict]) -> Tuple[Dict[str, int], Dict[str, int]]:
+        # Rows are matched on the address made from the config key, so renaming a stylist keeps their row
+        stylist_rows = {row.email: row for row in session.query(Stylist).all()}
+        for key, info in stylists.items():
+            specialties = ','.join(info['specialties'])
+            row = stylist_rows.get(stylist_email(key))
+            if row is None:
+                row = stylist_rows[stylist_email(key)] = Stylist(
+                    name=info['name'],
+                    email=stylist_email(key),
+                    specialties=specialties,
+                    location_id=self.location_id
+                )
+                session.add(row)
+            else:
+                if row.name != info['name']:
+                    row.name = info['name']
+                if row.specialties != specialties:
+                    row.specialties = specialties
+                if row.location_id != self.location_id:
+                    row.location_id = self.location_id
+
+        service_rows = {row.name: row for row in session.query(Service).all()}
+        for key, info in services.items():
+            row = service_rows.get(key)
+            if row is None:
+                row = service_rows[key] = Service(name=key)
+                session.add(row)
+            for field in ('description', 'duration', 'price'):
+                if getattr(row, field) != info[field]:
+                    setattr(row, field, info[field])
+
+        session.commit()
+        return (
+            {key: stylist_rows[stylist_email(key)].id for key in stylists},
+            {key: service_rows[key].id for key in services}
+        )
@@ -0,0 +1,136 @@
+"""Command-line entry point for the admin app, the daemon and one-off jobs.
+
+Only argparse is imported up front; each command imports what it uses, so
+a cron job that sends reminders or prints stats never loads Flask, and
+`--help` returns immediately.
+
+    python cli.py admin --port 5000
+    python cli.py daemon
+    python cli.py reminders           # send whatever reminders are due, then exit
+    python cli.py stats --location main
+    python cli.py compact-email-logs  # archive old email logs and shrink the database
+"""
+import argparse
+import json
+import sys
+
+
+def init_db(args) -> int:
+    from locations import LocationRouter
+
+    LocationRouter().init_shards()
+    print("Databases are up to date.")
+    return 0
+
+
+def admin(args) -> int:
+    from admin import create_app
+
+    create_app().run(host=args.host, port=args.port, debug=args.debug)
+    return 0
+
+
+def daemon(args) -> int:
+    from main import main
+
+    main()
+    return 0
+
+
+def reminders(args) -> int:
+    from email_handler import EmailHandler
+    from locations import LocationRouter
+    from reminders import ReminderDispatcher
+
+    Session = LocationRouter().session_factory(args.location)
+    dispatcher = ReminderDispatcher(Session, EmailHandler(session_factory=Session))
+    dispatcher.load()
+    results = dispatcher.tick()
+    failed = sum(1 for result in results if result['status'] == 'failed')
+    print(f"Sent {len(results) - failed} reminders, {failed} failed; {len(dispatcher)} still pending.")
+    return 1 if failed else 0
+
+
+def sync_calendar(args) -> int:
+    from calendar_manager import CalendarManager
+    from locations import LocationRouter
+    from sync_state import SyncStateStore
+
+    router = LocationRouter()
+    Session = router.session_factory(args.location)
+    calendar = CalendarManager(Session, state_store=SyncStateStore(Session),
+                               calendar_id=router.location(args.location)['calendar_id'],
+                               location_id=args.location)
+    created, deleted = calendar.flush()
+    changed = calendar.sync()
+    print(f"Pushed {created} new and {deleted} deleted events; pulled {changed} changes.")
+    return 0
+
+
+def stats(args) -> int:
+    from locations import LocationRouter
+    from stats import dashboard_stats
+
+    scheduler = LocationRouter().scheduler(args.location)
+    session = scheduler.Session()
+    try:
+        result = dashboard_stats(session, scheduler._now(), scheduler.catalog.get())
+    finally:
+        session.close()
+    print(json.dumps(result, indent=2, default=str))
+    return 0
+
+
+def compact_email_logs(args) -> int:
+    from config import EMAIL_LOG_RETENTION_DAYS
+    from email_archive import EmailLogArchiver, archive_dir
+    from locations import LocationRouter
+
+    archiver = EmailLogArchiver(LocationRouter().session_factory(args.location), archive_dir(args.location),
+                                retention_days=EMAIL_LOG_RETENTION_DAYS if args.days is None else args.days)
+    result = archiver.compact(vacuum=not args.no_vacuum)
+    print(f"Archived {result['archived']} email logs sent before {result['cutoff']} "
+          f"into {len(result['months'])} monthly files.")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('init-db', help='create or upgrade every location database').set_defaults(run=init_db)
+
+    command = commands.add_parser('admin', help='serve the admin app')
+    command.add_argument('--host', default='127.0.0.1')
+    command.add_argument('--port', type=int, default=5000)
+    command.add_argument('--debug', action='store_true')
+    command.set_defaults(run=admin)
+
+    commands.add_parser('daemon', help='run the booking daemon').set_defaults(run=daemon)
+
+    for name, run, description in (
+        ('reminders', reminders, 'send the reminders that are due and exit'),
+        ('sync-calendar', sync_calendar, 'push pending calendar writes, pull changes and exit'),
+        ('stats', stats, 'print the dashboard counters as JSON')
+    ):
+        command = commands.add_parser(name, help=description)
+        # Resolved after parsing, so --help never imports config
+        command.add_argument('--location', default=None, help='location id (default SALON_LOCATION)')
+        command.set_defaults(run=run)
+
+    command = commands.add_parser('compact-email-logs',
+                                  help='move old email logs to the archive files and vacuum the database')
+    command.add_argument('--location', default=None, help='location id (default SALON_LOCATION)')
+    command.add_argument('--days', type=int, default=None, help='retention in days (default EMAIL_LOG_RETENTION_DAYS)')
+    command.add_argument('--no-vacuum', action='store_true', help='leave the freed pages in the database file')
+    command.set_defaults(run=compact_email_logs)
+
+    args = parser.parse_args(argv)
+    if getattr(args, 'location', False) is None:
+        from config import DEFAULT_LOCATION
+        args.location = DEFAULT_LOCATION
+    return args.run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
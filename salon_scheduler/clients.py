@@ -0,0 +1,136 @@
+"""Email address to client id resolution, in bulk and behind an LRU cache.
+
+Every booking needs the Client row for the sender's address, and
+clients.email is unique. Looking each address up and inserting it when
+missing costs two round trips per request, and two requests from a new
+client that arrive together both miss the lookup and one insert fails on
+the constraint. ClientResolver instead takes a whole batch of addresses:
+cached ones are answered from memory, the rest are looked up with one
+IN (...) query, and those still missing are created by one
+INSERT ... ON CONFLICT that returns the ids of new and existing rows
+alike, so a concurrent insert of the same address is not an error.
+
+Addresses are normalized the way sender_address reads From headers
+(bare address, lower-cased), so "Ann <Ann@Example.com>" and
+"ann@example.com" are one client. Clients are never deleted, so cached
+ids do not go stale.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from config import CLIENT_CACHE_SIZE, CLIENT_RESOLVE_CHUNK
+from models import Client
+from cache import LRUCache
+from email_parser import sender_address
+from instrumentation import count, timed
+
+# (email or From header, name, phone)
+ClientDetails = Tuple[Optional[str], Optional[str], Optional[str]]
+
+# Dialects with INSERT ... ON CONFLICT
+UPSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def normalize_email(address: Optional[str]) -> Optional[str]:
+    """The bare, lower-cased address from an address or From header, or None if there is none."""
+    if not address or not address.strip():
+        return None
+    return sender_address(address.strip()).strip() or None
+
+
+class ClientResolver:
+    """Finds or creates the clients for a batch of email addresses."""
+
+    def __init__(self, session_factory, max_entries: int = CLIENT_CACHE_SIZE, chunk: int = CLIENT_RESOLVE_CHUNK):
+        self.Session = session_factory
+        self.ids = LRUCache(max_entries, size=lambda client_id: 1)
+        self.chunk = chunk
+
+    def resolve_one(self, email: Optional[str], name: Optional[str] = None,
+                    phone: Optional[str] = None) -> Optional[int]:
+        """The client id for one address, creating the client if needed; None without an address."""
+        address = normalize_email(email)
+        if address is None:
+            return None
+        return self.resolve([(address, name, phone)])[address]
+
+    @timed('clients_resolve')
+    def resolve(self, clients: Iterable[ClientDetails]) -> Dict[str, int]:
+        """Client ids keyed by normalized address, creating clients that do not exist yet.
+
+        Entries without an address are skipped. A new client takes the name
+        and phone of the first entry with its address; existing clients are
+        not updated.
+        """
+        details: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+        for email, name, phone in clients:
+            address = normalize_email(email)
+            if address is not None and address not in details:
+                details[address] = (name, phone)
+
+        ids: Dict[str, int] = {}
+        missing: List[str] = []
+        for address in details:
+            client_id = self.ids.get(address)
+            if client_id is None:
+                missing.append(address)
+            else:
+                ids[address] = client_id
+        count('client_cache_lookups_total', len(ids), result='hit')
+        count('client_cache_lookups_total', len(missing), result='miss')
+        if not missing:
+            return ids
+
+        session = self.Session()
+        try:
+            found = {}
+            for start in range(0, len(missing), self.chunk):
+                found.update(session.execute(
+                    select(Client.email, Client.id).where(Client.email.in_(missing[start:start + self.chunk]))
+                ).all())
+            new = [address for address in missing if address not in found]
+            if new:
+                found.update(self._insert(session, [
+                    {'name': details[address][0] or address, 'email': address, 'phone': details[address][1]}
+                    for address in new
+                ]))
+                count('clients_created_total', len(new))
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+        for address in missing:
+            self.ids.set(address, found[address])
+        ids.update((address, found[address]) for address in missing)
+        return ids
+
+    def _insert(self, session, rows: List[dict]) -> Dict[str, int]:
+        """Insert clients, returning the id of every row's address whether it was new or not."""
+        upsert = UPSERTS.get(session.get_bind().dialect.name)
+        found = {}
+        if upsert is None:
+            # No ON CONFLICT here: insert one at a time and look up whoever got in first
+            for row in rows:
+                try:
+                    with session.begin_nested():
+                        session.execute(Client.__table__.insert(), row)
+                except IntegrityError:
+                    pass
+                found[row['email']] = session.execute(
+                    select(Client.id).where(Client.email == row['email'])
+                ).scalar_one()
+            return found
+        for start in range(0, len(rows), self.chunk):
+            statement = upsert(Client).values(rows[start:start + self.chunk])
+            # A no-op update rather than DO NOTHING, so rows that already exist are returned too
+            statement = statement.on_conflict_do_update(
+                index_elements=[Client.email], set_={'email': statement.excluded.email}
+            ).returning(Client.email, Client.id)
+            found.update(session.execute(statement).all())
+        return found
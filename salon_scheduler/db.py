@@ -0,0 +1,103 @@
+"""Engine and session setup shared by the admin app, the daemon and the tools.
+
+Every process gets one engine per database URL. SQLite connections are
+switched to WAL with a busy timeout so readers never block the writer and
+concurrent writers wait instead of failing with "database is locked".
+Any other URL (e.g. postgresql+psycopg2://...) gets a pre-pinged,
+recycled connection pool.
+"""
+import threading
+from typing import Dict, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from config import (
+    DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    SQLITE_BUSY_TIMEOUT_MS
+)
+from instrumentation import instrument_engine
+
+_engines: Dict[str, Engine] = {}
+_engines_lock = threading.Lock()
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+    cursor.close()
+
+
+def create_db_engine(url: str = DATABASE_URL, **kwargs) -> Engine:
+    """Create a new engine tuned for the database behind a URL."""
+    if make_url(url).get_backend_name() != 'sqlite':
+        options = {
+            'pool_size': DB_POOL_SIZE,
+            'max_overflow': DB_MAX_OVERFLOW,
+            'pool_timeout': DB_POOL_TIMEOUT,
+            'pool_recycle': DB_POOL_RECYCLE,
+            'pool_pre_ping': True
+        }
+        options.update(kwargs)
+        return instrument_engine(create_engine(url, **options))
+
+    database = make_url(url).database
+    if not database or database == ':memory:':
+        # One shared connection, or every pooled connection would see its own empty database
+        options = {'poolclass': StaticPool, 'connect_args': {'check_same_thread': False}}
+    else:
+        options = {
+            'pool_size': DB_POOL_SIZE,
+            'max_overflow': DB_MAX_OVERFLOW,
+            'pool_timeout': DB_POOL_TIMEOUT,
+            'connect_args': {'check_same_thread': False}
+        }
+    options.update(kwargs)
+    engine = create_engine(url, **options)
+    if database and database != ':memory:':
+        event.listen(engine, 'connect', _set_sqlite_pragmas)
+    return instrument_engine(engine)
+
+
+def get_engine(url: str = DATABASE_URL) -> Engine:
+    """Return this process's engine for a URL, creating it on first use."""
+    with _engines_lock:
+        engine = _engines.get(url)
+        if engine is None:
+            engine = _engines[url] = create_db_engine(url)
+        return engine
+
+
+def dispose_inherited_engines():
+    """Drop connections a forked child inherited from its parent without closing the parent's."""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose(close=False)
+
+
+def get_session_factory(engine: Optional[Engine] = None) -> sessionmaker:
+    """Return a session factory bound to the given engine or the default one."""
+    return sessionmaker(bind=engine or get_engine())
+
+
+def scoped_app_session(app, session_factory: sessionmaker) -> scoped_session:
+    """Give each Flask app context its own session, removed when the context ends.
+
+    The session is closed even when a view raises, so connections always
+    go back to the pool.
+    """
+    db_session = scoped_session(session_factory)
+
+    @app.teardown_appcontext
+    def remove_session(exception=None):
+        db_session.remove()
+
+    return db_session
@@ -0,0 +1,240 @@
+"""EmailLog retention: monthly archive files, per-day counts and a streaming reader.
+
+Every send adds an EmailLog row and nothing removed them, so the table
+outgrew appointments and slowed every scan and backup of the database.
+EmailLogArchiver.compact moves logs older than EMAIL_LOG_RETENTION_DAYS
+out of the database, EMAIL_ARCHIVE_BATCH_SIZE at a time:
+
+- each log becomes one JSON line in its month's archive file,
+  <EMAIL_ARCHIVE_DIR>/<location>/email_logs-YYYY-MM.ndjson.gz, written as
+  a new gzip member appended to the file, so archives are only ever added to
+- their counts by day, type and status are added to email_log_days
+- the rows are deleted in the same transaction that adds the counts
+
+and then returns the freed pages to the filesystem (VACUUM, or an
+incremental vacuum on databases created with auto_vacuum=INCREMENTAL).
+Logs of appointments that have not started yet stay in the database,
+since ReminderDispatcher checks them for reminders already sent.
+
+A batch is appended to its archives before the database transaction
+that deletes it commits, and that transaction also records each file's
+new length in sync_state. Anything past the recorded length was written
+by a run that never committed, so it is cut off before the next append,
+and the logs in it are archived again from the database.
+"""
+import gzip
+import json
+import os
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import delete, exists, func, select
+
+from config import EMAIL_ARCHIVE_BATCH_SIZE, EMAIL_ARCHIVE_DIR, EMAIL_LOG_RETENTION_DAYS
+from models import Appointment, EmailLog, EmailLogDay, SyncState
+from export import EXPORT_BATCH_SIZE
+from instrumentation import count, timed
+
+ARCHIVE_COLUMNS = ['id', 'appointment_id', 'email_type', 'recipient', 'subject', 'sent_at', 'status']
+
+# Ids per DELETE ... WHERE id IN (...), under SQLite's bind-parameter limit
+DELETE_CHUNK = 500
+
+
+def archive_dir(location_id: str, root: str = EMAIL_ARCHIVE_DIR) -> str:
+    """Where a location's archive files live."""
+    return os.path.join(root, location_id)
+
+
+def archive_path(directory: str, month: str) -> str:
+    return os.path.join(directory, f'email_logs-{month}.ndjson.gz')
+
+
+def archived_months(directory: str) -> List[str]:
+    """The 'YYYY-MM' months with an archive file, oldest first."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        name[len('email_logs-'):-len('.ndjson.gz')] for name in os.listdir(directory)
+        if name.startswith('email_logs-') and name.endswith('.ndjson.gz')
+    )
+
+
+def _append(path: str, lines: List[str], committed: int) -> int:
+    """Append lines to an archive as one more gzip member after its `committed` bytes; returns the new length."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'ab') as raw:
+        if raw.tell() > committed:
+            raw.truncate(committed)
+            raw.seek(committed)
+        start = raw.tell()
+        try:
+            with gzip.GzipFile(fileobj=raw, mode='wb') as archive:
+                archive.write(''.join(lines).encode('utf-8'))
+            raw.flush()
+            os.fsync(raw.fileno())
+        except BaseException:
+            raw.truncate(start)
+            raise
+        return raw.tell()
+
+
+def reclaim_space(engine):
+    """Give the pages freed by deleted rows back to the filesystem."""
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        dialect = connection.dialect.name
+        if dialect == 'sqlite':
+            if connection.exec_driver_sql('PRAGMA auto_vacuum').scalar() == 2:
+                connection.exec_driver_sql('PRAGMA incremental_vacuum')
+            else:
+                connection.exec_driver_sql('VACUUM')
+            # In WAL mode the rewritten pages sit in the log until it is checkpointed
+            connection.exec_driver_sql('PRAGMA wal_checkpoint(TRUNCATE)')
+        elif dialect == 'postgresql':
+            connection.exec_driver_sql(f'VACUUM ANALYZE {EmailLog.__tablename__}')
+
+
+class EmailLogArchiver:
+    """Moves old EmailLog rows of one database into its location's archive files."""
+
+    def __init__(self, session_factory, directory: str, retention_days: int = EMAIL_LOG_RETENTION_DAYS,
+                 batch_size: int = EMAIL_ARCHIVE_BATCH_SIZE):
+        self.Session = session_factory
+        self.directory = directory
+        self.retention = timedelta(days=retention_days)
+        self.batch_size = batch_size
+
+    @timed('email_archive_compact')
+    def compact(self, now: Optional[datetime] = None, vacuum: bool = True) -> dict:
+        """Archive and delete the logs past retention, then reclaim the space; returns what was done."""
+        now = now or datetime.utcnow()
+        cutoff = now - self.retention
+        archived = 0
+        months = set()
+        while True:
+            session = self.Session()
+            engine = session.get_bind()
+            try:
+                self._begin_write(session)
+                rows = session.execute(
+                    select(*[getattr(EmailLog, column) for column in ARCHIVE_COLUMNS]).where(
+                        EmailLog.sent_at < cutoff,
+                        # Reminders look for their own log on upcoming appointments
+                        ~exists().where(Appointment.id == EmailLog.appointment_id, Appointment.start_time > now)
+                    ).order_by(EmailLog.id).limit(self.batch_size)
+                ).all()
+                if not rows:
+                    session.rollback()
+                    break
+                lines: Dict[str, List[str]] = {}
+                counts: Counter = Counter()
+                for row in rows:
+                    record = dict(zip(ARCHIVE_COLUMNS, row))
+                    record['sent_at'] = row.sent_at.isoformat()
+                    lines.setdefault(row.sent_at.strftime('%Y-%m'), []).append(json.dumps(record) + '\n')
+                    counts[row.sent_at.date(), row.email_type or '', row.status or ''] += 1
+                for month, month_lines in lines.items():
+                    key = f'email_archive:{os.path.basename(self.directory)}:{month}'
+                    state = session.get(SyncState, key)
+                    length = _append(archive_path(self.directory, month), month_lines,
+                                     int(state.value) if state else 0)
+                    session.merge(SyncState(key=key, value=str(length)))
+                self._add_counts(session, counts)
+                ids = [row.id for row in rows]
+                for start in range(0, len(ids), DELETE_CHUNK):
+                    session.execute(delete(EmailLog).where(EmailLog.id.in_(ids[start:start + DELETE_CHUNK])))
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+            finally:
+                session.close()
+            archived += len(rows)
+            months.update(lines)
+            count('email_logs_archived_total', len(rows))
+
+        if vacuum and archived:
+            reclaim_space(engine)
+        return {'archived': archived, 'months': sorted(months), 'cutoff': cutoff.isoformat()}
+
+    def _begin_write(self, session):
+        """Take SQLite's write lock up front, so two compactions never count the same logs."""
+        connection = session.connection()
+        if connection.dialect.name == 'sqlite':
+            connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+    def _add_counts(self, session, counts: Counter):
+        days = session.query(EmailLogDay).filter(EmailLogDay.day.in_({key[0] for key in counts})).all()
+        existing = {(row.day, row.email_type, row.status): row for row in days}
+        for (day, email_type, status), n in counts.items():
+            row = existing.get((day, email_type, status))
+            if row is None:
+                session.add(EmailLogDay(day=day, email_type=email_type, status=status, count=n))
+            else:
+                row.count += n
+
+
+def read_archive(directory: str, first_month: Optional[str] = None, last_month: Optional[str] = None,
+                 recipient: Optional[str] = None, email_type: Optional[str] = None,
+                 status: Optional[str] = None, appointment_id: Optional[int] = None) -> Iterator[dict]:
+    """Stream the archived logs that match every filter given, oldest month first.
+
+    Months are 'YYYY-MM' and inclusive; recipients match case-insensitively.
+    Files are read a line at a time, so memory does not grow with the archive.
+    """
+    needle = json.dumps(recipient.lower())[1:-1] if recipient else None
+    for month in archived_months(directory):
+        if (first_month and month < first_month) or (last_month and month > last_month):
+            continue
+        with gzip.open(archive_path(directory, month), 'rt', encoding='utf-8') as archive:
+            try:
+                for line in archive:
+                    # Most lines are for someone else; skip them without parsing
+                    if needle and needle not in line.lower():
+                        continue
+                    record = json.loads(line)
+                    if ((recipient and record['recipient'].lower() != recipient.lower())
+                            or (email_type and record['email_type'] != email_type)
+                            or (status and record['status'] != status)
+                            or (appointment_id is not None and record['appointment_id'] != appointment_id)):
+                        continue
+                    yield record
+            except (EOFError, gzip.BadGzipFile):
+                # The tail of a run that crashed before committing; its logs are still in the database
+                continue
+
+
+def stream_archive_ndjson(directory: str, **filters) -> Iterator[str]:
+    """Yield the archived logs read_archive finds as NDJSON, one batch of lines at a time."""
+    lines = []
+    for record in read_archive(directory, **filters):
+        lines.append(json.dumps(record))
+        if len(lines) == EXPORT_BATCH_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def daily_counts(session, first_day: date, last_day: date) -> List[dict]:
+    """Sends per day, type and status, from the archived counts and the live logs together."""
+    totals: Dict[Tuple[str, str, str], int] = Counter()
+    for day, email_type, status, n in session.execute(
+        select(EmailLogDay.day, EmailLogDay.email_type, EmailLogDay.status, EmailLogDay.count).where(
+            EmailLogDay.day >= first_day, EmailLogDay.day <= last_day
+        )
+    ):
+        totals[day.isoformat(), email_type, status] += n
+    day = func.date(EmailLog.sent_at)
+    for sent_on, email_type, status, n in session.execute(
+        select(day, EmailLog.email_type, EmailLog.status, func.count(EmailLog.id)).where(
+            EmailLog.sent_at >= datetime.combine(first_day, datetime.min.time()),
+            EmailLog.sent_at < datetime.combine(last_day + timedelta(days=1), datetime.min.time())
+        ).group_by(day, EmailLog.email_type, EmailLog.status)
+    ):
+        totals[str(sent_on), email_type or '', status or ''] += n
+    return [
+        {'day': key[0], 'email_type': key[1], 'status': key[2], 'count': n}
+        for key, n in sorted(totals.items())
+    ]
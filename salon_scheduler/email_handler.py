@@ -1,25 +1,100 @@
 import os
 import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
 from datetime import datetime
-import re
-from jinja2 import Environment, FileSystemLoader
 from typing import Dict, List, Optional, Tuple
 
+from email_parser import EmailRequestParser, header_map
+from models import EmailLog
+from rate_limit import RateLimiter
+from google_services import google_services
+from instrumentation import api_method, count, timed
 from config import (
     GMAIL_USER,
     EMAIL_TEMPLATES,
-    SERVICES
+    SERVICES,
+    TEMPLATE_CACHE_DIR,
+    EMAIL_SEND_WORKERS,
+    EMAIL_SEND_RATE,
+    EMAIL_SEND_BURST
 )
 
+INBOX_QUERY = 'in:inbox is:unread subject:"appointment request"'
+GMAIL_BATCH_SIZE = 50       # Gmail recommends at most 50 calls per batch request
+GMAIL_MODIFY_LIMIT = 1000   # batchModify accepts up to 1000 ids per call
+HISTORY_STATE_KEY = 'gmail_history_id'
+
 class EmailHandler:
-    def __init__(self, credentials_path: str = 'credentials.json'):
-        self.credentials = Credentials.from_authorized_user_file(credentials_path, ['https://www.googleapis.com/auth/gmail.modify'])
-        self.service = build('gmail', 'v1', credentials=self.credentials)
-        self.jinja_env = Environment(loader=FileSystemLoader('templates'))
+    """Reads appointment requests from Gmail and sends the salon's replies.
+
+    The Google client libraries and Jinja are imported when a handler is
+    created, not when this module is, so processes that only need the
+    module's helpers start quickly.
+    """
+
+    def __init__(self, token_path: Optional[str] = None, service=None, state_store=None,
+                 session_factory=None, template_root: Optional[str] = None):
+        self.credentials = None
+        if service is None:
+            provider = google_services(token_path)
+            self.credentials = provider.credentials
+            service = provider.gmail()
+        self.service = service
+        self.state_store = state_store
+        self.Session = session_factory
+        self.parser = EmailRequestParser()
+
+        from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+
+        # EMAIL_TEMPLATES paths are relative to this directory
+        template_root = template_root or os.path.dirname(os.path.abspath(__file__))
+        cache_dir = os.path.join(template_root, TEMPLATE_CACHE_DIR)
+        os.makedirs(cache_dir, exist_ok=True)
+        self.jinja_env = Environment(
+            loader=FileSystemLoader(template_root),
+            bytecode_cache=FileSystemBytecodeCache(cache_dir),
+            auto_reload=False
+        )
+        self.templates = self._precompile_templates()
+        self.rate_limiter = RateLimiter(EMAIL_SEND_RATE, EMAIL_SEND_BURST)
+        self._local = threading.local()
+
+    def _precompile_templates(self) -> Dict[str, object]:
+        """Compile every configured email template once, at startup."""
+        from jinja2.exceptions import TemplateNotFound
+
+        templates = {}
+        for path in EMAIL_TEMPLATES.values():
+            try:
+                templates[path] = self.jinja_env.get_template(path)
+            except TemplateNotFound:
+                print(f"Warning: email template not found: {path}")
+        return templates
+
+    def _get_template(self, template_name: str):
+        template = self.templates.get(template_name)
+        if template is None:
+            template = self.templates[template_name] = self.jinja_env.get_template(template_name)
+        return template
+
+    def _execute(self, request):
+        """Execute an API request on this thread's own HTTP connection.
+
+        httplib2 connections are not thread-safe, so worker threads must not
+        share the client's default one.
+        """
+        with timed('gmail_request', method=api_method(request)):
+            if self.credentials is None:
+                return request.execute()
+            http = getattr(self._local, 'http', None)
+            if http is None:
+                import httplib2
+                from google_auth_httplib2 import AuthorizedHttp
+                http = self._local.http = AuthorizedHttp(self.credentials, http=httplib2.Http())
+            return request.execute(http=http)
 
     def _create_message(self, to: str, subject: str, message_text: str, is_html: bool = True) -> dict:
         """Create a message for an email."""
@@ -36,80 +111,108 @@ class EmailHandler:
         message.attach(msg)
         return {'raw': base64.urlsafe_b64encode(message.as_bytes()).decode()}
 
+    @timed('email_send')
     def send_email(self, to: str, subject: str, template_name: str, context: dict) -> bool:
         """Send an email using a template."""
         try:
-            template = self.jinja_env.get_template(template_name)
+            template = self._get_template(template_name)
             message_content = template.render(**context)
             message = self._create_message(to, subject, message_content)
             
-            self.service.users().messages().send(
+            self._execute(self.service.users().messages().send(
                 userId='me',
                 body=message
-            ).execute()
+            ))
             return True
         except Exception as e:
+            count('email_send_failures_total', template=template_name)
             print(f"Error sending email: {str(e)}")
             return False
 
+    @timed('email_send_bulk_one')
+    def _send_one(self, template, subject: str, to: str, context: dict) -> dict:
+        """Render, encode and send one message, returning its outcome."""
+        result = {
+            'to': to,
+            'appointment_id': context.get('appointment_id'),
+            'status': 'sent',
+            'error': None
+        }
+        try:
+            message = self._create_message(to, subject, template.render(**context))
+            self.rate_limiter.acquire()
+            sent = self._execute(self.service.users().messages().send(userId='me', body=message))
+            result['message_id'] = sent.get('id')
+        except Exception as e:
+            count('email_send_failures_total', template=template.name)
+            print(f"Error sending email to {to}: {str(e)}")
+            result['status'] = 'failed'
+            result['error'] = str(e)
+        return result
+
+    def send_bulk(self, template_name: str, subject: str, recipients: List[Tuple[str, dict]],
+                  email_type: Optional[str] = None) -> List[dict]:
+        """Send one template to many recipients through a bounded worker pool.
+
+        Each recipient is a (to, context) pair; a context's 'appointment_id'
+        is recorded on its log row. Sends are throttled to stay inside the
+        Gmail quota, and all outcomes are written to EmailLog in one insert.
+        """
+        template = self._get_template(template_name)
+        with ThreadPoolExecutor(max_workers=EMAIL_SEND_WORKERS) as pool:
+            results = list(pool.map(
+                lambda recipient: self._send_one(template, subject, recipient[0], recipient[1]),
+                recipients
+            ))
+        self._log_results(results, subject, email_type)
+        return results
+
+    def _log_results(self, results: List[dict], subject: str, email_type: Optional[str]):
+        """Write send outcomes to EmailLog with a single bulk insert."""
+        if self.Session is None or not results:
+            return
+        sent_at = datetime.utcnow()
+        session = self.Session()
+        try:
+            session.execute(EmailLog.__table__.insert(), [
+                {
+                    'appointment_id': result['appointment_id'],
+                    'email_type': email_type,
+                    'recipient': result['to'],
+                    'subject': subject,
+                    'sent_at': sent_at,
+                    'status': result['status']
+                }
+                for result in results
+            ])
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"Error logging emails: {str(e)}")
+        finally:
+            session.close()
+
+    @timed('email_parse_request')
     def parse_email_request(self, message_id: str) -> Tuple[dict, List[str]]:
-        """Parse an email for appointment request details."""
+        """Fetch and parse an email for appointment request details."""
         try:
-            message = self.service.users().messages().get(
+            message = self._execute(self.service.users().messages().get(
                 userId='me',
                 id=message_id,
                 format='full'
-            ).execute()
-
-            headers = message['payload']['headers']
-            email_data = {
-                'from_email': next(h['value'] for h in headers if h['name'].lower() == 'from'),
-                'subject': next(h['value'] for h in headers if h['name'].lower() == 'subject'),
-                'date': next(h['value'] for h in headers if h['name'].lower() == 'date')
-            }
-
-            # Get email body
-            if 'parts' in message['payload']:
-                parts = message['payload']['parts']
-                body = next(
-                    (part['body']['data'] for part in parts if part['mimeType'] == 'text/plain'),
-                    message['payload']['body'].get('data', '')
-                )
-            else:
-                body = message['payload']['body'].get('data', '')
-
-            decoded_body = base64.urlsafe_b64decode(body.encode('ASCII')).decode('utf-8')
-
-            # Extract information using regex patterns
-            patterns = {
-                'name': r'(?i)name:\s*([^\n]+)',
-                'service': r'(?i)service:\s*([^\n]+)',
-                'date': r'(?i)date:\s*([^\n]+)',
-                'time': r'(?i)time:\s*([^\n]+)',
-                'phone': r'(?i)phone:\s*([^\n]+)'
-            }
-
-            extracted_data = {}
-            missing_fields = []
-
-            for field, pattern in patterns.items():
-                match = re.search(pattern, decoded_body)
-                if match:
-                    extracted_data[field] = match.group(1).strip()
-                else:
-                    missing_fields.append(field)
-
-            # Validate service
-            if 'service' in extracted_data:
-                service = extracted_data['service'].lower()
-                if service not in SERVICES:
-                    missing_fields.append('valid_service')
-
-            # Combine parsed data
-            email_data.update(extracted_data)
-            return email_data, missing_fields
+            ))
+        except Exception as e:
+            print(f"Error fetching email: {str(e)}")
+            return {}, ['error_parsing_email']
+        return self.parse_message(message)
 
+    @timed('email_parse')
+    def parse_message(self, message: dict) -> Tuple[dict, List[str]]:
+        """Parse a fetched Gmail message for appointment request details."""
+        try:
+            return self.parser.parse_gmail_message(message)
         except Exception as e:
+            count('email_parse_failures_total')
             print(f"Error parsing email: {str(e)}")
             return {}, ['error_parsing_email']
 
@@ -173,35 +276,141 @@ class EmailHandler:
             context
         )
 
+    def _list_message_ids(self, query: str = INBOX_QUERY) -> List[str]:
+        """List the ids of all messages matching a query, following pagination."""
+        message_ids = []
+        page_token = None
+        while True:
+            results = self._execute(self.service.users().messages().list(
+                userId='me',
+                q=query,
+                pageToken=page_token,
+                maxResults=500
+            ))
+            message_ids.extend(message['id'] for message in results.get('messages', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return message_ids
+
+    def _history_message_ids(self, start_history_id: str) -> Tuple[List[str], str]:
+        """List messages added to the inbox since a historyId, and the latest historyId."""
+        message_ids = []
+        history_id = start_history_id
+        page_token = None
+        while True:
+            results = self._execute(self.service.users().history().list(
+                userId='me',
+                startHistoryId=start_history_id,
+                historyTypes=['messageAdded'],
+                labelId='INBOX',
+                pageToken=page_token
+            ))
+            for record in results.get('history', []):
+                for added in record.get('messagesAdded', []):
+                    message_ids.append(added['message']['id'])
+            history_id = results.get('historyId', history_id)
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return list(dict.fromkeys(message_ids)), history_id
+
+    def _fetch_messages(self, message_ids: List[str]) -> Dict[str, dict]:
+        """Fetch full messages using Gmail batch requests."""
+        messages = {}
+
+        def store(request_id, response, exception):
+            if exception is not None:
+                print(f"Error fetching email {request_id}: {str(exception)}")
+            else:
+                messages[request_id] = response
+
+        for i in range(0, len(message_ids), GMAIL_BATCH_SIZE):
+            batch = self.service.new_batch_http_request(callback=store)
+            for message_id in message_ids[i:i + GMAIL_BATCH_SIZE]:
+                batch.add(
+                    self.service.users().messages().get(userId='me', id=message_id, format='full'),
+                    request_id=message_id
+                )
+            self._execute(batch)
+        return messages
+
+    def _mark_read(self, message_ids: List[str]):
+        """Remove the UNREAD label from many messages at once."""
+        for i in range(0, len(message_ids), GMAIL_MODIFY_LIMIT):
+            self._execute(self.service.users().messages().batchModify(
+                userId='me',
+                body={'ids': message_ids[i:i + GMAIL_MODIFY_LIMIT], 'removeLabelIds': ['UNREAD']}
+            ))
+
+    @staticmethod
+    def _is_appointment_request(message: dict) -> bool:
+        """Apply the inbox query to a message found through the history API."""
+        labels = message.get('labelIds', [])
+        if 'UNREAD' not in labels or 'INBOX' not in labels:
+            return False
+        subject = header_map(message.get('payload', {}).get('headers', [])).get('subject', '')
+        return 'appointment request' in subject.lower()
+
+    @timed('email_fetch')
+    def fetch_new_messages(self) -> Tuple[List[dict], Optional[str], bool]:
+        """Fetch unread appointment request messages that arrived since the last poll.
+
+        With a state store, polls resume from the last stored historyId and
+        only fetch messages added since; otherwise (or if the historyId has
+        expired) every unread request is listed. Message bodies are fetched
+        in batch requests. Returns the messages, the historyId to resume
+        from next time, and whether every listed message could be fetched.
+        """
+        from googleapiclient.errors import HttpError
+
+        message_ids = None
+        stored_history_id = self.state_store.get(HISTORY_STATE_KEY) if self.state_store else None
+        if stored_history_id:
+            try:
+                message_ids, history_id = self._history_message_ids(stored_history_id)
+            except HttpError as e:
+                # Gmail only keeps about a week of history; start over on 404
+                if e.resp.status != 404:
+                    raise
+
+        if message_ids is None:
+            history_id = self._execute(self.service.users().getProfile(userId='me')).get('historyId')
+            message_ids = self._list_message_ids()
+
+        fetched = self._fetch_messages(message_ids)
+        messages = [
+            fetched[message_id] for message_id in message_ids
+            if message_id in fetched and self._is_appointment_request(fetched[message_id])
+        ]
+        return messages, history_id, len(fetched) == len(message_ids)
+
+    def finish_poll(self, message_ids: List[str], history_id: Optional[str], complete: bool):
+        """Mark handled messages read and, if nothing needs a retry, advance the history cursor."""
+        self._mark_read(message_ids)
+        if self.state_store and history_id and complete:
+            self.state_store.set(HISTORY_STATE_KEY, str(history_id))
+
+    @timed('email_monitor_inbox')
     def monitor_inbox(self) -> List[dict]:
         """Monitor inbox for new appointment requests."""
         try:
-            results = self.service.users().messages().list(
-                userId='me',
-                q='in:inbox is:unread subject:"appointment request"'
-            ).execute()
-
-            messages = results.get('messages', [])
+            messages, history_id, complete = self.fetch_new_messages()
             new_requests = []
 
             for message in messages:
-                email_data, missing_fields = self.parse_email_request(message['id'])
+                email_data, missing_fields = self.parse_message(message)
                 if email_data:
                     new_requests.append({
                         'message_id': message['id'],
                         'data': email_data,
                         'missing_fields': missing_fields
                     })
+                else:
+                    complete = False
 
-                    # Mark as read
-                    self.service.users().messages().modify(
-                        userId='me',
-                        id=message['id'],
-                        body={'removeLabelIds': ['UNREAD']}
-                    ).execute()
-
+            self.finish_poll([r['message_id'] for r in new_requests], history_id, complete)
             return new_requests
 
         except Exception as e:
+            count('email_monitor_inbox_failures_total')
             print(f"Error monitoring inbox: {str(e)}")
-            return [] 
\ No newline at end of file
+            return []
\ No newline at end of file
@@ -0,0 +1,217 @@
+import base64
+import mailbox
+import re
+from datetime import datetime
+from email import message_from_bytes
+from email.header import decode_header, make_header
+from email.utils import parseaddr, parsedate_to_datetime
+from functools import lru_cache
+from html import unescape
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from dateutil import parser as date_parser
+
+from config import SERVICES
+
+REQUIRED_FIELDS = ('name', 'service', 'date', 'time', 'phone')
+
+# One pass over the body finds every "Field: value" line; the field must start its line,
+# and neither side of the colon may run onto the next line
+FIELD_PATTERN = re.compile(r'^[ \t]*(name|service|date|time|phone)[ \t]*:[ \t]*(.*)$', re.IGNORECASE | re.MULTILINE)
+ADDRESS_PATTERN = re.compile(r'<([^<>\s]+@[^<>\s]+)>\s*$')
+TAG_PATTERN = re.compile(r'<[^>]+>')
+BREAK_PATTERN = re.compile(r'<\s*(br|/p|/div|/tr)\s*/?>', re.IGNORECASE)
+
+# Formats tried with strptime before falling back to dateutil's fuzzy parser
+DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%B %d, %Y', '%b %d, %Y', '%A %d %B %Y', '%d %B %Y', '%A, %B %d, %Y')
+TIME_FORMATS = ('%I:%M %p', '%H:%M', '%I%p', '%I:%M%p', '%I %p', '%H.%M', '%I.%M %p', '%I.%M%p')
+
+
+def header_map(headers: List[dict]) -> Dict[str, str]:
+    """Index Gmail API headers by lower-cased name, keeping the first value."""
+    mapped = {}
+    for header in headers:
+        mapped.setdefault(header['name'].lower(), header['value'])
+    return mapped
+
+
+def sender_address(sender: str) -> str:
+    """Return the lower-cased address from a From header."""
+    match = ADDRESS_PATTERN.search(sender)
+    return (match.group(1) if match else parseaddr(sender)[1]).lower()
+
+
+def html_to_text(html: str) -> str:
+    """Reduce an HTML body to plain text lines."""
+    return unescape(TAG_PATTERN.sub('', BREAK_PATTERN.sub('\n', html)))
+
+
+def _decode_part_data(data: str) -> str:
+    return base64.urlsafe_b64decode(data.encode('ASCII')).decode('utf-8', errors='replace')
+
+
+def gmail_body_text(payload: dict) -> str:
+    """Walk a Gmail payload's MIME tree and return the best text body.
+
+    The first text/plain part wins wherever it is nested; an HTML part is
+    only used when no plain text exists.
+    """
+    html = None
+    stack = [payload]
+    while stack:
+        part = stack.pop()
+        children = part.get('parts')
+        if children:
+            stack.extend(reversed(children))
+            continue
+        data = part.get('body', {}).get('data')
+        if not data:
+            continue
+        mime_type = part.get('mimeType', 'text/plain')
+        if mime_type == 'text/plain':
+            return _decode_part_data(data)
+        if mime_type == 'text/html' and html is None:
+            html = _decode_part_data(data)
+    return html_to_text(html) if html is not None else ''
+
+
+@lru_cache(maxsize=4096)
+def _parse_with_formats(text: str, formats: Tuple[str, ...]) -> Optional[datetime]:
+    """strptime with the first format that fits; cached, as the result never depends on the day."""
+    for fmt in formats:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_fuzzy(text: str, default: Optional[datetime] = None) -> Optional[datetime]:
+    """dateutil's fuzzy parser; not cached, as it fills in what the text leaves out from today."""
+    try:
+        return date_parser.parse(text, fuzzy=True, default=default).replace(tzinfo=None)
+    except (ValueError, OverflowError):
+        return None
+
+
+def _parse_time(text: str) -> Optional[datetime]:
+    """A time of day, or None if the text holds none (dateutil would otherwise default to midnight)."""
+    clock = _parse_with_formats(text, TIME_FORMATS)
+    if clock is not None:
+        return clock
+    # A time the text really gives comes out the same whatever the defaults are
+    midnight = _parse_fuzzy(text, datetime(2000, 1, 1, 0, 0))
+    if midnight is None or midnight.time() != _parse_fuzzy(text, datetime(2000, 1, 1, 1, 1)).time():
+        return None
+    return midnight
+
+
+def parse_requested_datetime(date_text: Optional[str], time_text: Optional[str]) -> Optional[datetime]:
+    """Normalize free-form date and time text into a naive local datetime."""
+    if not date_text:
+        return None
+    requested = _parse_with_formats(date_text.strip(), DATE_FORMATS) or _parse_fuzzy(date_text.strip())
+    if requested is None:
+        return None
+    if time_text:
+        clock = _parse_time(time_text.strip().upper())
+        if clock is None:
+            return None
+        requested = requested.replace(hour=clock.hour, minute=clock.minute, second=0, microsecond=0)
+    return requested
+
+
+class EmailRequestParser:
+    """Extracts appointment request details from Gmail payloads or raw RFC822 mail."""
+
+    def parse_text(self, body: str) -> Tuple[dict, List[str]]:
+        """Extract request fields from a plain text body."""
+        extracted = {}
+        for match in FIELD_PATTERN.finditer(body):
+            field, value = match.group(1).lower(), match.group(2).strip()
+            # A field left blank counts as missing
+            if value and field not in extracted:
+                extracted[field] = value
+
+        missing_fields = [field for field in REQUIRED_FIELDS if field not in extracted]
+
+        if 'service' in extracted and extracted['service'].lower() not in SERVICES:
+            missing_fields.append('valid_service')
+
+        if 'date' in extracted:
+            requested = parse_requested_datetime(extracted['date'], extracted.get('time'))
+            if requested is None:
+                missing_fields.append('valid_date')
+            elif 'time' in extracted:
+                extracted['requested_datetime'] = requested
+
+        return extracted, missing_fields
+
+    def _combine(self, sender: str, subject: str, sent: str, body: str) -> Tuple[dict, List[str]]:
+        email_data = {
+            'from_email': sender,
+            'from_address': sender_address(sender),
+            'subject': subject,
+            'date': sent
+        }
+        try:
+            email_data['received_at'] = parsedate_to_datetime(sent) if sent else None
+        except (TypeError, ValueError):
+            email_data['received_at'] = None
+
+        extracted, missing_fields = self.parse_text(body)
+        email_data.update(extracted)
+        return email_data, missing_fields
+
+    def parse_gmail_message(self, message: dict) -> Tuple[dict, List[str]]:
+        """Parse a message fetched with the Gmail API (format='full')."""
+        payload = message['payload']
+        headers = header_map(payload.get('headers', []))
+        return self._combine(
+            headers['from'],
+            headers.get('subject', ''),
+            headers.get('date', ''),
+            gmail_body_text(payload)
+        )
+
+    def parse_rfc822(self, raw: bytes) -> Tuple[dict, List[str]]:
+        """Parse a raw RFC822 message, e.g. from an mbox dump."""
+        return self._parse_email_message(message_from_bytes(raw))
+
+    def _parse_email_message(self, message) -> Tuple[dict, List[str]]:
+        plain = html = None
+        for part in message.walk():
+            if part.is_multipart() or part.get_filename():
+                continue
+            content_type = part.get_content_type()
+            if content_type not in ('text/plain', 'text/html'):
+                continue
+            payload = part.get_payload(decode=True) or b''
+            text = payload.decode(part.get_content_charset() or 'utf-8', errors='replace')
+            if content_type == 'text/plain':
+                plain = text
+                break
+            if html is None:
+                html = text
+
+        body = plain if plain is not None else html_to_text(html or '')
+        return self._combine(
+            _header_text(message['from']),
+            _header_text(message['subject']),
+            _header_text(message['date']),
+            body
+        )
+
+    def parse_mbox(self, path: str) -> Iterator[Tuple[dict, List[str]]]:
+        """Parse every message in an mbox file."""
+        for message in mailbox.mbox(path):
+            yield self._parse_email_message(message)
+
+
+def _header_text(value) -> str:
+    """Decode RFC 2047 encoded words in a raw header value."""
+    if value is None:
+        return ''
+    if '=?' not in value:
+        return str(value)
+    return str(make_header(decode_header(value)))
@@ -0,0 +1,77 @@
+import csv
+import io
+import json
+from typing import Iterator
+
+from sqlalchemy import select
+
+from models import Appointment, Client, Service, Stylist
+
+EXPORT_BATCH_SIZE = 1000
+
+APPOINTMENT_EXPORT_COLUMNS = [
+    'id', 'start_time', 'end_time', 'status', 'client_name', 'client_email',
+    'service', 'stylist', 'notes'
+]
+
+
+def _appointment_rows(session) -> Iterator[tuple]:
+    """Stream appointment rows from the database in fixed-size batches."""
+    statement = select(
+        Appointment.id,
+        Appointment.start_time,
+        Appointment.end_time,
+        Appointment.status,
+        Client.name,
+        Client.email,
+        Service.name,
+        Stylist.name,
+        Appointment.notes
+    ).join(Client, Appointment.client_id == Client.id).join(
+        Service, Appointment.service_id == Service.id
+    ).join(
+        Stylist, Appointment.stylist_id == Stylist.id
+    ).order_by(Appointment.start_time, Appointment.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    for row in session.execute(statement):
+        yield (
+            row[0],
+            row[1].isoformat(),
+            row[2].isoformat(),
+            row[3].value if row[3] else None,
+            *row[4:]
+        )
+
+
+def stream_appointments_csv(session_factory) -> Iterator[str]:
+    """Yield a CSV export of all appointments, one batch of lines at a time."""
+    session = session_factory()
+    try:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(APPOINTMENT_EXPORT_COLUMNS)
+        for count, row in enumerate(_appointment_rows(session), 1):
+            writer.writerow(row)
+            if count % EXPORT_BATCH_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    finally:
+        session.close()
+
+
+def stream_appointments_ndjson(session_factory) -> Iterator[str]:
+    """Yield an NDJSON export of all appointments, one batch of lines at a time."""
+    session = session_factory()
+    try:
+        lines = []
+        for row in _appointment_rows(session):
+            lines.append(json.dumps(dict(zip(APPOINTMENT_EXPORT_COLUMNS, row))))
+            if len(lines) == EXPORT_BATCH_SIZE:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+        if lines:
+            yield '\n'.join(lines) + '\n'
+    finally:
+        session.close()
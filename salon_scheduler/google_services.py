@@ -0,0 +1,131 @@
+"""Shared Google credentials and API clients.
+
+auth_setup.py writes the authorized user's tokens to token.json. Every
+Gmail and Calendar user in a process goes through one GoogleServices per
+token file: it loads the tokens once, builds each API client once from the
+discovery documents bundled with google-api-python-client, so startup
+makes no network calls, and a background thread refreshes the access
+token TOKEN_REFRESH_MARGIN seconds before it expires and writes it back
+to the token file. The margin is wider than google-auth's own expiry
+cutoff, so request threads always find a valid token and never refresh
+concurrently themselves. The client libraries are imported on first use.
+"""
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from config import GOOGLE_TOKEN_PATH, TOKEN_REFRESH_MARGIN, TOKEN_RETRY_SECONDS
+from instrumentation import timed
+
+SCOPES = [
+    'https://www.googleapis.com/auth/gmail.modify',
+    'https://www.googleapis.com/auth/calendar'
+]
+
+_providers: Dict[str, 'GoogleServices'] = {}
+_providers_lock = threading.Lock()
+
+
+class GoogleServices:
+    """Lazily loaded credentials and cached API clients for one token file."""
+
+    def __init__(self, token_path: str = GOOGLE_TOKEN_PATH, refresh_margin: float = TOKEN_REFRESH_MARGIN,
+                 retry_seconds: float = TOKEN_RETRY_SECONDS):
+        self.token_path = token_path
+        self.refresh_margin = refresh_margin
+        self.retry_seconds = retry_seconds
+        self._credentials = None  # google.oauth2.credentials.Credentials, once loaded
+        self._clients: Dict[Tuple[str, str], object] = {}
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+
+    @property
+    def credentials(self):
+        """The shared credentials, refreshed in place so every client sees the new token."""
+        with self._lock:
+            if self._credentials is None:
+                from google.oauth2.credentials import Credentials
+                self._credentials = Credentials.from_authorized_user_file(self.token_path, SCOPES)
+                self._refresher = threading.Thread(target=self._run_refresher, name='oauth-refresher', daemon=True)
+                self._refresher.start()
+            if self._needs_refresh():
+                self._refresh()
+            return self._credentials
+
+    def client(self, api: str, version: str):
+        """A built API client, shared by every caller in the process."""
+        with self._lock:
+            client = self._clients.get((api, version))
+            if client is None:
+                from googleapiclient.discovery import build
+                client = self._clients[api, version] = build(
+                    api, version, credentials=self.credentials, static_discovery=True, cache_discovery=False
+                )
+            return client
+
+    def gmail(self):
+        return self.client('gmail', 'v1')
+
+    def calendar(self):
+        return self.client('calendar', 'v3')
+
+    def _seconds_left(self) -> Optional[float]:
+        expiry = self._credentials.expiry  # Naive UTC, as google-auth keeps it
+        if expiry is None:
+            return None
+        return (expiry - datetime.utcnow()).total_seconds()
+
+    def _needs_refresh(self) -> bool:
+        if not self._credentials.refresh_token:
+            return False
+        if not self._credentials.token:
+            return True
+        left = self._seconds_left()
+        return left is not None and left < self.refresh_margin
+
+    def _refresh(self):
+        from google.auth.transport.requests import Request
+
+        with timed('oauth_refresh'):
+            self._credentials.refresh(Request())
+        # Write a new file and swap it in, so a crash never leaves a half-written token
+        partial = f'{self.token_path}.tmp'
+        with open(partial, 'w') as token:
+            token.write(self._credentials.to_json())
+        os.replace(partial, self.token_path)
+
+    def _run_refresher(self):
+        while True:
+            with self._lock:
+                if not self._credentials.refresh_token:
+                    # Nothing to refresh with; callers get the error when the token runs out
+                    return
+                left = self._seconds_left()
+            delay = self.retry_seconds if left is None else max(left - self.refresh_margin, 0)
+            if self._stop.wait(delay):
+                return
+            with self._lock:
+                try:
+                    if self._needs_refresh():
+                        self._refresh()
+                        continue
+                except Exception as e:
+                    print(f"Error refreshing Google credentials: {str(e)}")
+            if self._stop.wait(self.retry_seconds):
+                return
+
+    def stop(self):
+        """Stop the background refresher."""
+        self._stop.set()
+
+
+def google_services(token_path: Optional[str] = None) -> GoogleServices:
+    """Return this process's provider for a token file, creating it on first use."""
+    token_path = token_path or GOOGLE_TOKEN_PATH
+    with _providers_lock:
+        provider = _providers.get(token_path)
+        if provider is None:
+            provider = _providers[token_path] = GoogleServices(token_path)
+        return provider
@@ -0,0 +1,307 @@
+"""Process-wide latency histograms, counters and an optional sampling profiler.
+
+Code under measurement uses `timed` as a decorator or context manager,
+`count` for plain counters, and `observe` for durations it measured
+itself. SQLAlchemy engines report every statement through
+`instrument_engine`, Flask apps every request through `instrument_app`,
+and `render_prometheus` writes it all in the Prometheus text format for a
+/metrics endpoint.
+"""
+import bisect
+import collections
+import functools
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import PROFILER_INTERVAL
+
+# Seconds; the last bucket is +Inf
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+
+
+class Registry:
+    """Thread-safe store of counters and histograms, keyed by name and labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = collections.defaultdict(dict)
+        self._histograms: Dict[str, Dict[Labels, _Histogram]] = collections.defaultdict(dict)
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    @staticmethod
+    def _key(labels: Dict[str, object]) -> Labels:
+        return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+    def count(self, name: str, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._histograms[name]
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram()
+            histogram.observe(seconds)
+
+    def register_collector(self, collect: Callable[[], Iterable[Sample]]):
+        """Add a callback whose (name, labels, value) samples are exported as gauges."""
+        with self._lock:
+            self._collectors.append(collect)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self) -> str:
+        """Everything recorded so far, in the Prometheus text exposition format."""
+        def fmt(labels: Labels, extra: Labels = ()) -> str:
+            pairs = labels + extra
+            if not pairs:
+                return ''
+            escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+            return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {
+                name: {key: (list(h.counts), h.total) for key, h in series.items()}
+                for name, series in self._histograms.items()
+            }
+            collectors = list(self._collectors)
+
+        lines = []
+        for name, series in sorted(counters.items()):
+            lines.append(f'# TYPE {name} counter')
+            lines.extend(f'{name}{fmt(key)} {value:g}' for key, value in sorted(series.items()))
+        for name, series in sorted(histograms.items()):
+            lines.append(f'# TYPE {name} histogram')
+            for key, (counts, total) in sorted(series.items()):
+                cumulative = 0
+                for bound, bucket in zip(BUCKETS + (float('inf'),), counts):
+                    cumulative += bucket
+                    le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                    lines.append(f'{name}_bucket{fmt(key, (("le", le),))} {cumulative}')
+                lines.append(f'{name}_sum{fmt(key)} {total:.6f}')
+                lines.append(f'{name}_count{fmt(key)} {cumulative}')
+        gauges = collections.defaultdict(list)
+        for collect in collectors:
+            try:
+                for name, labels, value in collect():
+                    gauges[name].append((self._key(labels), value))
+            except Exception as e:
+                print(f"Error collecting metrics: {str(e)}")
+        for name, samples in sorted(gauges.items()):
+            lines.append(f'# TYPE {name} gauge')
+            lines.extend(f'{name}{fmt(key)} {value:g}' for key, value in sorted(samples))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+count = registry.count
+observe = registry.observe
+render_prometheus = registry.render
+
+
+class timed:
+    """Record a block's or function's duration as `<name>_seconds`, and failures as `<name>_errors_total`.
+
+        @timed('scheduler_find_slots')
+        def find_available_slots(...): ...
+
+        with timed('gmail_request', method='send'):
+            ...
+    """
+
+    def __init__(self, name: str, **labels):
+        self.name = name
+        self.labels = labels
+        self._local = threading.local()
+
+    def __enter__(self):
+        starts = self._local.__dict__.setdefault('starts', [])
+        starts.append(time.perf_counter())
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        elapsed = time.perf_counter() - self._local.starts.pop()
+        registry.observe(f'{self.name}_seconds', elapsed, **self.labels)
+        if exc_type is not None:
+            registry.count(f'{self.name}_errors_total', error=exc_type.__name__, **self.labels)
+        return False
+
+    def __call__(self, fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with self:
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+def api_method(api_request) -> str:
+    """Name a Google API request for labels: its method id, or 'batch' for batch requests."""
+    return getattr(api_request, 'methodId', None) or ('batch' if hasattr(api_request, 'add') else 'unknown')
+
+
+def _statement_kind(statement: str) -> str:
+    words = statement.lstrip().split(None, 1)
+    return words[0].upper() if words else 'UNKNOWN'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_started'].pop()
+    registry.observe('db_query_seconds', time.perf_counter() - started, statement=_statement_kind(statement))
+
+
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('query_started'):
+        connection.info['query_started'].pop()
+    registry.count('db_query_errors_total', error=type(exception_context.original_exception).__name__)
+
+
+def instrument_engine(engine):
+    """Time every statement an engine runs, by statement kind (SELECT, INSERT, ...)."""
+    from sqlalchemy import event
+
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+    return engine
+
+
+def instrument_app(app):
+    """Time every Flask request by route, method and status code."""
+    from flask import g, request
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            registry.observe(
+                'http_request_seconds',
+                time.perf_counter() - started,
+                route=request.url_rule.rule if request.url_rule else 'unmatched',
+                method=request.method,
+                status=response.status_code
+            )
+        return response
+
+    return app
+
+
+class SamplingProfiler:
+    """Sample every thread's stack at a fixed interval and count identical stacks.
+
+    Cheap enough to leave on in production for a while: one background
+    thread wakes every `interval` seconds and walks the other threads'
+    frames. `folded()` returns the counts in the collapsed format that
+    flamegraph tools read.
+    """
+
+    def __init__(self, interval: float = PROFILER_INTERVAL, max_depth: int = 64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks: collections.Counter = collections.Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            samples = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f'{code.co_filename.rsplit("/", 1)[-1]}:{code.co_name}')
+                    frame = frame.f_back
+                samples.append(';'.join(reversed(stack)))
+            with self._lock:
+                self.stacks.update(samples)
+
+    def folded(self) -> str:
+        with self._lock:
+            return ''.join(f'{stack} {hits}\n' for stack, hits in self.stacks.most_common())
+
+
+profiler = SamplingProfiler()
+
+
+def serve_metrics(port: int, host: str = '127.0.0.1'):
+    """Serve /metrics (and /debug/profile while profiling) from a background thread.
+
+    Stack samples name the code being run, so only the local machine is
+    served unless a wider host is passed.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/metrics':
+                body, content_type = render_prometheus(), 'text/plain; version=0.0.4'
+            elif self.path == '/debug/profile' and profiler.running:
+                body, content_type = profiler.folded(), 'text/plain'
+            else:
+                self.send_error(404)
+                return
+            payload = body.encode()
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
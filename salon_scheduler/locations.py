@@ -0,0 +1,143 @@
+"""Routing between salon locations, each with its own database shard.
+
+LOCATIONS in config.py maps a location id to its name, database URL and
+calendar. LocationRouter hands out one Scheduler per location, bound to
+that location's engine, so a booking at one branch only ever touches its
+own shard. Questions that span branches, such as the nearest open slot at
+any of them, fan out to a process pool: every worker keeps its own engines
+and catalogs, and each location is searched in parallel.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pytz
+
+from config import CALENDAR_TIMEZONE, DEFAULT_LOCATION, LOCATIONS, LOCATION_SEARCH_WORKERS
+from db import dispose_inherited_engines, get_engine, get_session_factory
+from models import init_db
+from scheduler import Scheduler
+
+LocationSlot = Tuple[str, datetime, List[str]]  # (location id, start, stylist keys)
+
+# Schedulers owned by a pool worker process, one per location it has searched
+_worker_schedulers: Dict[str, Scheduler] = {}
+
+
+def _init_worker():
+    dispose_inherited_engines()
+    _worker_schedulers.clear()
+
+
+def _search_location(location_id: str, database_url: str, service_name: str,
+                     preferred_date: Optional[datetime], days: int,
+                     now: Optional[datetime]) -> List[LocationSlot]:
+    """Run in a pool worker: one location's open slots."""
+    scheduler = _worker_schedulers.get(location_id)
+    if scheduler is None:
+        scheduler = _worker_schedulers[location_id] = Scheduler(
+            get_session_factory(get_engine(database_url)), location_id
+        )
+    slots = scheduler.find_available_slots(service_name, preferred_date, days=days, now=now)
+    return [(location_id, start, stylists) for start, stylists in slots]
+
+
+class LocationRouter:
+    """Send each request to its location's shard and fan cross-location searches out."""
+
+    def __init__(self, locations: Dict[str, dict] = LOCATIONS, workers: int = LOCATION_SEARCH_WORKERS):
+        self.locations = locations
+        # More processes than cores only adds hand-off cost to every search
+        self.workers = min(workers, os.cpu_count() or 1)
+        self.timezone = pytz.timezone(CALENDAR_TIMEZONE)
+        self._schedulers: Dict[str, Scheduler] = {}
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def location(self, location_id: str) -> dict:
+        info = self.locations.get(location_id)
+        if info is None:
+            raise ValueError(f"Unknown location: {location_id}")
+        return info
+
+    def scheduler(self, location_id: str = DEFAULT_LOCATION) -> Scheduler:
+        """This process's Scheduler for a location, created on first use."""
+        with self._lock:
+            scheduler = self._schedulers.get(location_id)
+            if scheduler is None:
+                engine = get_engine(self.location(location_id)['database_url'])
+                scheduler = self._schedulers[location_id] = Scheduler(get_session_factory(engine), location_id)
+            return scheduler
+
+    def session_factory(self, location_id: str = DEFAULT_LOCATION):
+        return self.scheduler(location_id).Session
+
+    def init_shards(self):
+        """Create or upgrade every location's database."""
+        for info in self.locations.values():
+            init_db(get_engine(info['database_url']))
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=min(self.workers, len(self.locations)), initializer=_init_worker
+                )
+            return self._pool
+
+    def find_nearest_slots(self, service_name: str, preferred_date: Optional[datetime] = None, days: int = 1,
+                           limit: int = 3, location_ids: Optional[Iterable[str]] = None,
+                           now: Optional[datetime] = None) -> List[LocationSlot]:
+        """The open slots closest to a time across locations, nearest first.
+
+        Without a preferred date the earliest slots win. A location whose
+        shard cannot be searched is reported and left out; a bad request
+        (such as an unknown service) raises as it would for one location.
+        """
+        location_ids = list(location_ids) if location_ids is not None else list(self.locations)
+        for location_id in location_ids:
+            self.location(location_id)
+
+        if self.workers > 1 and len(location_ids) > 1:
+            pool = self._executor()
+            futures = {
+                location_id: pool.submit(_search_location, location_id, self.locations[location_id]['database_url'],
+                                         service_name, preferred_date, days, now)
+                for location_id in location_ids
+            }
+            searches = [(location_id, future.result) for location_id, future in futures.items()]
+        else:
+            searches = [
+                (location_id, lambda location_id=location_id: [
+                    (location_id, start, stylists)
+                    for start, stylists in self.scheduler(location_id).find_available_slots(
+                        service_name, preferred_date, days=days, now=now)
+                ])
+                for location_id in location_ids
+            ]
+
+        found: List[LocationSlot] = []
+        for location_id, result in searches:
+            try:
+                found.extend(result())
+            except ValueError:
+                raise
+            except Exception as e:
+                print(f"Error searching location {location_id}: {str(e)}")
+
+        if preferred_date is None:
+            found.sort(key=lambda slot: (slot[1], slot[0]))
+        else:
+            target = preferred_date
+            if target.tzinfo is not None:
+                target = target.astimezone(self.timezone).replace(tzinfo=None)
+            found.sort(key=lambda slot: (abs(slot[1] - target), slot[1], slot[0]))
+        return found[:limit]
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
@@ -1 +1,67 @@
- 
\ No newline at end of file
+import asyncio
+import signal
+
+from calendar_manager import CalendarManager
+from config import DEFAULT_LOCATION, METRICS_HOST, METRICS_LOG_SECONDS, METRICS_PORT, PROFILER_ENABLED
+from email_handler import EmailHandler
+from instrumentation import profiler, registry, serve_metrics
+from locations import LocationRouter
+from pipeline import BookingPipeline, run_calendar_sync, run_reminders
+from reminders import ReminderDispatcher
+from sync_state import SyncStateStore
+
+
+async def log_metrics(pipeline: BookingPipeline, interval: float = METRICS_LOG_SECONDS):
+    """Print each stage's queue depth and latency at a fixed interval."""
+    while True:
+        await asyncio.sleep(interval)
+        for stage in pipeline.snapshot():
+            print(
+                f"[{stage['stage']}] queued={stage['queue_depth']} processed={stage['processed']} "
+                f"failed={stage['failed']} mean={stage['mean_latency_ms']:.1f}ms max={stage['max_latency_ms']:.1f}ms"
+            )
+
+
+async def run():
+    """Monitor the inbox, book requests, send replies and reminders, and sync the calendar until interrupted."""
+    # Each daemon serves one location's inbox and calendar; run one per location with SALON_LOCATION
+    router = LocationRouter()
+    router.init_shards()
+    scheduler = router.scheduler(DEFAULT_LOCATION)
+    Session = scheduler.Session
+    state_store = SyncStateStore(Session)
+    handler = EmailHandler(state_store=state_store, session_factory=Session)
+    calendar = CalendarManager(Session, state_store=state_store,
+                               calendar_id=router.location(DEFAULT_LOCATION)['calendar_id'],
+                               location_id=DEFAULT_LOCATION)
+    pipeline = BookingPipeline(handler, scheduler)
+    dispatcher = ReminderDispatcher(Session, handler)
+
+    registry.register_collector(lambda: [
+        ('pipeline_queue_depth', {'stage': stage['stage']}, stage['queue_depth']) for stage in pipeline.snapshot()
+    ])
+    if PROFILER_ENABLED:
+        profiler.start()
+    if METRICS_PORT:
+        serve_metrics(METRICS_PORT, METRICS_HOST)
+        print(f"Serving metrics on {METRICS_HOST}:{METRICS_PORT}")
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, pipeline.stop)
+
+    print("Salon scheduler running; press Ctrl+C to stop.")
+    await pipeline.run([
+        run_reminders(dispatcher, pipeline.stopping),
+        run_calendar_sync(calendar, pipeline.stopping),
+        log_metrics(pipeline)
+    ])
+    print("Shut down cleanly.")
+
+
+def main():
+    asyncio.run(run())
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""Schema upgrades for existing databases.
+
+`Base.metadata.create_all` only creates missing tables, so columns and
+indexes added to existing tables are applied here. Each migration runs once
+and is recorded in the schema_versions table; migrations must be safe to run
+against a database that create_all has just built from the current models.
+"""
+from typing import Callable, List, Tuple
+
+from sqlalchemy import inspect
+
+from config import DEFAULT_LOCATION
+from models import Appointment, CalendarEvent, Client, EmailLog, EmailLogDay, RowCount, SchemaVersion, Stylist
+
+# Tables whose rows are counted in row_counts
+COUNTED_TABLES = (Client.__table__, Appointment.__table__)
+
+POSTGRES_ROW_COUNT_FUNCTION = """
+CREATE OR REPLACE FUNCTION bump_row_count() RETURNS trigger AS $$
+BEGIN
+    UPDATE row_counts SET count = count + (CASE WHEN TG_OP = 'INSERT' THEN 1 ELSE -1 END)
+    WHERE name = TG_TABLE_NAME;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def _create_indexes(connection, *tables):
+    """Create any indexes declared on the models that the database is missing.
+
+    Indexes on columns that a later migration adds are left to that migration.
+    """
+    inspector = inspect(connection)
+    for table in tables:
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            if all(column.name in columns for column in index.columns):
+                index.create(bind=connection, checkfirst=True)
+
+
+def _add_hot_query_indexes(connection):
+    _create_indexes(connection, Appointment.__table__, EmailLog.__table__)
+
+
+def _add_column(connection, table, name: str, definition: str):
+    """Add a column to an existing table unless it is already there."""
+    columns = {column['name'] for column in inspect(connection).get_columns(table.name)}
+    if name not in columns:
+        connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {name} {definition}")
+
+
+def _add_stylist_version(connection):
+    _add_column(connection, Stylist.__table__, 'version', 'INTEGER NOT NULL DEFAULT 0')
+
+
+def _add_calendar_mirror(connection):
+    _add_column(connection, Appointment.__table__, 'event_id', 'VARCHAR(1024)')
+    CalendarEvent.__table__.create(bind=connection, checkfirst=True)
+    _create_indexes(connection, Appointment.__table__, CalendarEvent.__table__)
+
+
+def _add_location_ids(connection):
+    # Databases from before sharding hold the default location's rows
+    definition = f"VARCHAR(50) NOT NULL DEFAULT '{DEFAULT_LOCATION}'"
+    _add_column(connection, Stylist.__table__, 'location_id', definition)
+    _add_column(connection, Appointment.__table__, 'location_id', definition)
+
+
+def _add_row_counts(connection):
+    """Count the rows of COUNTED_TABLES once, then keep the counts with triggers.
+
+    Triggers see every insert and delete, ORM or not and from any process.
+    Databases other than SQLite and PostgreSQL get no counts, and readers
+    fall back to counting.
+    """
+    RowCount.__table__.create(bind=connection, checkfirst=True)
+    dialect = connection.dialect.name
+    if dialect not in ('sqlite', 'postgresql'):
+        return
+    if dialect == 'postgresql':
+        connection.exec_driver_sql(POSTGRES_ROW_COUNT_FUNCTION)
+    for table in COUNTED_TABLES:
+        connection.execute(RowCount.__table__.delete().where(RowCount.name == table.name))
+        connection.exec_driver_sql(
+            f"INSERT INTO row_counts (name, count) SELECT '{table.name}', COUNT(*) FROM {table.name}"
+        )
+        if dialect == 'postgresql':
+            connection.exec_driver_sql(
+                f"CREATE TRIGGER {table.name}_row_count AFTER INSERT OR DELETE ON {table.name} "
+                f"FOR EACH ROW EXECUTE FUNCTION bump_row_count()"
+            )
+            continue
+        for operation, change in (('INSERT', '+ 1'), ('DELETE', '- 1')):
+            connection.exec_driver_sql(
+                f"CREATE TRIGGER IF NOT EXISTS {table.name}_row_count_{operation.lower()} "
+                f"AFTER {operation} ON {table.name} BEGIN "
+                f"UPDATE row_counts SET count = count {change} WHERE name = '{table.name}'; END"
+            )
+
+
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, 'Index appointments by time, stylist and status; email logs by appointment', _add_hot_query_indexes),
+    (2, 'Index appointments by updated_at for reminder change polling',
+     lambda connection: _create_indexes(connection, Appointment.__table__)),
+    (3, 'Add stylists.version for optimistic booking', _add_stylist_version),
+    (4, 'Add appointments.event_id and the calendar_events mirror', _add_calendar_mirror),
+    (5, 'Add location_id to stylists and appointments', _add_location_ids),
+    (6, 'Add email_log_days for the counts of archived email logs',
+     lambda connection: EmailLogDay.__table__.create(bind=connection, checkfirst=True)),
+    (7, 'Add row_counts, kept by triggers, for the client and appointment totals', _add_row_counts),
+]
+
+
+def current_version(connection) -> int:
+    """Return the highest applied migration, or 0 for an unversioned database."""
+    if not inspect(connection).has_table(SchemaVersion.__tablename__):
+        return 0
+    versions = connection.execute(SchemaVersion.__table__.select()).fetchall()
+    return max((row.version for row in versions), default=0)
+
+
+def upgrade(engine) -> int:
+    """Apply all pending migrations and return the resulting schema version."""
+    with engine.begin() as connection:
+        SchemaVersion.__table__.create(bind=connection, checkfirst=True)
+        version = current_version(connection)
+        for number, description, migrate in MIGRATIONS:
+            if number <= version:
+                continue
+            migrate(connection)
+            connection.execute(SchemaVersion.__table__.insert().values(
+                version=number,
+                description=description
+            ))
+            version = number
+    return version
@@ -1,10 +1,11 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Float, Boolean, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Date, DateTime, Float, Boolean, ForeignKey, Enum, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
 
-from config import DATABASE_URL
+from config import DEFAULT_LOCATION
+from db import get_engine
 
 Base = declarative_base()
 
@@ -31,7 +32,9 @@ class Stylist(Base):
     name = Column(String(100), nullable=False)
     email = Column(String(120), nullable=False, unique=True)
     specialties = Column(String(500))  # Comma-separated list of services
+    location_id = Column(String(50), nullable=False, default=DEFAULT_LOCATION, server_default=DEFAULT_LOCATION)
     active = Column(Boolean, default=True)
+    version = Column(Integer, nullable=False, default=0, server_default='0')  # Bumped by every booking
     appointments = relationship("Appointment", back_populates="stylist")
 
 class Service(Base):
@@ -46,15 +49,24 @@ class Service(Base):
 
 class Appointment(Base):
     __tablename__ = 'appointments'
+    __table_args__ = (
+        Index('ix_appointments_start_time', 'start_time'),
+        Index('ix_appointments_stylist_start', 'stylist_id', 'start_time'),
+        Index('ix_appointments_status_start', 'status', 'start_time'),
+        Index('ix_appointments_updated_at', 'updated_at'),
+        Index('ix_appointments_event_id', 'event_id'),
+    )
 
     id = Column(Integer, primary_key=True)
     client_id = Column(Integer, ForeignKey('clients.id'), nullable=False)
     stylist_id = Column(Integer, ForeignKey('stylists.id'), nullable=False)
     service_id = Column(Integer, ForeignKey('services.id'), nullable=False)
+    location_id = Column(String(50), nullable=False, default=DEFAULT_LOCATION, server_default=DEFAULT_LOCATION)
     start_time = Column(DateTime, nullable=False)
     end_time = Column(DateTime, nullable=False)
     status = Column(Enum(AppointmentStatus), default=AppointmentStatus.PENDING)
     notes = Column(String(500))
+    event_id = Column(String(1024))  # Google Calendar event, once created
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -64,6 +76,9 @@ class Appointment(Base):
 
 class EmailLog(Base):
     __tablename__ = 'email_logs'
+    __table_args__ = (
+        Index('ix_email_logs_appointment_type', 'appointment_id', 'email_type'),
+    )
 
     id = Column(Integer, primary_key=True)
     appointment_id = Column(Integer, ForeignKey('appointments.id'))
@@ -73,7 +88,62 @@ class EmailLog(Base):
     sent_at = Column(DateTime, default=datetime.utcnow)
     status = Column(String(20))  # sent, failed, etc.
 
+class EmailLogDay(Base):
+    """Send counts per day for email logs that have been moved to the archive files."""
+    __tablename__ = 'email_log_days'
+    __table_args__ = (
+        Index('ix_email_log_days_day_type_status', 'day', 'email_type', 'status', unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)  # UTC, as sent_at
+    email_type = Column(String(50), nullable=False, default='')  # '' for logs without one
+    status = Column(String(20), nullable=False, default='')
+    count = Column(Integer, nullable=False, default=0)
+
+class RowCount(Base):
+    """Running row counts of growing tables, kept by triggers (see migrations) so nothing has to count them."""
+    __tablename__ = 'row_counts'
+
+    name = Column(String(50), primary_key=True)  # Table name
+    count = Column(Integer, nullable=False, default=0)
+
+class CalendarEvent(Base):
+    """Local mirror of a Google Calendar event, kept current by CalendarManager.sync."""
+    __tablename__ = 'calendar_events'
+    __table_args__ = (
+        Index('ix_calendar_events_end_time', 'end_time'),
+        Index('ix_calendar_events_appointment_id', 'appointment_id'),
+    )
+
+    event_id = Column(String(1024), primary_key=True)
+    appointment_id = Column(Integer, ForeignKey('appointments.id'))  # None for events made in the calendar
+    stylist_id = Column(Integer, ForeignKey('stylists.id'))  # None blocks every stylist
+    summary = Column(String(500))
+    start_time = Column(DateTime, nullable=False)
+    end_time = Column(DateTime, nullable=False)
+    etag = Column(String(100))
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class SyncState(Base):
+    __tablename__ = 'sync_state'
+
+    key = Column(String(100), primary_key=True)  # gmail_history_id, calendar sync token, etc.
+    value = Column(String(500))
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class SchemaVersion(Base):
+    __tablename__ = 'schema_versions'
+
+    version = Column(Integer, primary_key=True)
+    description = Column(String(200))
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
 # Create database and tables
-def init_db():
-    engine = create_engine(DATABASE_URL)
-    Base.metadata.create_all(engine) 
\ No newline at end of file
+def init_db(engine=None):
+    from migrations import upgrade
+
+    engine = engine or get_engine()
+    Base.metadata.create_all(engine)
+    upgrade(engine)
+    return engine 
\ No newline at end of file
@@ -0,0 +1,119 @@
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
+
+from models import Appointment, Client
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(*values) -> str:
+    """Encode the sort key of the last row on a page as an opaque token."""
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(token: Optional[str], *types: type) -> Optional[list]:
+    """Decode a cursor token into one value of each type, returning None for the first page.
+
+    Tokens are client input, so anything but a list of exactly those
+    types (datetimes as ISO strings) raises ValueError.
+    """
+    if not token:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError("Invalid cursor")
+
+    decoded = []
+    for value, kind in zip(values, types):
+        if kind is datetime and isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                raise ValueError("Invalid cursor")
+        elif type(value) is not kind:  # Not isinstance: True is not an id
+            raise ValueError("Invalid cursor")
+        decoded.append(value)
+    return decoded
+
+
+def page_size(value: Optional[str]) -> int:
+    """Clamp a requested page size to the allowed range."""
+    try:
+        size = int(value) if value else DEFAULT_PAGE_SIZE
+    except ValueError:
+        raise ValueError("Invalid page size")
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def appointments_page(session, cursor: Optional[str] = None,
+                      limit: int = DEFAULT_PAGE_SIZE) -> Tuple[List[Appointment], Optional[str]]:
+    """Return appointments newest first, keyed on (start_time, id)."""
+    query = session.query(Appointment).options(
+        joinedload(Appointment.client),
+        joinedload(Appointment.service),
+        joinedload(Appointment.stylist)
+    )
+    position = decode_cursor(cursor, datetime, int)
+    if position:
+        start_time, appointment_id = position
+        # The plain upper bound lets the database seek instead of scanning from the top
+        query = query.filter(Appointment.start_time <= start_time, or_(
+            Appointment.start_time < start_time,
+            and_(Appointment.start_time == start_time, Appointment.id < appointment_id)
+        ))
+
+    rows = query.order_by(Appointment.start_time.desc(), Appointment.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].start_time, rows[-1].id)
+    return rows, next_cursor
+
+
+def clients_page(session, cursor: Optional[str] = None,
+                 limit: int = DEFAULT_PAGE_SIZE) -> Tuple[List[Client], Optional[str]]:
+    """Return clients in id order."""
+    query = session.query(Client)
+    position = decode_cursor(cursor, int)
+    if position:
+        query = query.filter(Client.id > position[0])
+
+    rows = query.order_by(Client.id).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+    return rows, next_cursor
+
+
+def appointment_to_dict(appointment: Appointment) -> dict:
+    return {
+        'id': appointment.id,
+        'start_time': appointment.start_time.isoformat(),
+        'end_time': appointment.end_time.isoformat(),
+        'status': appointment.status.value if appointment.status else None,
+        'client': appointment.client.name if appointment.client else None,
+        'service': appointment.service.name if appointment.service else None,
+        'stylist': appointment.stylist.name if appointment.stylist else None,
+        'notes': appointment.notes
+    }
+
+
+def client_to_dict(client: Client) -> dict:
+    return {
+        'id': client.id,
+        'name': client.name,
+        'email': client.email,
+        'phone': client.phone,
+        'created_at': client.created_at.isoformat() if client.created_at else None
+    }
@@ -0,0 +1,342 @@
+import asyncio
+import time
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from config import (
+    CALENDAR_SYNC_SECONDS,
+    INBOX_POLL_SECONDS,
+    PIPELINE_BATCH_BOOKING,
+    PIPELINE_BATCH_LINGER,
+    PIPELINE_CALL_TIMEOUT,
+    PIPELINE_QUEUE_SIZE,
+    PIPELINE_WORKERS
+)
+from instrumentation import count, observe
+
+ALTERNATIVE_COUNT = 3
+
+
+class StageMetrics:
+    """Counters and latency figures for one pipeline stage."""
+
+    def __init__(self, name: str, queue: Optional[asyncio.Queue] = None):
+        self.name = name
+        self.queue = queue
+        self.processed = 0
+        self.failed = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def observe(self, seconds: float, ok: bool = True):
+        observe('pipeline_stage_seconds', seconds, stage=self.name)
+        if not ok:
+            count('pipeline_stage_failures_total', stage=self.name)
+        self.processed += 1
+        self.failed += not ok
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def snapshot(self) -> dict:
+        return {
+            'stage': self.name,
+            'queue_depth': self.queue.qsize() if self.queue is not None else 0,
+            'processed': self.processed,
+            'failed': self.failed,
+            'mean_latency_ms': self.total_seconds / self.processed * 1000 if self.processed else 0.0,
+            'max_latency_ms': self.max_seconds * 1000
+        }
+
+
+class BookingPipeline:
+    """Async daemon that turns inbox requests into bookings and replies.
+
+    Stages are connected by bounded queues, so a backlog in a later stage
+    slows inbox polling down instead of growing memory:
+
+        poll -> parse queue -> parse -> booking queue -> book -> reply queue -> reply
+
+    Gmail, Calendar and database clients are blocking, so every call runs in
+    a worker thread, under a timeout except for bookings; several workers
+    per stage mean one slow call never holds up the others. With batch booking, a single booking
+    worker instead takes everything queued after a short linger and books
+    it with Scheduler.book_batch, so requests from one poll do not take
+    each other's slots.
+    """
+
+    def __init__(self, email_handler, scheduler, workers: Dict[str, int] = None,
+                 queue_size: int = PIPELINE_QUEUE_SIZE, poll_seconds: float = INBOX_POLL_SECONDS,
+                 call_timeout: float = PIPELINE_CALL_TIMEOUT, batch_booking: bool = PIPELINE_BATCH_BOOKING,
+                 batch_linger: float = PIPELINE_BATCH_LINGER):
+        self.email_handler = email_handler
+        self.scheduler = scheduler
+        self.workers = dict(PIPELINE_WORKERS, **(workers or {}))
+        self.poll_seconds = poll_seconds
+        self.call_timeout = call_timeout
+        self.batch_booking = batch_booking
+        self.batch_linger = batch_linger
+        self.parse_queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.booking_queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.reply_queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.metrics = {
+            'poll': StageMetrics('poll'),
+            'parse': StageMetrics('parse', self.parse_queue),
+            'booking': StageMetrics('booking', self.booking_queue),
+            'reply': StageMetrics('reply', self.reply_queue)
+        }
+        self.stopping = asyncio.Event()
+        self.replied = set()  # Messages of the current poll whose reply has been sent
+
+    async def _call(self, fn: Callable, *args, **kwargs):
+        """Run a blocking call in a thread, giving up after the call timeout."""
+        return await asyncio.wait_for(asyncio.to_thread(fn, *args, **kwargs), self.call_timeout)
+
+    async def _call_untimed(self, fn: Callable, *args, **kwargs):
+        """Run a blocking call in a thread and wait for it to finish.
+
+        For bookings: a timeout only stops the waiting, and a booking left
+        running in its thread could still commit after the client was told
+        it had not.
+        """
+        return await asyncio.to_thread(fn, *args, **kwargs)
+
+    # Stages
+
+    async def poll_inbox(self):
+        """Fetch new request emails and feed them to the parse stage.
+
+        A poll is finished once its messages have been through every stage:
+        only those whose reply was sent are marked read, and the history
+        cursor stays put if any were not (unparsed, or the reply failed), so
+        they are fetched again next time.
+        """
+        while not self.stopping.is_set():
+            started = time.perf_counter()
+            ok = True
+            try:
+                messages, history_id, complete = await self._call(self.email_handler.fetch_new_messages)
+                for message in messages:
+                    await self.parse_queue.put(message)
+                for queue in (self.parse_queue, self.booking_queue, self.reply_queue):
+                    await queue.join()
+                replied, self.replied = self.replied, set()
+                await self._call(
+                    self.email_handler.finish_poll,
+                    [m['id'] for m in messages if m['id'] in replied],
+                    history_id,
+                    complete and all(m['id'] in replied for m in messages)
+                )
+            except Exception as e:
+                ok = False
+                print(f"Error polling inbox: {str(e)}")
+            self.metrics['poll'].observe(time.perf_counter() - started, ok)
+
+            try:
+                await asyncio.wait_for(self.stopping.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def parse(self, message: dict):
+        email_data, missing_fields = self.email_handler.parse_message(message)
+        if not email_data:
+            return
+        request = {'message_id': message['id'], 'data': email_data, 'missing_fields': missing_fields}
+        if missing_fields:
+            await self.reply_queue.put(('missing_info', request, None))
+        else:
+            await self.booking_queue.put(request)
+
+    async def book(self, request: dict):
+        """Book the requested time, or find alternatives if it is taken."""
+        data = request['data']
+        requested = data.get('requested_datetime')
+        try:
+            slots = await self._call(
+                self.scheduler.find_available_slots,
+                data['service'],
+                preferred_date=requested,
+                days=1
+            )
+            stylists = next((s for slot, s in slots if slot == requested), None)
+            if not stylists:
+                await self.reply_queue.put(('alternatives', request, await self._alternatives(data)))
+                return
+
+            appointment = await self._call_untimed(
+                self.scheduler.schedule_appointment,
+                data['name'],
+                data['service'],
+                requested,
+                stylists[0],
+                client_email=data.get('from_address'),
+                phone=data.get('phone')
+            )
+            await self.reply_queue.put(('confirmation', request, appointment))
+        except ValueError:
+            # Taken between the search and the booking; offer what is left
+            await self.reply_queue.put(('alternatives', request, await self._alternatives(data)))
+        except Exception:
+            # Let staff follow up by hand, but tell the client we have the request
+            await self.reply_queue.put(('acknowledgment', request, None))
+            raise
+
+    async def _alternatives(self, data: dict) -> List:
+        """The open times nearest the one asked for, or none if the request cannot be searched."""
+        try:
+            slots = await self._call(
+                self.scheduler.find_nearest_slots,
+                data['service'],
+                data.get('requested_datetime'),
+                k=ALTERNATIVE_COUNT
+            )
+        except ValueError:
+            return []
+        return [slot for slot, _ in slots]
+
+    async def book_batch(self, requests: List[dict]):
+        """Book a batch of requests together; those left over get alternatives."""
+        try:
+            results = await self._call_untimed(self.scheduler.book_batch, [
+                {
+                    'client_name': request['data']['name'],
+                    'service': request['data']['service'],
+                    'start_time': request['data'].get('requested_datetime'),
+                    'client_email': request['data'].get('from_address'),
+                    'phone': request['data'].get('phone')
+                }
+                for request in requests
+            ], alternatives=ALTERNATIVE_COUNT)
+        except Exception:
+            for request in requests:
+                await self.reply_queue.put(('acknowledgment', request, None))
+            raise
+        for request, result in zip(requests, results):
+            if result['appointment'] is not None:
+                await self.reply_queue.put(('confirmation', request, result['appointment']))
+            else:
+                await self.reply_queue.put(('alternatives', request, result['alternatives']))
+
+    async def reply(self, item):
+        kind, request, detail = item
+        data = request['data']
+        to = data.get('from_address') or data['from_email']
+        handler = self.email_handler
+        if kind == 'missing_info':
+            sent = await self._call(handler.send_missing_info_request, to, request['missing_fields'])
+        elif kind == 'confirmation':
+            sent = await self._call(handler.send_confirmation, to, detail)
+        elif kind == 'alternatives':
+            sent = await self._call(handler.send_alternatives, to, data.get('name', ''),
+                                    data.get('requested_datetime'), detail)
+        else:
+            sent = await self._call(handler.send_acknowledgment, to, data.get('name', ''))
+        if not sent:
+            raise RuntimeError(f"{kind} reply to {to} was not sent")
+        self.replied.add(request['message_id'])
+
+    async def _worker(self, name: str, queue: asyncio.Queue, handle: Callable[..., Awaitable]):
+        """Take items off a queue until cancelled, recording latency per item."""
+        metrics = self.metrics[name]
+        while True:
+            item = await queue.get()
+            started = time.perf_counter()
+            ok = True
+            try:
+                await handle(item)
+            except Exception as e:
+                ok = False
+                print(f"Error in {name} stage: {str(e)}")
+            finally:
+                metrics.observe(time.perf_counter() - started, ok)
+                queue.task_done()
+
+    async def _batch_worker(self, name: str, queue: asyncio.Queue, handle: Callable[..., Awaitable]):
+        """Like _worker, but hands everything queued within the linger to one call."""
+        metrics = self.metrics[name]
+        while True:
+            items = [await queue.get()]
+            await asyncio.sleep(self.batch_linger)
+            while not queue.empty():
+                items.append(queue.get_nowait())
+            started = time.perf_counter()
+            ok = True
+            try:
+                await handle(items)
+            except Exception as e:
+                ok = False
+                print(f"Error in {name} stage: {str(e)}")
+            finally:
+                elapsed = time.perf_counter() - started
+                for _ in items:
+                    metrics.observe(elapsed, ok)
+                    queue.task_done()
+
+    # Lifecycle
+
+    def snapshot(self) -> List[dict]:
+        """Current queue depth and latency for every stage."""
+        return [metrics.snapshot() for metrics in self.metrics.values()]
+
+    def stop(self):
+        """Stop polling; queued work is still drained by run()."""
+        self.stopping.set()
+
+    async def run(self, extra_tasks: List[Awaitable] = ()):
+        """Run all stages until stop() is called, then drain in-flight work."""
+        stages = [
+            ('parse', self.parse_queue, self.parse),
+            ('booking', self.booking_queue, self.book),
+            ('reply', self.reply_queue, self.reply)
+        ]
+        workers = [
+            asyncio.create_task(self._worker(name, queue, handle))
+            for name, queue, handle in stages
+            for _ in range(self.workers[name])
+            if not (self.batch_booking and name == 'booking')
+        ]
+        if self.batch_booking:
+            # One batch at a time, or concurrent batches would compete for slots again
+            workers.append(asyncio.create_task(self._batch_worker('booking', self.booking_queue, self.book_batch)))
+        background = [asyncio.create_task(task) for task in extra_tasks]
+
+        await self.poll_inbox()
+
+        # Drain front to back so each queue is empty before its producer's is checked
+        for _, queue, _ in stages:
+            await queue.join()
+        for task in workers + background:
+            task.cancel()
+        await asyncio.gather(*workers, *background, return_exceptions=True)
+
+
+async def run_calendar_sync(calendar, stopping: asyncio.Event, interval: float = CALENDAR_SYNC_SECONDS):
+    """Push pending calendar writes and pull calendar changes on a fixed interval."""
+    while not stopping.is_set():
+        try:
+            await asyncio.to_thread(calendar.flush)
+            await asyncio.to_thread(calendar.sync)
+        except Exception as e:
+            print(f"Error syncing calendar: {str(e)}")
+        try:
+            await asyncio.wait_for(stopping.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_reminders(dispatcher, stopping: asyncio.Event, idle_seconds: float = 60):
+    """Drive a ReminderDispatcher from the event loop."""
+    await asyncio.to_thread(dispatcher.load)
+    while not stopping.is_set():
+        try:
+            await asyncio.to_thread(dispatcher.refresh)
+            await asyncio.to_thread(dispatcher.tick)
+        except Exception as e:
+            print(f"Error sending reminders: {str(e)}")
+        due_at = dispatcher.next_due()
+        wait = idle_seconds
+        if due_at is not None:
+            wait = min(wait, max(0.0, (due_at - dispatcher.clock()) / timedelta(seconds=1)))
+        try:
+            await asyncio.wait_for(stopping.wait(), wait)
+        except asyncio.TimeoutError:
+            pass
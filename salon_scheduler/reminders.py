@@ -0,0 +1,226 @@
+import heapq
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pytz
+from sqlalchemy import and_, exists, select
+
+from config import (
+    CALENDAR_TIMEZONE,
+    EMAIL_TEMPLATES,
+    MAX_ADVANCE_DAYS,
+    REMINDER_HOURS,
+    REMINDER_REFRESH_OVERLAP_SECONDS,
+    REMINDER_RETRY_MINUTES
+)
+from models import Appointment, AppointmentStatus, Client, EmailLog, Service, Stylist
+
+REMINDER_SUBJECT = "Reminder: Your Upcoming Appointment"
+REMINDER_EMAIL_TYPE = 'reminder'
+
+
+def salon_now() -> datetime:
+    """Current wall-clock time in the salon's timezone, without tzinfo."""
+    return datetime.now(pytz.timezone(CALENDAR_TIMEZONE)).replace(tzinfo=None)
+
+
+class ReminderDispatcher:
+    """Sends each confirmed appointment's reminder REMINDER_HOURS before it starts.
+
+    Pending reminders sit in a min-heap ordered by due time, loaded once with
+    a single range query. Later changes are picked up incrementally through
+    the appointments' updated_at index. updated_at is stamped when a change
+    is flushed, not when it commits, so each refresh also re-reads the last
+    REMINDER_REFRESH_OVERLAP_SECONDS before the newest change it has seen
+    and skips the rows it already applied. Cancelled or moved appointments
+    are dropped lazily when their stale heap entry surfaces. A tick only
+    touches the reminders that are due. A reminder whose send fails goes
+    back on the heap REMINDER_RETRY_MINUTES later, while the appointment
+    is still ahead.
+    """
+
+    def __init__(self, session_factory, email_handler, clock: Callable[[], datetime] = salon_now,
+                 reminder_hours: int = REMINDER_HOURS, horizon_days: int = MAX_ADVANCE_DAYS,
+                 retry_minutes: int = REMINDER_RETRY_MINUTES):
+        self.Session = session_factory
+        self.email_handler = email_handler
+        self.clock = clock
+        self.lead_time = timedelta(hours=reminder_hours)
+        self.horizon = timedelta(days=horizon_days)
+        self.retry_delay = timedelta(minutes=retry_minutes)
+        self.refresh_overlap = timedelta(seconds=REMINDER_REFRESH_OVERLAP_SECONDS)
+        self._heap: List[Tuple[datetime, int]] = []
+        self._scheduled: Dict[int, datetime] = {}
+        self._retry_at: Dict[int, datetime] = {}
+        self._last_change: Optional[datetime] = None
+        self._applied: Dict[int, datetime] = {}  # updated_at of the changes inside the overlap
+
+    def __len__(self) -> int:
+        return len(self._scheduled)
+
+    def _unreminded(self):
+        """Filter for appointments that have no reminder sent yet; failed sends do not count."""
+        return ~exists().where(and_(
+            EmailLog.appointment_id == Appointment.id,
+            EmailLog.email_type == REMINDER_EMAIL_TYPE,
+            EmailLog.status == 'sent'
+        ))
+
+    def load(self):
+        """Load every upcoming confirmed appointment that still needs a reminder."""
+        now = self.clock()
+        session = self.Session()
+        try:
+            rows = session.execute(select(Appointment.id, Appointment.start_time, Appointment.updated_at).where(
+                Appointment.status == AppointmentStatus.CONFIRMED,
+                Appointment.start_time > now,
+                Appointment.start_time <= now + self.horizon,
+                self._unreminded()
+            )).all()
+            self._last_change = session.execute(
+                select(Appointment.updated_at).order_by(Appointment.updated_at.desc()).limit(1)
+            ).scalar()
+            self._applied = dict(session.execute(select(Appointment.id, Appointment.updated_at).where(
+                Appointment.updated_at > self._last_change - self.refresh_overlap
+            )).all()) if self._last_change else {}
+        finally:
+            session.close()
+
+        self._heap = [(start_time - self.lead_time, appointment_id) for appointment_id, start_time, _ in rows]
+        heapq.heapify(self._heap)
+        self._scheduled = {appointment_id: start_time for appointment_id, start_time, _ in rows}
+        self._retry_at = {}
+
+    def schedule(self, appointment_id: int, start_time: datetime):
+        """Add or move an appointment's reminder."""
+        if self._scheduled.get(appointment_id) == start_time:
+            return
+        self._scheduled[appointment_id] = start_time
+        self._retry_at.pop(appointment_id, None)
+        heapq.heappush(self._heap, (start_time - self.lead_time, appointment_id))
+
+    def cancel(self, appointment_id: int):
+        """Forget an appointment's reminder; its heap entry is skipped when popped."""
+        self._scheduled.pop(appointment_id, None)
+        self._retry_at.pop(appointment_id, None)
+
+    def _due_at(self, appointment_id: int) -> Optional[datetime]:
+        """When a scheduled reminder is due: its retry after a failed send, or the lead time before the start."""
+        start_time = self._scheduled.get(appointment_id)
+        if start_time is None:
+            return None
+        return self._retry_at.get(appointment_id, start_time - self.lead_time)
+
+    def refresh(self):
+        """Apply appointments created or changed since the last refresh."""
+        if self._last_change is None:
+            self.load()
+            return
+        session = self.Session()
+        try:
+            rows = session.execute(select(
+                Appointment.id, Appointment.start_time, Appointment.status, Appointment.updated_at
+            ).where(Appointment.updated_at > self._last_change - self.refresh_overlap)).all()
+        finally:
+            session.close()
+
+        for appointment_id, start_time, status, updated_at in rows:
+            if self._applied.get(appointment_id) == updated_at:
+                continue
+            if status == AppointmentStatus.CONFIRMED:
+                self.schedule(appointment_id, start_time)
+            else:
+                self.cancel(appointment_id)
+            if updated_at > self._last_change:
+                self._last_change = updated_at
+        cutoff = self._last_change - self.refresh_overlap
+        self._applied = {
+            appointment_id: updated_at for appointment_id, _, _, updated_at in rows if updated_at > cutoff
+        }
+
+    def next_due(self) -> Optional[datetime]:
+        """Return when the earliest live reminder is due."""
+        while self._heap:
+            due_at, appointment_id = self._heap[0]
+            if self._due_at(appointment_id) == due_at:
+                return due_at
+            heapq.heappop(self._heap)
+        return None
+
+    def _pop_due(self, now: datetime) -> Dict[int, datetime]:
+        """Take the reminders that have come due off the heap, as start times by appointment."""
+        due = {}
+        while self._heap and self._heap[0][0] <= now:
+            due_at, appointment_id = heapq.heappop(self._heap)
+            if self._due_at(appointment_id) != due_at:
+                continue
+            start_time = self._scheduled.pop(appointment_id)
+            self._retry_at.pop(appointment_id, None)
+            if start_time > now:
+                due[appointment_id] = start_time
+        return due
+
+    def _retry(self, due: Dict[int, datetime], now: datetime):
+        """Put reminders back on the heap for another try, unless the appointment starts first."""
+        retry_at = now + self.retry_delay
+        for appointment_id, start_time in due.items():
+            if retry_at < start_time:
+                self._scheduled[appointment_id] = start_time
+                self._retry_at[appointment_id] = retry_at
+                heapq.heappush(self._heap, (retry_at, appointment_id))
+
+    def tick(self) -> List[dict]:
+        """Send every reminder that has come due and return the send results."""
+        now = self.clock()
+        due = self._pop_due(now)
+        if not due:
+            return []
+        try:
+            results = self._send(list(due))
+        except Exception:
+            self._retry(due, now)
+            raise
+        self._retry({
+            result['appointment_id']: due[result['appointment_id']]
+            for result in results if result['status'] != 'sent'
+        }, now)
+        return results
+
+    def _send(self, due: List[int]) -> List[dict]:
+        """Send the reminders of the due appointments that are still confirmed and unreminded."""
+        # Re-check against the database so a reminder is never sent twice,
+        # even if another dispatcher or a manual send got there first.
+        session = self.Session()
+        try:
+            rows = session.execute(select(
+                Appointment.id, Appointment.start_time, Client.name, Client.email, Service.name, Stylist.name
+            ).join(Client, Appointment.client_id == Client.id).join(
+                Service, Appointment.service_id == Service.id
+            ).join(
+                Stylist, Appointment.stylist_id == Stylist.id
+            ).where(
+                Appointment.id.in_(due),
+                Appointment.status == AppointmentStatus.CONFIRMED,
+                self._unreminded()
+            )).all()
+        finally:
+            session.close()
+
+        if not rows:
+            return []
+        recipients = [
+            (email, {
+                'appointment_id': appointment_id,
+                'client_name': client_name,
+                'service': service_name,
+                'stylist': stylist_name,
+                'start_time': start_time
+            })
+            for appointment_id, start_time, client_name, email, service_name, stylist_name in rows
+        ]
+        return self.email_handler.send_bulk(
+            EMAIL_TEMPLATES['reminder'],
+            REMINDER_SUBJECT,
+            recipients,
+            email_type=REMINDER_EMAIL_TYPE
+        )
@@ -1 +1,525 @@
- 
\ No newline at end of file
+import hashlib
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+import pytz
+from sqlalchemy import func, update
+
+from config import (
+    CALENDAR_TIMEZONE,
+    DEFAULT_LOCATION,
+    MIN_ADVANCE_HOURS,
+    MAX_ADVANCE_DAYS,
+    MAX_DAILY_APPOINTMENTS,
+    BUFFER_BETWEEN_APPOINTMENTS,
+    BOOKING_RETRIES,
+    BATCH_TOLERANCE_MINUTES,
+    SLOT_CACHE_SECONDS,
+    SLOT_INTERVAL
+)
+from models import Client, Appointment, CalendarEvent, Service, Stylist, AppointmentStatus
+from availability import ScheduleBitmap
+from assignment import BatchAssigner, BookingRequest
+from catalog import Catalog, CatalogStore
+from slot_cache import SlotCache
+from clients import ClientResolver, normalize_email
+from db import get_session_factory
+from instrumentation import count, timed
+
+class BookingConflict(ValueError):
+    """A concurrent booking changed the stylist's calendar before this one was saved."""
+
+
+class Scheduler:
+    def __init__(self, session_factory=None, location_id: str = DEFAULT_LOCATION):
+        if session_factory is None:
+            session_factory = get_session_factory()
+        self.Session = session_factory
+        self.location_id = location_id
+        self.timezone = pytz.timezone(CALENDAR_TIMEZONE)
+        self.catalog = CatalogStore(session_factory, location_id)
+        self.slot_cache = SlotCache(location_id)
+        self.clients = ClientResolver(session_factory)
+
+    def _now(self) -> datetime:
+        """Current wall-clock time in the salon's timezone, without tzinfo."""
+        return datetime.now(self.timezone).replace(tzinfo=None)
+
+    def _to_local(self, value: datetime) -> datetime:
+        """Convert an aware datetime to naive salon-local time."""
+        if value.tzinfo is None:
+            return value
+        return value.astimezone(self.timezone).replace(tzinfo=None)
+
+    def _load_schedule(self, session, catalog: Catalog, first_day: date, days: int) -> ScheduleBitmap:
+        """Load active appointments and calendar blocks for a range of days into a bitmap.
+
+        The bitmap also counts booked appointments per day, used for
+        MAX_DAILY_APPOINTMENTS. Blocks are events made directly in the
+        calendar, read from the local mirror.
+        """
+        buffer = timedelta(minutes=BUFFER_BETWEEN_APPOINTMENTS)
+        range_start = datetime.combine(first_day, datetime.min.time())
+        range_end = range_start + timedelta(days=days)
+        keys_by_id = catalog.stylist_keys
+        schedule = ScheduleBitmap(catalog.schedules, first_day, days, catalog.holidays)
+
+        rows = session.query(
+            Appointment.stylist_id,
+            Appointment.start_time,
+            Appointment.end_time
+        ).filter(
+            # Appointments never span days, so the lower bound keeps this an index range scan
+            Appointment.start_time >= range_start - timedelta(days=1),
+            Appointment.start_time < range_end + buffer,
+            Appointment.end_time > range_start - buffer,
+            Appointment.status != AppointmentStatus.CANCELLED
+        ).all()
+        for stylist_id, start, end in rows:
+            schedule.add_appointment(keys_by_id.get(stylist_id), start, end)
+
+        blocks = session.query(
+            CalendarEvent.stylist_id,
+            CalendarEvent.start_time,
+            CalendarEvent.end_time
+        ).filter(
+            CalendarEvent.appointment_id.is_(None),
+            CalendarEvent.end_time > range_start - buffer,
+            CalendarEvent.start_time < range_end + buffer
+        ).all()
+        for stylist_id, start, end in blocks:
+            # A block without a stylist closes the salon for everyone
+            keys = [keys_by_id[stylist_id]] if stylist_id in keys_by_id else (
+                list(catalog.stylist_ids) if stylist_id is None else []
+            )
+            for key in keys:
+                schedule.mark_busy(key, start, end)
+
+        return schedule
+
+    @timed('scheduler_find_slots')
+    def find_available_slots(self, service_name: str, preferred_date: Optional[datetime] = None,
+                             stylist_id: Optional[str] = None, days: int = 1,
+                             now: Optional[datetime] = None) -> List[Tuple[datetime, List[str]]]:
+        """Find free slots for a service, as (start time, [stylist keys]) pairs.
+
+        Searches `days` days starting at the preferred date (or the earliest
+        bookable day) and respects the booking window, holidays, buffers and
+        the daily appointment limit. Days are served from the slot cache when
+        nothing they depend on has changed; the rest are loaded together.
+        """
+        catalog = self.catalog.get()
+        service_key, service = catalog.service(service_name)
+        candidates = catalog.eligible_stylists(service_key, stylist_id)
+        if not candidates:
+            return []
+
+        now = self._to_local(now) if now else self._now()
+        earliest, latest, first_day, days = self._search_range(now, preferred_date, days)
+        if days <= 0:
+            return []
+
+        by_day = self._day_slots(catalog, service_key, stylist_id, candidates, first_day, days)
+        return [slot for slots in by_day.values() for slot in slots if earliest <= slot[0] <= latest]
+
+    def _search_range(self, now: datetime, preferred_date: Optional[datetime],
+                      days: int) -> Tuple[datetime, datetime, date, int]:
+        """The booking window open at `now`, and the first day and number of days a search covers."""
+        earliest = now + timedelta(hours=MIN_ADVANCE_HOURS)
+        latest = now + timedelta(days=MAX_ADVANCE_DAYS)
+        first_day = preferred_date.date() if preferred_date else earliest.date()
+        first_day = max(first_day, earliest.date())
+        return earliest, latest, first_day, min(days, (latest.date() - first_day).days + 1)
+
+    def slots_etag(self, service_name: str, preferred_date: Optional[datetime] = None,
+                   stylist_id: Optional[str] = None, days: int = 1, now: Optional[datetime] = None) -> str:
+        """A validator for what find_available_slots would return for the same arguments, without searching.
+
+        It is made from the catalog generation, the slot versions of the
+        candidate stylists on each day searched and the booking window
+        rounded to the slot grid, so it changes whenever the slots can.
+        Bookings by other processes bump no versions here, so like the slot
+        cache it also changes every SLOT_CACHE_SECONDS.
+        """
+        catalog = self.catalog.get()
+        service_key, _ = catalog.service(service_name)
+        candidates = catalog.eligible_stylists(service_key, stylist_id)
+        now = self._to_local(now) if now else self._now()
+        earliest, latest, first_day, days = self._search_range(now, preferred_date, days)
+        step = timedelta(minutes=SLOT_INTERVAL)
+        # Slots sit on a grid from midnight, so the window only matters to the nearest grid point inside it
+        earliest_day = datetime.combine(earliest.date(), time.min)
+        latest_day = datetime.combine(latest.date(), time.min)
+        parts = [
+            self.location_id, catalog.generation, service_key, stylist_id, int(now.timestamp() // SLOT_CACHE_SECONDS),
+            earliest_day + -((earliest_day - earliest) // step) * step,
+            latest_day + ((latest - latest_day) // step) * step
+        ]
+        if candidates:
+            parts.extend(
+                (day, self.slot_cache.snapshot(catalog, candidates, day))
+                for day in (first_day + timedelta(days=offset) for offset in range(max(days, 0)))
+            )
+        return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+    def _day_slots(self, catalog: Catalog, service_key: str, stylist_id: Optional[str], candidates: List[str],
+                   first_day: date, days: int) -> Dict[date, List[Tuple[datetime, List[str]]]]:
+        """Every slot on each of a run of days, from the slot cache or, for the days it lacks, one query."""
+        by_day = {}
+        for day in (first_day + timedelta(days=offset) for offset in range(days)):
+            by_day[day] = self.slot_cache.get((service_key, stylist_id, day), catalog, candidates, day)
+        missing = [day for day, slots in by_day.items() if slots is None]
+        if missing:
+            snapshots = {day: self.slot_cache.snapshot(catalog, candidates, day) for day in missing}
+            session = self.Session()
+            try:
+                schedule = self._load_schedule(session, catalog, missing[0], (missing[-1] - missing[0]).days + 1)
+            finally:
+                session.close()
+            for day in missing:
+                # The whole day, so the entry holds whatever the time is when it is read
+                by_day[day] = schedule.slots(
+                    candidates,
+                    catalog.durations[service_key],
+                    earliest=datetime.combine(day, time.min),
+                    latest=datetime.combine(day, time.max),
+                    daily_limit=MAX_DAILY_APPOINTMENTS
+                )
+                room = MAX_DAILY_APPOINTMENTS - schedule.daily_count(day)
+                self.slot_cache.put((service_key, stylist_id, day), catalog, snapshots[day], room, by_day[day])
+        return by_day
+
+    @timed('scheduler_nearest_slots')
+    def find_nearest_slots(self, service_name: str, requested: Optional[datetime] = None, k: int = 3,
+                           stylist_id: Optional[str] = None,
+                           now: Optional[datetime] = None) -> List[Tuple[datetime, List[str]]]:
+        """The k free slots closest to a requested time, before or after it, nearest first.
+
+        Days are searched outward from the requested one. Until k slots are
+        in hand each side grows by the days that, at the rate slots have
+        turned up so far, should hold the rest (the whole window if none
+        have); after that, only days within the k-th slot's distance of the
+        requested time are searched, and the search stops when no unsearched
+        day is that close. Each step is one load of the days it spans; the
+        days already searched come back from the slot cache. The work grows
+        with how far away the k-th slot is, not with the booking window.
+        Pass stylist_id to keep the same stylist; otherwise any stylist who
+        offers the service will do. Without a requested time the earliest
+        slots are returned.
+        """
+        catalog = self.catalog.get()
+        service_key, _ = catalog.service(service_name)
+        candidates = catalog.eligible_stylists(service_key, stylist_id)
+        if not candidates or k <= 0:
+            return []
+
+        now = self._to_local(now) if now else self._now()
+        earliest = now + timedelta(hours=MIN_ADVANCE_HOURS)
+        latest = now + timedelta(days=MAX_ADVANCE_DAYS)
+        target = min(max(self._to_local(requested) if requested else earliest, earliest), latest)
+
+        def distance(slot: Tuple[datetime, List[str]]) -> Tuple[timedelta, datetime]:
+            return abs(slot[0] - target), slot[0]
+
+        found: List[Tuple[datetime, List[str]]] = []
+        first, last = earliest.date(), latest.date()
+        low = high = None  # Days [low, high] are searched
+        new_low = new_high = target.date()
+        while True:
+            by_day = self._day_slots(catalog, service_key, stylist_id, candidates,
+                                     new_low, (new_high - new_low).days + 1)
+            found.extend(
+                slot for day, slots in by_day.items() if low is None or not low <= day <= high
+                for slot in slots if earliest <= slot[0] <= latest
+            )
+            low, high = new_low, new_high
+            found.sort(key=distance)
+
+            if len(found) >= k:
+                # A closer slot can only be on a day within the k-th slot's distance
+                kth = abs(found[k - 1][0] - target)
+                reach_low, reach_high = (target - kth).date(), (target + kth).date()
+            else:
+                searched = (high - low).days + 1
+                more = timedelta(days=-(-(k - len(found)) * searched // len(found)) if found else (last - first).days)
+                reach_low, reach_high = low - more, high + more
+
+            new_low, new_high = max(min(reach_low, low), first), min(max(reach_high, high), last)
+            if (new_low, new_high) == (low, high):
+                return found[:k]
+
+    @timed('scheduler_book')
+    def schedule_appointment(self, client_name: str, service_name: str, start_time: datetime,
+                             stylist_id: str, client_email: Optional[str] = None,
+                             phone: Optional[str] = None, notes: Optional[str] = None,
+                             client_id: Optional[int] = None) -> dict:
+        """Book an appointment if the stylist is free and return its details.
+
+        The client is `client_id` when given, otherwise the one with
+        `client_email` (created if new), otherwise one named `client_name`.
+        """
+        catalog = self.catalog.get()
+        service_key, service = catalog.service(service_name)
+        if not catalog.eligible_stylists(service_key, stylist_id):
+            raise ValueError(f"{stylist_id} does not offer {service_key}")
+
+        start_time = self._to_local(start_time)
+        end_time = start_time + catalog.durations[service_key]
+        now = self._now()
+        if start_time < now + timedelta(hours=MIN_ADVANCE_HOURS):
+            raise ValueError(f"Appointments must be booked at least {MIN_ADVANCE_HOURS} hours in advance")
+        if start_time > now + timedelta(days=MAX_ADVANCE_DAYS):
+            raise ValueError(f"Appointments can only be booked {MAX_ADVANCE_DAYS} days in advance")
+
+        opening = catalog.opening(stylist_id, start_time.date())
+        if opening is None or not (opening[0] <= start_time and end_time <= opening[1]):
+            raise ValueError("Requested time is outside business hours")
+
+        if client_id is None:
+            client_id = self.clients.resolve_one(client_email, client_name, phone)
+        for _ in range(BOOKING_RETRIES):
+            try:
+                return self._book(catalog, client_name, service_key, start_time, end_time, stylist_id,
+                                  client_id, notes)
+            except BookingConflict:
+                count('booking_conflicts_total')
+                continue
+        raise BookingConflict("The stylist's calendar is busy right now, please try again")
+
+    @timed('scheduler_book_batch')
+    def book_batch(self, requests: List[dict], tolerance_minutes: int = BATCH_TOLERANCE_MINUTES,
+                   alternatives: int = 3, now: Optional[datetime] = None) -> List[dict]:
+        """Book requests that compete for the same slots together.
+
+        Each request is a dict with client_name, service and start_time, and
+        optionally stylist_id, client_email, phone and notes. The batch is
+        placed jointly by BatchAssigner, moving a request by up to
+        `tolerance_minutes` when that lets more of them be booked, and each
+        placement is then booked as schedule_appointment would. Returns one
+        dict per request with 'appointment' (the booking, or None) and
+        'alternatives' (the start times nearest the one asked for, found by
+        find_nearest_slots once the batch is booked, if it could not be).
+        """
+        catalog = self.catalog.get()
+        now = self._to_local(now) if now else self._now()
+        earliest = now + timedelta(hours=MIN_ADVANCE_HOURS)
+        latest = now + timedelta(days=MAX_ADVANCE_DAYS)
+        results = [{'appointment': None, 'alternatives': []} for _ in requests]
+
+        asks = []
+        for request in requests:
+            start_time = request.get('start_time')
+            start_time = self._to_local(start_time) if start_time else earliest
+            asks.append(BookingRequest(
+                (request.get('service') or '').strip().lower(), start_time, request.get('stylist_id')
+            ))
+        if not asks:
+            return results
+
+        first_day = max(min(ask.requested for ask in asks).date(), earliest.date())
+        last_day = min(max(ask.requested for ask in asks).date(), latest.date())
+        if last_day < first_day:
+            return results
+        session = self.Session()
+        try:
+            schedule = self._load_schedule(session, catalog, first_day, (last_day - first_day).days + 1)
+        finally:
+            session.close()
+
+        # Requests without a time only get alternatives, starting from the earliest bookable day
+        dated = [index for index, request in enumerate(requests) if request.get('start_time')]
+        placements = [None] * len(requests)
+        solved = BatchAssigner(
+            schedule,
+            services=catalog.services,
+            stylists=catalog.stylists,
+            tolerance=timedelta(minutes=tolerance_minutes),
+            earliest=earliest,
+            latest=latest,
+            daily_limit=MAX_DAILY_APPOINTMENTS
+        ).solve([asks[index] for index in dated])
+        for index, placement in zip(dated, solved):
+            placements[index] = placement
+
+        # Every client the batch books, found or created together
+        client_ids = self.clients.resolve(
+            (request.get('client_email'), request.get('client_name'), request.get('phone'))
+            for request, placement in zip(requests, placements) if placement is not None
+        )
+        for request, placement, result in zip(requests, placements, results):
+            if placement is None:
+                continue
+            start_time, stylist_id = placement
+            try:
+                result['appointment'] = self.schedule_appointment(
+                    request.get('client_name'),
+                    request['service'],
+                    start_time,
+                    stylist_id,
+                    client_email=request.get('client_email'),
+                    phone=request.get('phone'),
+                    notes=request.get('notes'),
+                    client_id=client_ids.get(normalize_email(request.get('client_email')))
+                )
+            except ValueError:
+                continue
+
+        # Offer what is left once the whole batch is booked
+        for ask, result in zip(asks, results):
+            if result['appointment'] is not None or ask.service not in catalog.services:
+                continue
+            if ask.stylist and ask.stylist not in catalog.stylists:
+                continue
+            slots = self.find_nearest_slots(ask.service, ask.requested, k=alternatives, stylist_id=ask.stylist,
+                                            now=now)
+            result['alternatives'] = [slot for slot, _ in slots]
+        return results
+
+    def _begin_write(self, session):
+        """Start a write transaction that holds the database write lock up front.
+
+        SQLite otherwise takes the lock at the first write, and a transaction
+        that has already read cannot always upgrade. Other databases rely on
+        the row lock taken by the stylist version update.
+        """
+        connection = session.connection()
+        if connection.dialect.name == 'sqlite':
+            connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+    def _book(self, catalog: Catalog, client_name: str, service_key: str, start_time: datetime, end_time: datetime,
+              stylist_id: str, client_id: Optional[int], notes: Optional[str]) -> dict:
+        """Check availability, then insert the appointment if the stylist's calendar is unchanged.
+
+        The availability check runs without locks against the stylist's
+        version. The insert happens in a short write transaction that bumps
+        the version only if it still matches; if another booking for the
+        stylist got in first, BookingConflict is raised and the caller retries.
+        """
+        session = self.Session()
+        try:
+            stylist_db_id = catalog.stylist_ids[stylist_id]
+            day_start = datetime.combine(start_time.date(), datetime.min.time())
+            day_end = day_start + timedelta(days=1)
+
+            # Read the version first so any booking committed after it is caught below
+            version = session.query(Stylist.version).filter_by(id=stylist_db_id).scalar()
+            schedule = self._load_schedule(session, catalog, start_time.date(), 1)
+            if schedule.daily_count(start_time.date()) >= MAX_DAILY_APPOINTMENTS:
+                raise ValueError("No more appointments available on this day")
+            if not schedule.is_free(stylist_id, start_time, end_time):
+                raise ValueError("Requested time is not available")
+            session.rollback()
+
+            self._begin_write(session)
+            claimed = session.execute(
+                update(Stylist)
+                .where(Stylist.id == stylist_db_id, Stylist.version == version)
+                .values(version=Stylist.version + 1)
+            ).rowcount
+            if claimed != 1:
+                raise BookingConflict("Another booking for this stylist was made at the same time")
+
+            # The daily limit is salon-wide, so other stylists' bookings can still use it up
+            booked_today = session.query(func.count(Appointment.id)).filter(
+                Appointment.start_time >= day_start,
+                Appointment.start_time < day_end,
+                Appointment.status != AppointmentStatus.CANCELLED
+            ).scalar()
+            if booked_today >= MAX_DAILY_APPOINTMENTS:
+                raise ValueError("No more appointments available on this day")
+
+            client = None
+            if client_id is not None:
+                client = session.get(Client, client_id)
+            elif client_name:
+                client = session.query(Client).filter_by(name=client_name).first()
+            if client is None:
+                raise ValueError("An email address is required for new clients")
+
+            appointment = Appointment(
+                client_id=client.id,
+                stylist_id=stylist_db_id,
+                service_id=catalog.service_ids[service_key],
+                location_id=self.location_id,
+                start_time=start_time,
+                end_time=end_time,
+                status=AppointmentStatus.CONFIRMED,
+                notes=notes
+            )
+            session.add(appointment)
+            session.commit()
+
+            return {
+                'id': appointment.id,
+                'location_id': self.location_id,
+                'client_name': client.name,
+                'client_email': client.email,
+                'service': service_key,
+                'stylist_id': stylist_id,
+                'stylist_name': catalog.stylists[stylist_id]['name'],
+                'start_time': start_time.isoformat(),
+                'end_time': end_time.isoformat(),
+                'status': appointment.status.value
+            }
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def cancel_appointment(self, event_id: str) -> bool:
+        """Cancel an appointment by calendar event id or appointment id.
+
+        The calendar event itself is deleted by the next CalendarManager.flush.
+        """
+        session = self.Session()
+        try:
+            appointment = session.query(Appointment).filter_by(event_id=event_id).first()
+            if appointment is None:
+                appointment = session.get(Appointment, int(event_id))
+            if appointment is None or appointment.status == AppointmentStatus.CANCELLED:
+                return False
+            appointment.status = AppointmentStatus.CANCELLED
+            session.commit()
+            return True
+        except ValueError:
+            return False
+        finally:
+            session.close()
+
+    def get_upcoming_appointments(self, days: int = 7) -> List[dict]:
+        """Return active appointments starting within the next `days` days."""
+        now = self._now()
+        session = self.Session()
+        try:
+            rows = session.query(
+                Appointment.id,
+                Appointment.start_time,
+                Appointment.end_time,
+                Appointment.status,
+                Client.name,
+                Service.name,
+                Stylist.name
+            ).join(Client, Appointment.client_id == Client.id).join(
+                Service, Appointment.service_id == Service.id
+            ).join(
+                Stylist, Appointment.stylist_id == Stylist.id
+            ).filter(
+                Appointment.start_time >= now,
+                Appointment.start_time < now + timedelta(days=days),
+                Appointment.status.in_([AppointmentStatus.PENDING, AppointmentStatus.CONFIRMED])
+            ).order_by(Appointment.start_time).all()
+
+            return [
+                {
+                    'id': row[0],
+                    'start_time': row[1],
+                    'end_time': row[2],
+                    'status': row[3].value,
+                    'client_name': row[4],
+                    'service_name': row[5],
+                    'stylist_name': row[6]
+                }
+                for row in rows
+            ]
+        finally:
+            session.close()
\ No newline at end of file
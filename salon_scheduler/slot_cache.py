@@ -0,0 +1,217 @@
+"""Cached slot searches, invalidated by per-stylist-day versions.
+
+Scheduler.find_available_slots keeps each day's slots for a service (and
+optionally one stylist) in a SlotCache. A day is computed from its
+midnight, so the entry does not depend on when it was computed; the
+booking window is applied as slots are read out. Each entry remembers the
+versions of its candidate stylists on that day and stays valid until one
+of them changes. The daily appointment limit is salon-wide, so an entry
+also records how much room the day had left, and is dropped once that
+many appointments on the day have changed, whoever they were for.
+
+Versions are bumped after a session commits a change to an appointment,
+for its stylist and day before and after the change, and a calendar sync
+that pulls changes invalidates every entry, as blocks can close any day.
+Bookings made by other processes are not seen here, so entries also
+expire after SLOT_CACHE_SECONDS. A stale slot is never booked: booking
+rechecks the stylist's calendar in the database.
+"""
+import sys
+import threading
+import weakref
+from datetime import date, datetime, timedelta
+from itertools import chain
+from typing import Dict, Hashable, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from config import DEFAULT_LOCATION, SLOT_CACHE_BYTES, SLOT_CACHE_SECONDS
+from models import Appointment
+from cache import LRUCache
+from catalog import Catalog
+from instrumentation import count, registry
+
+Slot = Tuple[datetime, List[str]]
+# (location, stylist database id, day)
+StylistDay = Tuple[str, int, date]
+
+WATCHED_COLUMNS = ('stylist_id', 'start_time', 'end_time', 'status', 'location_id')
+
+
+class SlotVersions:
+    """Change counters per stylist and day, and per day, for every location in the process."""
+
+    def __init__(self):
+        self._stylist_days: Dict[StylistDay, int] = {}
+        self._days: Dict[Tuple[str, date], int] = {}
+        self._epoch = 0  # Bumped when anything may have changed
+        self._pruned: Optional[date] = None
+        self._lock = threading.Lock()
+
+    def snapshot(self, location_id: str, stylist_ids: Iterable[int], day: date) -> Tuple[Tuple[int, ...], int]:
+        """The epoch and candidate stylists' versions on a day, and the day's version."""
+        with self._lock:
+            return (
+                (self._epoch,) + tuple(
+                    self._stylist_days.get((location_id, stylist_id, day), 0) for stylist_id in stylist_ids
+                ),
+                self._days.get((location_id, day), 0)
+            )
+
+    def bump_all(self):
+        """Invalidate every cached day, in every location."""
+        with self._lock:
+            self._epoch += 1
+
+    def bump(self, changes: Iterable[StylistDay]):
+        with self._lock:
+            for location_id, stylist_id, day in changes:
+                key = (location_id, stylist_id, day)
+                self._stylist_days[key] = self._stylist_days.get(key, 0) + 1
+                self._days[location_id, day] = self._days.get((location_id, day), 0) + 1
+            # Nobody searches past days, so their counters can go
+            today = date.today()
+            if self._pruned != today:
+                self._pruned = today
+                cutoff = today - timedelta(days=1)
+                self._stylist_days = {key: n for key, n in self._stylist_days.items() if key[2] >= cutoff}
+                self._days = {key: n for key, n in self._days.items() if key[1] >= cutoff}
+
+
+slot_versions = SlotVersions()
+
+
+class DaySlots(NamedTuple):
+    catalog: Catalog
+    versions: Tuple[int, ...]
+    day_version: int
+    room: int  # Appointments the day could still take under MAX_DAILY_APPOINTMENTS
+    slots: List[Slot]
+
+
+def _entry_bytes(entry: DaySlots) -> int:
+    """Rough size of an entry; stylist keys are shared with the catalog and not counted."""
+    return sys.getsizeof(entry) + sys.getsizeof(entry.slots) + sum(
+        sys.getsizeof(slot) + sys.getsizeof(slot[0]) + sys.getsizeof(slot[1]) for slot in entry.slots
+    )
+
+
+class SlotCache:
+    """One scheduler's cached days of slots, held to a memory budget with LRU eviction.
+
+    Keys are (service, stylist or None, day). The slot lists handed out are
+    shared between callers and must not be modified.
+    """
+
+    def __init__(self, location_id: str, versions: SlotVersions = slot_versions,
+                 max_bytes: int = SLOT_CACHE_BYTES, ttl: float = SLOT_CACHE_SECONDS):
+        self.location_id = location_id
+        self.versions = versions
+        self.entries = LRUCache(max_bytes, size=_entry_bytes, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+        _caches.add(self)
+
+    def _stylist_ids(self, catalog: Catalog, candidates: List[str]) -> List[int]:
+        return [catalog.stylist_ids[key] for key in candidates]
+
+    def snapshot(self, catalog: Catalog, candidates: List[str], day: date) -> Tuple[Tuple[int, ...], int]:
+        """Versions to store with a day computed from now on; take it before reading the database."""
+        return self.versions.snapshot(self.location_id, self._stylist_ids(catalog, candidates), day)
+
+    def get(self, key: Hashable, catalog: Catalog, candidates: List[str], day: date) -> Optional[List[Slot]]:
+        """A day's cached slots, or None if there are none or they may have changed."""
+        entry = self.entries.get(key)
+        result = 'miss'
+        if entry is not None:
+            versions, day_version = self.snapshot(catalog, candidates, day)
+            if (entry.catalog is catalog and entry.versions == versions
+                    and day_version - entry.day_version < max(entry.room, 1)):
+                result = 'hit'
+            else:
+                self.entries.invalidate(key)
+                result = 'stale'
+        count('slot_cache_lookups_total', result=result, location=self.location_id)
+        if result == 'hit':
+            self.hits += 1
+            return entry.slots
+        self.misses += 1
+        return None
+
+    def put(self, key: Hashable, catalog: Catalog, snapshot: Tuple[Tuple[int, ...], int], room: int,
+            slots: List[Slot]):
+        versions, day_version = snapshot
+        self.entries.set(key, DaySlots(catalog, versions, day_version, room, slots))
+
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+# Every live cache, for the metrics collector
+_caches: 'weakref.WeakSet[SlotCache]' = weakref.WeakSet()
+
+
+def _collect_metrics():
+    totals: Dict[str, List[int]] = {}
+    for cache in list(_caches):
+        total = totals.setdefault(cache.location_id, [0, 0, 0, 0])
+        total[0] += cache.hits
+        total[1] += cache.misses
+        total[2] += cache.entries.bytes
+        total[3] += len(cache.entries)
+    for location_id, (hits, misses, size, entries) in sorted(totals.items()):
+        labels = {'location': location_id}
+        yield 'slot_cache_hit_ratio', labels, hits / (hits + misses) if hits + misses else 0.0
+        yield 'slot_cache_bytes', labels, size
+        yield 'slot_cache_entries', labels, entries
+
+
+registry.register_collector(_collect_metrics)
+
+
+def _changed_days(appointment: Appointment, deleted: bool = False) -> Set[StylistDay]:
+    """Stylist-days an appointment occupied before and after its pending changes."""
+    state = inspect(appointment)
+    if state.persistent and not deleted and not any(
+        state.attrs[column].history.has_changes() for column in WATCHED_COLUMNS
+    ):
+        return set()
+
+    def values(column: str) -> List:
+        history = state.attrs[column].history
+        return [value for value in chain(history.unchanged, history.added, history.deleted) if value is not None]
+
+    return {
+        (location_id, stylist_id, start.date())
+        for location_id in values('location_id') or [DEFAULT_LOCATION]
+        for stylist_id in values('stylist_id')
+        for start in values('start_time')
+    }
+
+
+def _collect_changes(session, flush_context):
+    changes = session.info.setdefault('slot_changes', set())
+    for instance in chain(session.new, session.dirty):
+        if isinstance(instance, Appointment):
+            changes |= _changed_days(instance)
+    for instance in session.deleted:
+        if isinstance(instance, Appointment):
+            changes |= _changed_days(instance, deleted=True)
+
+
+def _publish_changes(session):
+    changes = session.info.pop('slot_changes', None)
+    if changes:
+        slot_versions.bump(changes)
+
+
+def _discard_changes(session):
+    session.info.pop('slot_changes', None)
+
+
+# Bumped after commit, so a search that read the versions first never caches rows from before the change
+event.listen(Session, 'after_flush', _collect_changes)
+event.listen(Session, 'after_commit', _publish_changes)
+event.listen(Session, 'after_rollback', _discard_changes)
@@ -0,0 +1,176 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from itertools import chain
+
+from sqlalchemy import and_, case, event, func, select
+from sqlalchemy.orm import Session
+
+from config import DASHBOARD_CACHE_SECONDS
+from models import Appointment, AppointmentStatus, Client, RowCount, Service, Stylist
+from availability import business_windows
+from cache import TTLCache
+from catalog import Catalog
+
+dashboard_cache = TTLCache(DASHBOARD_CACHE_SECONDS)
+
+BOOKED_STATUSES = [AppointmentStatus.PENDING, AppointmentStatus.CONFIRMED, AppointmentStatus.COMPLETED]
+
+
+def week_bounds(day: date) -> Tuple[datetime, datetime]:
+    """Return the Monday-to-Monday range containing a day."""
+    start = datetime.combine(day - timedelta(days=day.weekday()), datetime.min.time())
+    return start, start + timedelta(days=7)
+
+
+def _open_minutes(schedule: dict, week_start: datetime, holidays) -> int:
+    windows = business_windows(schedule, week_start.date(), 7, holidays)
+    return sum(int((end - start).total_seconds() // 60) for start, end in windows)
+
+
+def row_count(session, model) -> int:
+    """A table's row count from row_counts, or by counting on a database without it."""
+    counted = session.execute(select(RowCount.count).where(RowCount.name == model.__tablename__)).scalar()
+    return counted if counted is not None else session.query(func.count()).select_from(model).scalar()
+
+
+def _counted(model):
+    return select(RowCount.count).where(RowCount.name == model.__tablename__).scalar_subquery()
+
+
+def dashboard_stats(session, now: datetime, catalog: Catalog) -> dict:
+    """Compute the dashboard counters in a single aggregate query.
+
+    One row comes back per stylist with their booked minutes and revenue for
+    the current week; the salon-wide totals ride along as scalar subqueries
+    reading the running counts in row_counts. The week's appointments are
+    joined through the (stylist_id, start_time) index, so the cost does not
+    grow with history.
+    """
+    day_start = datetime.combine(now.date(), datetime.min.time())
+    day_end = day_start + timedelta(days=1)
+    week_start, week_end = week_bounds(now.date())
+
+    booked = and_(
+        Appointment.stylist_id == Stylist.id,
+        Appointment.start_time >= week_start,
+        Appointment.start_time < week_end,
+        Appointment.status.in_(BOOKED_STATUSES)
+    )
+    statement = select(
+        Stylist.name,
+        func.coalesce(func.sum(Service.duration), 0),
+        func.coalesce(func.sum(Service.price), 0.0),
+        func.coalesce(func.sum(case(
+            (and_(Appointment.start_time >= day_start, Appointment.start_time < day_end), 1),
+            else_=0
+        )), 0),
+        _counted(Client),
+        _counted(Appointment)
+    ).select_from(Stylist).outerjoin(Appointment, booked).outerjoin(
+        Service, Appointment.service_id == Service.id
+    ).group_by(Stylist.id, Stylist.name).order_by(Stylist.name)
+
+    rows = session.execute(statement).all()
+    keys = catalog.stylist_keys_by_name
+
+    utilization = []
+    for name, booked_minutes, _, _, _, _ in rows:
+        open_minutes = (
+            _open_minutes(catalog.schedules[keys[name]], week_start, catalog.holidays) if name in keys else 0
+        )
+        utilization.append({
+            'stylist': name,
+            'booked_minutes': int(booked_minutes),
+            'open_minutes': open_minutes,
+            'utilization': booked_minutes / open_minutes if open_minutes else 0.0
+        })
+
+    total_clients, total_appointments = (rows[0][4], rows[0][5]) if rows else (None, None)
+    if total_clients is None:
+        total_clients = row_count(session, Client)
+    if total_appointments is None:
+        total_appointments = row_count(session, Appointment)
+
+    return {
+        'todays_count': sum(int(row[3]) for row in rows),
+        'weekly_revenue': float(sum(row[2] for row in rows)),
+        'total_clients': total_clients,
+        'total_appointments': total_appointments,
+        'utilization': utilization
+    }
+
+
+def todays_appointments(session, now: datetime) -> List[dict]:
+    """Return today's booked appointments (those todays_count counts) with client, service and stylist names."""
+    day_start = datetime.combine(now.date(), datetime.min.time())
+    rows = session.query(
+        Appointment.id,
+        Appointment.start_time,
+        Appointment.status,
+        Client.name,
+        Service.name,
+        Stylist.name
+    ).join(Client, Appointment.client_id == Client.id).join(
+        Service, Appointment.service_id == Service.id
+    ).join(
+        Stylist, Appointment.stylist_id == Stylist.id
+    ).filter(
+        Appointment.start_time >= day_start,
+        Appointment.start_time < day_start + timedelta(days=1),
+        Appointment.status.in_(BOOKED_STATUSES)
+    ).order_by(Appointment.start_time).all()
+
+    return [
+        {
+            'id': row[0],
+            'start_time': row[1],
+            'status': row[2].value if row[2] else None,
+            'client_name': row[3],
+            'service_name': row[4],
+            'stylist_name': row[5]
+        }
+        for row in rows
+    ]
+
+
+def dashboard_context(session_factory, scheduler, now: Optional[datetime] = None) -> Dict:
+    """Return everything the dashboard renders, served from the TTL cache.
+
+    Entries are kept per location, as each location has its own database.
+    """
+    def compute():
+        current = now or scheduler._now()
+        session = session_factory()
+        try:
+            return {
+                'stats': dashboard_stats(session, current, scheduler.catalog.get()),
+                'todays_appointments': todays_appointments(session, current),
+                'upcoming_appointments': scheduler.get_upcoming_appointments(7)
+            }
+        finally:
+            session.close()
+
+    return dashboard_cache.get_or_compute(('dashboard', scheduler.location_id), compute)
+
+
+def _note_dashboard_changes(session, flush_context):
+    if any(isinstance(instance, (Appointment, Client))
+           for instance in chain(session.new, session.dirty, session.deleted)):
+        session.info['dashboard_changed'] = True
+
+
+def _invalidate_dashboard(session):
+    # The session does not say which location it belongs to, so every location's entry goes
+    if session.info.pop('dashboard_changed', False):
+        dashboard_cache.invalidate()
+
+
+def _discard_dashboard_changes(session):
+    session.info.pop('dashboard_changed', None)
+
+
+# Cleared after commit, so a request between the flush and the commit cannot cache the old counts
+event.listen(Session, 'after_flush', _note_dashboard_changes)
+event.listen(Session, 'after_commit', _invalidate_dashboard)
+event.listen(Session, 'after_rollback', _discard_dashboard_changes)
@@ -0,0 +1,28 @@
+from typing import Optional
+
+from models import SyncState
+
+
+class SyncStateStore:
+    """Persists incremental sync cursors such as the Gmail historyId."""
+
+    def __init__(self, session_factory):
+        self.Session = session_factory
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the stored value for a key, if any."""
+        session = self.Session()
+        try:
+            state = session.get(SyncState, key)
+            return state.value if state else None
+        finally:
+            session.close()
+
+    def set(self, key: str, value: str):
+        """Store a value for a key, replacing any previous one."""
+        session = self.Session()
+        try:
+            session.merge(SyncState(key=key, value=value))
+            session.commit()
+        finally:
+            session.close()
@@ -0,0 +1,21 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+# Modules import each other by bare name, as when run from salon_scheduler/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def Session():
+    """A session factory on a fresh, fully migrated SQLite database."""
+    from models import init_db
+    from benchmarks.common import temp_session_factory
+
+    Session, path = temp_session_factory()
+    init_db(Session.kw['bind'])
+    yield Session
+    Session.kw['bind'].dispose()
+    shutil.rmtree(os.path.dirname(path), ignore_errors=True)
@@ -0,0 +1,67 @@
+"""Admin API responses."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from admin import create_app
+from scheduler import Scheduler
+
+
+@pytest.fixture
+def scheduler(Session):
+    return Scheduler(Session)
+
+
+@pytest.fixture
+def client(Session, scheduler):
+    return create_app(session_factory=Session, scheduler=scheduler).test_client()
+
+
+def weekday_ahead() -> datetime:
+    """A weekday at least three days out, when every stylist works."""
+    day = datetime.now() + timedelta(days=3)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return day
+
+
+def slots_url(day: datetime) -> str:
+    return f"/api/available-slots?service=haircut&stylist=alice&date={day:%Y-%m-%d}"
+
+
+def test_available_slots_revalidate_without_searching(client, scheduler, monkeypatch):
+    # Hold the clock, so the ETag's SLOT_CACHE_SECONDS period cannot roll over mid-test
+    now = scheduler._now()
+    monkeypatch.setattr(scheduler, '_now', lambda: now)
+    day = weekday_ahead()
+    first = client.get(slots_url(day))
+    assert first.status_code == 200 and first.json['slots']
+    etag = first.headers['ETag']
+
+    def no_search(*args, **kwargs):
+        raise AssertionError('a matching ETag should not search for slots')
+    find_available_slots = scheduler.find_available_slots
+    monkeypatch.setattr(scheduler, 'find_available_slots', no_search)
+    repeat = client.get(slots_url(day), headers={'If-None-Match': etag})
+    assert repeat.status_code == 304
+    assert repeat.headers['ETag'] == etag
+    monkeypatch.setattr(scheduler, 'find_available_slots', find_available_slots)
+
+    start = datetime.fromisoformat(first.json['slots'][0]['datetime'])
+    scheduler.schedule_appointment('Test Client', 'haircut', start, 'alice', client_email='test@example.com')
+    changed = client.get(slots_url(day), headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert start.isoformat() not in [slot['datetime'] for slot in changed.json['slots']]
+
+
+def test_available_slots_rejects_bad_days(client):
+    assert client.get(slots_url(weekday_ahead()) + '&days=x').status_code == 400
+
+
+@pytest.mark.parametrize('url', ['/api/appointments', '/api/clients'])
+def test_listings_reject_malformed_cursors(client, url):
+    # Valid base64 JSON of the wrong shape: [1, 2] and {}
+    for cursor in ('WzEsIDJd', 'e30='):
+        response = client.get(f'{url}?cursor={cursor}')
+        assert response.status_code == 400 and response.json == {'error': 'Invalid cursor'}
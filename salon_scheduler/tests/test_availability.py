@@ -0,0 +1,162 @@
+"""The availability engine: opening windows, the slot bitmap and Scheduler.find_available_slots."""
+from datetime import date, datetime, time, timedelta
+
+import scheduler as scheduler_module
+from config import BUSINESS_HOURS, STYLISTS
+from availability import ScheduleBitmap, business_windows, run_starts
+from catalog import Catalog
+from models import Appointment, AppointmentStatus, Client
+from scheduler import Scheduler
+
+NOW = datetime(2026, 10, 19, 8, 0)  # A Monday
+WEDNESDAY = date(2026, 10, 21)
+THURSDAY = WEDNESDAY + timedelta(days=1)
+FRIDAY = WEDNESDAY + timedelta(days=2)
+SATURDAY = WEDNESDAY + timedelta(days=3)
+HAIRCUT = timedelta(minutes=45)
+
+
+def at(day: date, hour: int, minute: int = 0) -> datetime:
+    return datetime.combine(day, time(hour, minute))
+
+
+def bitmap(first_day: date = WEDNESDAY, days: int = 1, holidays=frozenset(), schedules=None) -> ScheduleBitmap:
+    schedules = schedules or {key: info['schedule'] for key, info in STYLISTS.items()}
+    return ScheduleBitmap(schedules, first_day, days, holidays, buffer_minutes=15, slot_interval=15)
+
+
+def starts(slots):
+    return [start for start, _ in slots]
+
+
+def book(Session, scheduler: Scheduler, stylist: str, service: str, start: datetime,
+         status: AppointmentStatus = AppointmentStatus.CONFIRMED):
+    catalog = scheduler.catalog.get()
+    session = Session()
+    try:
+        client = session.query(Client).first() or Client(name='Test Client', email='test@example.com')
+        session.add(Appointment(
+            client=client,
+            stylist_id=catalog.stylist_ids[stylist],
+            service_id=catalog.service_ids[service],
+            start_time=start,
+            end_time=start + catalog.durations[service],
+            status=status
+        ))
+        session.commit()
+    finally:
+        session.close()
+
+
+def test_run_starts_finds_runs_of_set_bits():
+    assert run_starts(0b111011, 1) == 0b111011
+    assert run_starts(0b111011, 2) == 0b011001
+    assert run_starts(0b111011, 3) == 0b001000
+    assert run_starts(0b111011, 4) == 0
+
+
+def test_business_windows_skip_closed_days_and_holidays():
+    sunday, monday = SATURDAY + timedelta(days=1), SATURDAY + timedelta(days=2)
+    assert business_windows(BUSINESS_HOURS, SATURDAY, 3, {monday}) == [(at(SATURDAY, 9), at(SATURDAY, 16))]
+    assert business_windows(BUSINESS_HOURS, sunday, 1) == []
+
+
+def test_buffer_keeps_slots_clear_of_bookings():
+    schedule = bitmap()
+    schedule.add_appointment('alice', at(WEDNESDAY, 10), at(WEDNESDAY, 10, 45))
+    found = starts(schedule.slots(['alice'], HAIRCUT))
+    assert found[:2] == [at(WEDNESDAY, 9), at(WEDNESDAY, 11)]
+    assert found[-1] == at(WEDNESDAY, 17, 15)
+    assert not schedule.is_free('alice', at(WEDNESDAY, 9, 15), at(WEDNESDAY, 10))
+    assert schedule.is_free('alice', at(WEDNESDAY, 11), at(WEDNESDAY, 11, 45))
+
+
+def test_off_grid_times_block_every_cell_they_touch():
+    schedule = bitmap()
+    schedule.add_appointment('alice', at(WEDNESDAY, 10, 5), at(WEDNESDAY, 10, 50))
+    # Padded to 9:50-11:05, which touches the 9:45 and 11:00 cells
+    assert starts(schedule.slots(['alice'], HAIRCUT))[:2] == [at(WEDNESDAY, 9), at(WEDNESDAY, 11, 15)]
+    assert not schedule.is_free('alice', at(WEDNESDAY, 11), at(WEDNESDAY, 11, 45))
+
+    hours = {'Wednesday': {'start': time(9, 10), 'end': time(10, 5)}}
+    assert starts(bitmap(schedules={'dora': hours}).slots(['dora'], HAIRCUT)) == [at(WEDNESDAY, 9, 15)]
+
+
+def test_holidays_have_no_slots():
+    schedule = bitmap(days=2, holidays={WEDNESDAY})
+    assert {start.date() for start in starts(schedule.slots(['alice'], HAIRCUT))} == {THURSDAY}
+
+
+def test_daily_limit_skips_full_days():
+    schedule = bitmap(days=2)
+    schedule.add_appointment('bob', at(WEDNESDAY, 9), at(WEDNESDAY, 10))
+    schedule.add_appointment(None, at(WEDNESDAY, 14), at(WEDNESDAY, 15))
+    assert schedule.daily_count(WEDNESDAY) == 2
+    assert {start.date() for start in starts(schedule.slots(['alice'], HAIRCUT, daily_limit=2))} == {THURSDAY}
+    assert WEDNESDAY in {start.date() for start in starts(schedule.slots(['alice'], HAIRCUT, daily_limit=3))}
+
+
+def test_multi_day_windows_and_blocks_across_midnight():
+    schedule = bitmap(days=5)
+    found = starts(schedule.slots(['alice'], HAIRCUT))
+    assert sorted({start.date() for start in found}) == [WEDNESDAY, THURSDAY, FRIDAY, SATURDAY]
+    assert max(start for start in found if start.date() == SATURDAY) == at(SATURDAY, 15, 15)
+
+    schedule.mark_busy('alice', at(WEDNESDAY, 17), at(THURSDAY, 10))
+    found = starts(schedule.slots(['alice'], HAIRCUT))
+    assert max(start for start in found if start.date() == WEDNESDAY) == at(WEDNESDAY, 16)
+    assert min(start for start in found if start.date() == THURSDAY) == at(THURSDAY, 10, 15)
+
+    earliest, latest = at(THURSDAY, 12), at(FRIDAY, 10)
+    bounded = starts(schedule.slots(['alice'], HAIRCUT, earliest=earliest, latest=latest))
+    assert bounded[0] == earliest and bounded[-1] == latest
+
+
+def test_slots_list_only_the_free_stylists_asked_for():
+    schedule = bitmap()
+    schedule.add_appointment('alice', at(WEDNESDAY, 9), at(WEDNESDAY, 12))
+    color = timedelta(minutes=120)
+    slots = dict(schedule.slots(['alice', 'bob'], color))
+    assert slots[at(WEDNESDAY, 9)] == ['bob']
+    assert slots[at(WEDNESDAY, 14)] == ['alice', 'bob']
+    assert all(stylists == ['alice'] for _, stylists in schedule.slots(['alice'], color))
+    assert schedule.slots(['nobody'], color) == []
+
+
+def test_scheduler_respects_bookings_buffers_and_stylists(Session):
+    scheduler = Scheduler(Session)
+    book(Session, scheduler, 'alice', 'color', at(WEDNESDAY, 9))
+    book(Session, scheduler, 'bob', 'color', at(WEDNESDAY, 14), status=AppointmentStatus.CANCELLED)
+
+    slots = dict(scheduler.find_available_slots('color', at(WEDNESDAY, 0), now=NOW))
+    assert slots[at(WEDNESDAY, 9)] == ['bob']
+    assert slots[at(WEDNESDAY, 11)] == ['bob']
+    assert slots[at(WEDNESDAY, 11, 15)] == ['alice', 'bob']
+    assert slots[at(WEDNESDAY, 14)] == ['alice', 'bob']
+
+    haircuts = scheduler.find_available_slots('haircut', at(WEDNESDAY, 0), stylist_id='alice', now=NOW)
+    assert haircuts[0] == (at(WEDNESDAY, 11, 15), ['alice'])
+    assert scheduler.find_available_slots('manicure', at(WEDNESDAY, 0), stylist_id='alice', now=NOW) == []
+
+
+def test_scheduler_multi_day_window_skips_holidays(Session, monkeypatch):
+    scheduler = Scheduler(Session)
+    catalog = scheduler.catalog.get()
+    with_holiday = Catalog(catalog.services, catalog.stylists, frozenset({THURSDAY}), catalog.business_hours,
+                           catalog.stylist_ids, catalog.service_ids)
+    monkeypatch.setattr(scheduler.catalog, 'get', lambda: with_holiday)
+
+    found = starts(scheduler.find_available_slots('haircut', at(WEDNESDAY, 0), days=5, now=NOW))
+    assert sorted({start.date() for start in found}) == [WEDNESDAY, FRIDAY, SATURDAY]
+    # Without a preferred date the search starts MIN_ADVANCE_HOURS from now
+    assert starts(scheduler.find_available_slots('haircut', now=NOW))[0] == at(NOW.date() + timedelta(days=1), 9)
+
+
+def test_scheduler_daily_limit(Session, monkeypatch):
+    monkeypatch.setattr(scheduler_module, 'MAX_DAILY_APPOINTMENTS', 2)
+    scheduler = Scheduler(Session)
+    book(Session, scheduler, 'bob', 'styling', at(WEDNESDAY, 9))
+    book(Session, scheduler, 'carol', 'manicure', at(WEDNESDAY, 9))
+
+    found = starts(scheduler.find_available_slots('haircut', at(WEDNESDAY, 0), days=2, now=NOW))
+    assert found and {start.date() for start in found} == {THURSDAY}
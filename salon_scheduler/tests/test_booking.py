@@ -0,0 +1,49 @@
+"""Concurrent bookings of the same slots never produce a double booking."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from config import BUFFER_BETWEEN_APPOINTMENTS, STYLISTS
+from availability import business_windows
+from models import Appointment, AppointmentStatus
+from scheduler import BookingConflict, Scheduler
+from benchmarks.bench_booking import OVERLAPS
+
+THREADS = 60
+SLOTS = 6
+
+
+def opening_slots(stylist: str, count: int):
+    """The opening time of the stylist's next `count` working days, from three days out."""
+    first_day = datetime.now().date() + timedelta(days=3)
+    return [start for start, _ in business_windows(STYLISTS[stylist]['schedule'], first_day, count * 2)][:count]
+
+
+def test_no_double_booking(Session):
+    scheduler = Scheduler(Session)
+    scheduler.catalog.get()
+    slots = opening_slots('alice', SLOTS)
+    assert len(slots) == SLOTS
+    barrier = threading.Barrier(THREADS)
+
+    def attempt(n):
+        barrier.wait()
+        try:
+            scheduler.schedule_appointment(f'Client {n}', 'haircut', slots[n % SLOTS], 'alice',
+                                           client_email=f'client{n}@example.com')
+            return 'booked'
+        except (BookingConflict, ValueError):
+            return 'rejected'
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        outcomes = list(pool.map(attempt, range(THREADS)))
+
+    with Session.kw['bind'].connect() as connection:
+        overlaps = connection.execute(OVERLAPS, {'buffer': f'+{BUFFER_BETWEEN_APPOINTMENTS} minutes'}).scalar()
+    session = Session()
+    booked = sorted(appointment.start_time for appointment in session.query(Appointment).filter(
+        Appointment.status != AppointmentStatus.CANCELLED))
+    session.close()
+    assert overlaps == 0
+    assert outcomes.count('booked') == SLOTS
+    assert booked == slots
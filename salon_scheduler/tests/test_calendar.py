@@ -0,0 +1,165 @@
+"""CalendarManager against the in-process fake Calendar API."""
+import os
+import shutil
+from datetime import datetime, timedelta
+
+import pytest
+
+from calendar_manager import SYNC_TOKEN_KEY, CalendarManager, appointment_event_id
+from models import Appointment, AppointmentStatus, CalendarEvent, Client, init_db
+from scheduler import Scheduler
+from sync_state import SyncStateStore
+from benchmarks.common import temp_session_factory
+from benchmarks.fake_calendar import FakeCalendarService
+
+NOW = datetime(2030, 1, 7, 8, 0)
+
+
+@pytest.fixture
+def fake():
+    return FakeCalendarService()
+
+
+@pytest.fixture
+def other_shard():
+    """A second location's database, numbering its appointments from 1 as well."""
+    Session, path = temp_session_factory()
+    init_db(Session.kw['bind'])
+    yield Session
+    Session.kw['bind'].dispose()
+    shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+
+def manager(Session, fake: FakeCalendarService, location_id: str = 'main') -> CalendarManager:
+    return CalendarManager(Session, service=fake, state_store=SyncStateStore(Session), location_id=location_id)
+
+
+def book(Session, start: datetime, stylist: str = 'alice', status=AppointmentStatus.CONFIRMED) -> int:
+    catalog = Scheduler(Session).catalog.get()
+    session = Session()
+    try:
+        client = session.query(Client).first() or Client(name='Test Client', email='test@example.com')
+        appointment = Appointment(client=client, stylist_id=catalog.stylist_ids[stylist],
+                                  service_id=catalog.service_ids['haircut'], start_time=start,
+                                  end_time=start + catalog.durations['haircut'], status=status)
+        session.add(appointment)
+        session.commit()
+        return appointment.id
+    finally:
+        session.close()
+
+
+def event_id_of(Session, appointment_id: int):
+    session = Session()
+    try:
+        return session.get(Appointment, appointment_id).event_id
+    finally:
+        session.close()
+
+
+def mirrored(Session) -> dict:
+    session = Session()
+    try:
+        return {row.event_id: row.appointment_id for row in session.query(CalendarEvent)}
+    finally:
+        session.close()
+
+
+def test_event_ids_differ_by_location():
+    assert appointment_event_id(1, 'main') != appointment_event_id(1, 'mainv')
+    assert appointment_event_id(1, 'main') != appointment_event_id(1, 'uptown')
+    assert set(appointment_event_id(42, 'Uptown-2')) <= set('abcdefghijklmnopqrstuv0123456789')
+
+
+def test_locations_sharing_a_calendar_keep_their_own_events(Session, other_shard, fake):
+    main, uptown = manager(Session, fake, 'main'), manager(other_shard, fake, 'uptown')
+    first = book(Session, NOW + timedelta(days=1, hours=2))
+    assert book(other_shard, NOW + timedelta(days=2, hours=2)) == first
+
+    assert main.flush(now=NOW) == (1, 0)
+    assert uptown.flush(now=NOW) == (1, 0)
+    assert event_id_of(Session, first) != event_id_of(other_shard, first)
+
+    main.sync()
+    uptown.sync()
+    # Each location mirrors its own appointment, not the other's with the same id
+    assert mirrored(Session) == {event_id_of(Session, first): first}
+    assert mirrored(other_shard) == {event_id_of(other_shard, first): first}
+
+
+def test_conflict_is_done_only_for_our_own_event(Session, fake, capsys):
+    calendar = manager(Session, fake)
+    ours = book(Session, NOW + timedelta(days=1, hours=2))
+    taken = book(Session, NOW + timedelta(days=1, hours=4))
+
+    # Our insert reached Google but was not recorded; the other id is held by someone else's event
+    fake.events().insert(calendarId='primary', body=calendar._event_body(
+        ours, 1, NOW, NOW + timedelta(hours=1), 'Test Client', 'haircut', 'Alice', None
+    )).execute()
+    fake.store({'id': appointment_event_id(taken), 'status': 'confirmed', 'summary': 'Elsewhere',
+                'start': {'dateTime': NOW.isoformat()}, 'end': {'dateTime': NOW.isoformat()},
+                'extendedProperties': {'private': {'appointment_id': str(taken), 'location_id': 'uptown'}}})
+
+    assert calendar.flush(now=NOW) == (1, 0)
+    assert event_id_of(Session, ours) == appointment_event_id(ours)
+    assert event_id_of(Session, taken) is None
+    assert 'belongs to another event' in capsys.readouterr().out
+
+
+def test_expired_sync_token_rebuilds_the_mirror(Session, fake):
+    calendar = manager(Session, fake)
+    kept = fake.add_block(NOW + timedelta(days=1), NOW + timedelta(days=1, hours=1), attendee='alice@salon.local')
+    dropped = fake.add_block(NOW + timedelta(days=2), NOW + timedelta(days=2, hours=1))
+    assert calendar.sync() == 2
+    token = calendar.state_store.get(SYNC_TOKEN_KEY)
+
+    fake.remove(dropped)
+    fake.expire_sync_tokens()
+    # The stale token gets a 410, so everything is listed again and the mirror rebuilt
+    assert calendar.sync() == 1
+    assert set(mirrored(Session)) == {kept}
+    assert calendar.state_store.get(SYNC_TOKEN_KEY) != token
+
+    fake.move(kept, NOW + timedelta(days=3), NOW + timedelta(days=3, hours=1))
+    assert calendar.sync() == 1
+
+
+def test_repeated_insert_after_a_lost_response(Session, fake):
+    calendar = manager(Session, fake)
+    appointment_id = book(Session, NOW + timedelta(days=1, hours=2))
+    assert calendar.flush(now=NOW) == (1, 0)
+
+    # As if the reply to the insert never arrived
+    session = Session()
+    session.get(Appointment, appointment_id).event_id = None
+    session.commit()
+    session.close()
+    assert calendar.flush(now=NOW) == (1, 0)
+    assert event_id_of(Session, appointment_id) == appointment_event_id(appointment_id)
+    assert len(fake.events_by_id) == 1
+
+
+def test_cancellation_deletes_the_event_once(Session, fake):
+    calendar = manager(Session, fake)
+    appointment_id = book(Session, NOW + timedelta(days=1, hours=2))
+    calendar.flush(now=NOW)
+    event_id = event_id_of(Session, appointment_id)
+
+    session = Session()
+    session.get(Appointment, appointment_id).status = AppointmentStatus.CANCELLED
+    session.commit()
+    session.close()
+    assert calendar.flush(now=NOW) == (0, 1)
+    assert fake.events_by_id[event_id]['status'] == 'cancelled'
+    assert mirrored(Session) == {}
+    assert calendar.flush(now=NOW) == (0, 0)
+
+    # A delete that already happened (410) still clears the mirror row
+    calendar.sync()
+    session = Session()
+    session.add(CalendarEvent(event_id=event_id, appointment_id=appointment_id, start_time=NOW, end_time=NOW,
+                              updated_at=NOW))
+    session.commit()
+    session.close()
+    assert calendar.flush(now=NOW) == (0, 1)
+    assert mirrored(Session) == {}
@@ -0,0 +1,69 @@
+"""CatalogStore keeps the Stylist rows in line with config.py across reloads."""
+import os
+import shutil
+
+import pytest
+
+import config
+from catalog import CatalogStore
+from models import Stylist
+
+
+@pytest.fixture
+def config_copy(tmp_path):
+    path = tmp_path / 'config.py'
+    shutil.copy(config.__file__, path)
+    return path
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def edit_config(path, old: str, new: str, clock: Clock):
+    source = path.read_text()
+    assert old in source
+    path.write_text(source.replace(old, new, 1))
+    clock.now += 1
+    os.utime(path, (clock.now, clock.now))
+
+
+def test_renaming_a_stylist_keeps_their_row(Session, config_copy):
+    clock = Clock()
+    store = CatalogStore(Session, config_path=str(config_copy), check_seconds=0, clock=clock)
+    before = store.get()
+    name = before.stylists['alice']['name']
+
+    edit_config(config_copy, f"'name': '{name}'", "'name': 'Alice Renamed'", clock)
+    after = store.get()
+
+    assert after is not before
+    assert after.stylists['alice']['name'] == 'Alice Renamed'
+    assert after.stylist_ids == before.stylist_ids
+    session = Session()
+    try:
+        assert session.query(Stylist).count() == len(after.stylists)
+        assert session.get(Stylist, after.stylist_ids['alice']).name == 'Alice Renamed'
+    finally:
+        session.close()
+
+
+def test_failed_rebuild_keeps_the_previous_snapshot(Session, config_copy, monkeypatch):
+    clock = Clock()
+    store = CatalogStore(Session, config_path=str(config_copy), check_seconds=0, clock=clock)
+    before = store.get()
+    name = before.stylists['alice']['name']
+
+    def fail(*args):
+        raise RuntimeError('database unavailable')
+    monkeypatch.setattr(store, '_sync_rows', fail)
+    edit_config(config_copy, f"'name': '{name}'", "'name': 'Alice Renamed'", clock)
+    assert store.get() is before
+
+    monkeypatch.undo()
+    clock.now += 1
+    assert store.get().stylists['alice']['name'] == 'Alice Renamed'
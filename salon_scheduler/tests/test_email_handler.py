@@ -0,0 +1,102 @@
+"""EmailHandler inbox polling against the fake Gmail service."""
+import pytest
+
+from email_handler import HISTORY_STATE_KEY, EmailHandler
+from sync_state import SyncStateStore
+from benchmarks.fake_gmail import FakeGmailService
+
+BODY = 'Name: {name}\nService: haircut\nDate: 2030-01-08\nTime: 10:00\nPhone: 555-0100\n'
+
+
+@pytest.fixture
+def gmail():
+    return FakeGmailService()
+
+
+@pytest.fixture
+def handler(Session, gmail, tmp_path):
+    return EmailHandler(service=gmail, state_store=SyncStateStore(Session), session_factory=Session,
+                        template_root=str(tmp_path))
+
+
+def deliver(gmail, name: str) -> str:
+    return gmail.deliver(f'{name} <{name.lower()}@example.com>', BODY.format(name=name))
+
+
+def polled(handler) -> list:
+    return [request['data']['name'] for request in handler.monitor_inbox()]
+
+
+def unread(gmail, message_id: str) -> bool:
+    return 'UNREAD' in gmail.mailbox[message_id]['labelIds']
+
+
+class CountingGmail(FakeGmailService):
+    """Records which API calls each poll makes."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def messages(self):
+        self.calls.append('messages')
+        return super().messages()
+
+    def history(self):
+        self.calls.append('history')
+        return super().history()
+
+
+def test_polls_resume_from_the_stored_history_id(Session, tmp_path):
+    gmail = CountingGmail()
+    handler = EmailHandler(service=gmail, state_store=SyncStateStore(Session), session_factory=Session,
+                           template_root=str(tmp_path))
+    deliver(gmail, 'Ann')
+    assert polled(handler) == ['Ann']
+    assert 'history' not in gmail.calls
+    first_cursor = handler.state_store.get(HISTORY_STATE_KEY)
+
+    gmail.calls.clear()
+    deliver(gmail, 'Bob')
+    assert polled(handler) == ['Bob']
+    assert 'history' in gmail.calls
+    assert int(handler.state_store.get(HISTORY_STATE_KEY)) > int(first_cursor)
+
+    # Once Gmail has dropped the history, the poll lists the inbox instead
+    deliver(gmail, 'Cy')
+    gmail.oldest_history_id = gmail.history_id + 1
+    assert polled(handler) == ['Cy']
+    assert polled(handler) == []
+
+
+def test_messages_that_fail_to_fetch_are_fetched_again(gmail, handler):
+    ann, bob = deliver(gmail, 'Ann'), deliver(gmail, 'Bob')
+    gmail.get_failures.add(bob)
+
+    assert polled(handler) == ['Ann']
+    assert not unread(gmail, ann) and unread(gmail, bob)
+    assert handler.state_store.get(HISTORY_STATE_KEY) is None
+
+    gmail.get_failures.clear()
+    assert polled(handler) == ['Bob']
+    assert not unread(gmail, bob)
+    assert handler.state_store.get(HISTORY_STATE_KEY) is not None
+
+
+def test_unparsed_messages_are_fetched_again(gmail, handler):
+    ann = deliver(gmail, 'Ann')
+    assert polled(handler) == ['Ann']
+
+    bob, cy = deliver(gmail, 'Bob'), deliver(gmail, 'Cy')
+    body = gmail.mailbox[bob]['payload']['body']
+    data, body['data'] = body['data'], 'a'  # Truncated, so it cannot be decoded
+    cursor = handler.state_store.get(HISTORY_STATE_KEY)
+
+    assert polled(handler) == ['Cy']
+    assert unread(gmail, bob) and not unread(gmail, cy)
+    assert handler.state_store.get(HISTORY_STATE_KEY) == cursor
+
+    body['data'] = data
+    assert polled(handler) == ['Bob']
+    assert not unread(gmail, ann) and not unread(gmail, bob)
+    assert polled(handler) == []
@@ -0,0 +1,58 @@
+"""Request field extraction from email bodies."""
+from datetime import datetime
+
+import pytest
+
+from email_parser import EmailRequestParser
+
+COMPLETE = 'Name: Jane Doe\nService: haircut\nDate: 2030-01-08\nTime: 2:30 PM\nPhone: 555-0100\n'
+
+
+@pytest.fixture
+def parser():
+    return EmailRequestParser()
+
+
+def test_complete_request(parser):
+    extracted, missing = parser.parse_text(COMPLETE)
+    assert missing == []
+    assert extracted['name'] == 'Jane Doe'
+    assert extracted['requested_datetime'] == datetime(2030, 1, 8, 14, 30)
+
+
+def test_fields_only_count_at_the_start_of_a_line(parser):
+    body = 'Hi, my nickname: JD and the best time: whenever.\n' + COMPLETE.replace('Name: Jane Doe', 'Name: Jane')
+    extracted, _ = parser.parse_text(body)
+    assert extracted['name'] == 'Jane'
+    assert extracted['time'] == '2:30 PM'
+
+    extracted, missing = parser.parse_text('Dear salon, name: Jane Doe please.\nphone: 555-0100')
+    assert 'name' in missing and extracted['phone'] == '555-0100'
+
+
+def test_values_do_not_run_onto_the_next_line(parser):
+    extracted, missing = parser.parse_text('Name:\nService: haircut\nDate: 2030-01-08\nTime: 10:00\nPhone: 555-0100')
+    assert 'name' not in extracted and missing == ['name']
+    assert extracted['service'] == 'haircut'
+
+    extracted, missing = parser.parse_text('Name\n: Jane Doe\n' + COMPLETE.split('\n', 1)[1])
+    assert missing == ['name']
+
+
+def test_indented_crlf_and_mixed_case_fields(parser):
+    body = '  NAME :  Jane Doe  \r\n\tService:\tColor\r\ndate: 01/08/2030\r\nTIME: 10:15\r\nPhone: 555-0100\r\n'
+    extracted, missing = parser.parse_text(body)
+    assert missing == []
+    assert (extracted['name'], extracted['service']) == ('Jane Doe', 'Color')
+    assert extracted['requested_datetime'] == datetime(2030, 1, 8, 10, 15)
+
+
+def test_first_non_blank_value_wins(parser):
+    extracted, _ = parser.parse_text('Name: \nName: Jane\nName: Someone Else\n')
+    assert extracted['name'] == 'Jane'
+
+
+def test_invalid_service_and_date_are_reported(parser):
+    body = COMPLETE.replace('haircut', 'massage').replace('2030-01-08', 'the day after never')
+    _, missing = parser.parse_text(body)
+    assert 'valid_service' in missing and 'valid_date' in missing
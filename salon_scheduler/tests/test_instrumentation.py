@@ -0,0 +1,17 @@
+"""The /metrics endpoint."""
+import urllib.request
+
+from instrumentation import count, serve_metrics
+
+
+def test_metrics_are_served_to_this_machine_only_by_default():
+    server = serve_metrics(0)
+    try:
+        host, port = server.server_address
+        assert host == '127.0.0.1'
+        count('test_scrapes_total')
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=5) as response:
+            assert 'test_scrapes_total' in response.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,35 @@
+"""Cursor tokens for the paged listings."""
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+from pagination import decode_cursor, encode_cursor
+
+
+def token(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode('utf-8')).decode('ascii')
+
+
+def test_cursors_round_trip():
+    start = datetime(2030, 1, 8, 10, 30)
+    assert decode_cursor(encode_cursor(start, 42), datetime, int) == [start, 42]
+    assert decode_cursor(encode_cursor(7), int) == [7]
+    assert decode_cursor(None, int) is None and decode_cursor('', int) is None
+
+
+@pytest.mark.parametrize('cursor', [
+    'not base64!', 'é', token('x')[:-2], token({}), token('7'), token([]), token([1]), token([1, 2, 3]),
+    token(['2030-01-08T10:30:00', '42']), token([None, 42]), token(['yesterday', 42]), token([42, 42]),
+    token(['2030-01-08T10:30:00', 4.2]), token(['2030-01-08T10:30:00', True])
+])
+def test_malformed_appointment_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, datetime, int)
+
+
+@pytest.mark.parametrize('cursor', [token([]), token(['7']), token([None]), token([{}]), token([7, 8])])
+def test_malformed_client_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, int)
@@ -0,0 +1,93 @@
+"""BookingPipeline end to end against the fake Gmail service."""
+import asyncio
+import base64
+import email
+import time
+from datetime import date, timedelta
+
+import pytest
+
+from config import EMAIL_TEMPLATES
+from email_handler import HISTORY_STATE_KEY, EmailHandler
+from pipeline import BookingPipeline
+from rate_limit import RateLimiter
+from scheduler import Scheduler
+from sync_state import SyncStateStore
+from benchmarks.fake_gmail import FakeGmailService
+
+
+@pytest.fixture
+def gmail():
+    return FakeGmailService()
+
+
+@pytest.fixture
+def handler(Session, gmail, tmp_path):
+    handler = EmailHandler(service=gmail, state_store=SyncStateStore(Session), session_factory=Session,
+                           template_root=str(tmp_path))
+    handler.rate_limiter = RateLimiter(1e9, burst=10 ** 9)
+    handler.templates.update({path: handler.jinja_env.from_string(kind) for kind, path in EMAIL_TEMPLATES.items()})
+    return handler
+
+
+def request_body(name: str = 'Test Client', with_time: bool = True) -> str:
+    day = date.today() + timedelta(days=3)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    body = f'Name: {name}\nService: haircut\nDate: {day:%Y-%m-%d}\nPhone: 555-0100\n'
+    return body + 'Time: 10:00\n' if with_time else body
+
+
+def run_one_poll(handler, scheduler, **kwargs) -> BookingPipeline:
+    pipeline = BookingPipeline(handler, scheduler, workers={'reply': 1}, batch_booking=False, **kwargs)
+
+    async def stop_after_poll():
+        while not pipeline.metrics['poll'].processed:
+            await asyncio.sleep(0.01)
+        pipeline.stop()
+
+    async def run():
+        await asyncio.gather(pipeline.run(), stop_after_poll())
+    asyncio.run(run())
+    return pipeline
+
+
+def unread(gmail, message_id: str) -> bool:
+    return 'UNREAD' in gmail.mailbox[message_id]['labelIds']
+
+
+def sent_subjects(gmail) -> list:
+    return [email.message_from_bytes(base64.urlsafe_b64decode(message['raw']))['subject'] for message in gmail.sent]
+
+
+def test_messages_are_marked_read_only_once_replied(Session, gmail, handler):
+    incomplete = gmail.deliver('Ann <ann@example.com>', request_body('Ann', with_time=False))
+    complete = gmail.deliver('Bob <bob@example.com>', request_body('Bob'))
+    # The missing-information reply goes first, and fails
+    gmail.send_failures = 1
+
+    pipeline = run_one_poll(handler, Scheduler(Session))
+    assert pipeline.metrics['reply'].failed == 1
+    assert unread(gmail, incomplete) and not unread(gmail, complete)
+    assert handler.state_store.get(HISTORY_STATE_KEY) is None
+
+    run_one_poll(handler, Scheduler(Session))
+    assert not unread(gmail, incomplete)
+    assert handler.state_store.get(HISTORY_STATE_KEY) is not None
+    assert sent_subjects(gmail) == ['Your Appointment is Confirmed!', 'Additional Information Needed for Your Appointment']
+
+
+def test_slow_booking_is_not_abandoned(Session, gmail, handler):
+    scheduler = Scheduler(Session)
+    book = scheduler.schedule_appointment
+
+    def slow_book(*args, **kwargs):
+        time.sleep(0.3)
+        return book(*args, **kwargs)
+    scheduler.schedule_appointment = slow_book
+    message_id = gmail.deliver('Bob <bob@example.com>', request_body('Bob'))
+
+    pipeline = run_one_poll(handler, scheduler, call_timeout=0.1)
+    assert pipeline.metrics['booking'].failed == 0
+    assert not unread(gmail, message_id)
+    assert sent_subjects(gmail) == ['Your Appointment is Confirmed!']
@@ -0,0 +1,22 @@
+"""The hot appointment and email log queries use indexes on realistic data."""
+import os
+import shutil
+
+import pytest
+
+from benchmarks.query_plans import full_scans, hot_query_plans, seeded_database
+
+
+@pytest.fixture(scope='module')
+def Session():
+    Session, path = seeded_database()
+    yield Session
+    Session.kw['bind'].dispose()
+    shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+
+def test_hot_queries_do_not_scan_large_tables(Session):
+    plans = hot_query_plans(Session)
+    assert plans, 'no queries were captured'
+    scans = {' '.join(statement.split()): full_scans(details) for statement, details in plans if full_scans(details)}
+    assert not scans
@@ -0,0 +1,132 @@
+"""ReminderDispatcher on a simulated clock."""
+from datetime import datetime, timedelta
+from typing import Optional
+
+import pytest
+
+from config import EMAIL_TEMPLATES
+from models import Appointment, AppointmentStatus, Client, Service, Stylist
+from email_handler import EmailHandler
+from rate_limit import RateLimiter
+from reminders import ReminderDispatcher
+from benchmarks.bench_reminders import SimulatedClock, simulate
+from benchmarks.fake_gmail import FakeGmailService
+
+START = datetime(2030, 1, 7, 8, 0)
+
+
+@pytest.fixture
+def clock():
+    return SimulatedClock(START)
+
+
+@pytest.fixture
+def gmail():
+    return FakeGmailService()
+
+
+@pytest.fixture
+def dispatcher(Session, clock, gmail, tmp_path):
+    template = tmp_path / EMAIL_TEMPLATES['reminder']
+    template.parent.mkdir(parents=True)
+    template.write_text('{{ client_name }} {{ start_time }}')
+    handler = EmailHandler(service=gmail, session_factory=Session, template_root=str(tmp_path))
+    handler.rate_limiter = RateLimiter(1e9, burst=10 ** 9)
+
+    session = Session()
+    session.add_all([
+        Stylist(id=1, name='Test Stylist', email='stylist@example.com'),
+        Service(id=1, name='haircut', duration=45, price=50.0),
+        Client(id=1, name='Test Client', email='client@example.com')
+    ])
+    session.commit()
+    session.close()
+    return ReminderDispatcher(Session, handler, clock=clock)
+
+
+def book(Session, start: datetime, status: AppointmentStatus = AppointmentStatus.CONFIRMED,
+         updated_at: Optional[datetime] = None) -> int:
+    session = Session()
+    try:
+        appointment = Appointment(client_id=1, stylist_id=1, service_id=1, status=status,
+                                  start_time=start, end_time=start + timedelta(minutes=45),
+                                  updated_at=updated_at or datetime.utcnow())
+        session.add(appointment)
+        session.commit()
+        return appointment.id
+    finally:
+        session.close()
+
+
+def statuses(results):
+    return [result['status'] for result in results]
+
+
+def test_failed_send_is_retried(Session, clock, gmail, dispatcher):
+    book(Session, START + timedelta(hours=30))
+    dispatcher.load()
+    gmail.send_failures = 1
+
+    clock.advance(timedelta(hours=6))
+    assert statuses(dispatcher.tick()) == ['failed']
+    assert dispatcher.next_due() == clock.now + dispatcher.retry_delay
+
+    clock.advance(dispatcher.retry_delay)
+    assert statuses(dispatcher.tick()) == ['sent']
+    clock.advance(dispatcher.retry_delay)
+    assert dispatcher.tick() == []
+    assert len(gmail.sent) == 1
+
+
+def test_reminders_are_retried_when_the_send_raises(Session, clock, dispatcher, monkeypatch):
+    book(Session, START + timedelta(hours=30))
+    dispatcher.load()
+
+    def unavailable(*args, **kwargs):
+        raise RuntimeError('templates unavailable')
+    monkeypatch.setattr(dispatcher.email_handler, 'send_bulk', unavailable)
+    clock.advance(timedelta(hours=6))
+    with pytest.raises(RuntimeError):
+        dispatcher.tick()
+
+    monkeypatch.undo()
+    clock.advance(dispatcher.retry_delay)
+    assert statuses(dispatcher.tick()) == ['sent']
+
+
+def test_no_retry_that_would_land_after_the_start(Session, clock, gmail, dispatcher):
+    # Booked late, so the reminder is already due and a retry would land after the start
+    book(Session, START + timedelta(minutes=10))
+    dispatcher.load()
+    gmail.send_failures = 1
+
+    assert statuses(dispatcher.tick()) == ['failed']
+    assert dispatcher.next_due() is None
+
+
+def test_refresh_sees_changes_that_commit_late(Session, dispatcher):
+    book(Session, START + timedelta(hours=40))
+    dispatcher.load()
+    # Stamped before the newest change the dispatcher has seen, but committed after it
+    late = book(Session, START + timedelta(hours=30), updated_at=dispatcher._last_change - timedelta(seconds=1))
+    dispatcher.refresh()
+    assert len(dispatcher) == 2
+    assert late in dispatcher._scheduled
+
+
+def test_refresh_does_not_reschedule_sent_reminders(Session, clock, dispatcher):
+    book(Session, START + timedelta(hours=30))
+    dispatcher.refresh()
+    clock.advance(timedelta(hours=6))
+    assert statuses(dispatcher.tick()) == ['sent']
+
+    dispatcher.refresh()
+    assert len(dispatcher) == 0
+    assert dispatcher.next_due() is None
+
+
+def test_simulated_days_send_every_reminder_once(Session, tmp_path):
+    result = simulate(Session, appointments=2000, days=2, tick_minutes=5, templates=str(tmp_path))
+    assert result['loaded'] and result['sent']
+    assert result['checks'] == dict.fromkeys(result['checks'], True)
+    assert max(result['per_tick_queries']) <= 3
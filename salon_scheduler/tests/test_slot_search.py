@@ -0,0 +1,139 @@
+"""find_available_slots agrees with a slot-by-slot check of the same rules on random calendars,
+and find_nearest_slots with sorting its results by distance.
+
+The reference below is the interval rule the engine has had to satisfy
+since it was first written: a slot on the grid is free for a stylist when
+it lies inside their opening hours and ends at least the buffer before
+each of their appointments starts, or starts at least the buffer after it
+ends. Appointments here start and end on the grid, where the bitmap's
+cell rounding changes nothing.
+"""
+import random
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+import scheduler as scheduler_module
+from config import BUFFER_BETWEEN_APPOINTMENTS, MIN_ADVANCE_HOURS, SLOT_INTERVAL, STYLISTS
+from availability import business_windows
+from models import Appointment, AppointmentStatus, Client
+from scheduler import Scheduler
+
+CASES = 300
+FIRST_DAY = date(2026, 10, 21)  # A Wednesday
+DAYS = 3
+
+
+def random_calendar(rng: random.Random, catalog) -> list:
+    """(stylist, service, start, end, status) for a few days of grid-aligned bookings."""
+    rows = []
+    for _ in range(rng.randrange(30)):
+        stylist = rng.choice(list(STYLISTS))
+        service = rng.choice(STYLISTS[stylist]['specialties'])
+        day = FIRST_DAY + timedelta(days=rng.randrange(DAYS))
+        start = datetime.combine(day, time(8)) + rng.randrange(44) * timedelta(minutes=SLOT_INTERVAL)
+        status = AppointmentStatus.CANCELLED if rng.random() < 0.15 else AppointmentStatus.CONFIRMED
+        rows.append((stylist, service, start, start + catalog.durations[service], status))
+    return rows
+
+
+def reference_slots(catalog, service: str, stylist_id, rows: list, earliest: datetime, daily_limit: int):
+    buffer = timedelta(minutes=BUFFER_BETWEEN_APPOINTMENTS)
+    step = timedelta(minutes=SLOT_INTERVAL)
+    duration = catalog.durations[service]
+    active = [row for row in rows if row[4] != AppointmentStatus.CANCELLED]
+    per_day = {}
+    for _, _, start, _, _ in active:
+        per_day[start.date()] = per_day.get(start.date(), 0) + 1
+
+    free = {}
+    for key in catalog.eligible_stylists(service, stylist_id):
+        busy = [(start - buffer, end + buffer) for stylist, _, start, end, _ in active if stylist == key]
+        for window_start, window_end in business_windows(catalog.schedules[key], FIRST_DAY, DAYS):
+            if per_day.get(window_start.date(), 0) >= daily_limit:
+                continue
+            slot = window_start
+            while slot + duration <= window_end:
+                if slot >= earliest and all(slot + duration <= lo or slot >= hi for lo, hi in busy):
+                    free.setdefault(slot, []).append(key)
+                slot += step
+    return sorted(free.items())
+
+
+def add_client(Session) -> int:
+    session = Session()
+    client = Client(name='Test Client', email='test@example.com')
+    session.add(client)
+    session.commit()
+    client_id = client.id
+    session.close()
+    return client_id
+
+
+def replace_calendar(Session, scheduler: Scheduler, catalog, client_id: int, rows: list):
+    session = Session()
+    session.query(Appointment).delete()
+    session.add_all(
+        Appointment(client_id=client_id, stylist_id=catalog.stylist_ids[stylist],
+                    service_id=catalog.service_ids[booked], start_time=start, end_time=end, status=status)
+        for stylist, booked, start, end, status in rows
+    )
+    session.commit()
+    session.close()
+    scheduler.slot_cache.entries.invalidate()
+
+
+@pytest.mark.parametrize('first_case', range(0, CASES, 50))
+def test_find_available_slots_matches_reference(Session, monkeypatch, first_case):
+    scheduler = Scheduler(Session)
+    catalog = scheduler.catalog.get()
+    client_id = add_client(Session)
+
+    for case in range(first_case, first_case + 50):
+        rng = random.Random(case)
+        rows = random_calendar(rng, catalog)
+        service = rng.choice(list(catalog.services))
+        stylist_id = rng.choice([None] + list(catalog.eligible_stylists(service)))
+        daily_limit = rng.choice([2, 5, 20])
+        # Some cases start part way through the first day
+        now = datetime.combine(FIRST_DAY - timedelta(days=1), time(rng.randrange(6, 20), rng.choice([0, 20, 45])))
+        monkeypatch.setattr(scheduler_module, 'MAX_DAILY_APPOINTMENTS', daily_limit)
+        replace_calendar(Session, scheduler, catalog, client_id, rows)
+
+        found = scheduler.find_available_slots(service, datetime.combine(FIRST_DAY, time.min), stylist_id,
+                                               days=DAYS, now=now)
+        expected = reference_slots(catalog, service, stylist_id, rows,
+                                   now + timedelta(hours=MIN_ADVANCE_HOURS), daily_limit)
+        assert found == expected, f'case {case}: {service} for {stylist_id or "anyone"}, {len(rows)} bookings'
+
+
+def test_find_nearest_slots_matches_sorting_the_window(Session, monkeypatch):
+    scheduler = Scheduler(Session)
+    catalog = scheduler.catalog.get()
+    client_id = add_client(Session)
+    now = datetime.combine(FIRST_DAY - timedelta(days=1), time(9))
+
+    for case in range(100):
+        rng = random.Random(case)
+        rows = random_calendar(rng, catalog)
+        # Days booked solid, or all but the morning or afternoon, push the nearest slots to other days
+        for offset in rng.sample(range(DAYS), rng.randrange(DAYS + 1)):
+            day = datetime.combine(FIRST_DAY + timedelta(days=offset), time.min)
+            hours = rng.choice([(8, 19), (11, 19), (8, 15)])
+            rows.extend((key, STYLISTS[key]['specialties'][0], day + timedelta(hours=hours[0]),
+                         day + timedelta(hours=hours[1]), AppointmentStatus.CONFIRMED) for key in STYLISTS)
+        service = rng.choice(list(catalog.services))
+        stylist_id = rng.choice([None] + list(catalog.eligible_stylists(service)))
+        requested = datetime.combine(FIRST_DAY + timedelta(days=rng.randrange(-1, DAYS + 2)),
+                                     time(rng.randrange(24), rng.choice([0, 20, 45])))
+        k = rng.choice([1, 3, 10, 40])
+        monkeypatch.setattr(scheduler_module, 'MAX_DAILY_APPOINTMENTS', 100)
+        replace_calendar(Session, scheduler, catalog, client_id, rows)
+
+        window = scheduler.find_available_slots(service, now, stylist_id, days=scheduler_module.MAX_ADVANCE_DAYS + 1,
+                                                now=now)
+        target = max(requested, now + timedelta(hours=MIN_ADVANCE_HOURS))
+        expected = sorted(window, key=lambda slot: (abs(slot[0] - target), slot[0]))[:k]
+        scheduler.slot_cache.entries.invalidate()
+        found = scheduler.find_nearest_slots(service, requested, k=k, stylist_id=stylist_id, now=now)
+        assert found == expected, f'case {case}: {k} nearest {service} to {requested} for {stylist_id or "anyone"}'
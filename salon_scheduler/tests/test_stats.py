@@ -0,0 +1,67 @@
+"""Dashboard counters and their cache."""
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+import stats
+from models import Appointment, AppointmentStatus, Client
+from scheduler import Scheduler
+from stats import dashboard_context, dashboard_stats, row_count, todays_appointments
+
+NOW = datetime(2030, 1, 8, 8, 0)  # A Tuesday
+
+
+def book(Session, scheduler: Scheduler, start: datetime, status=AppointmentStatus.CONFIRMED):
+    catalog = scheduler.catalog.get()
+    session = Session()
+    try:
+        client = session.query(Client).first() or Client(name='Test Client', email='test@example.com')
+        session.add(Appointment(client=client, stylist_id=catalog.stylist_ids['alice'],
+                                service_id=catalog.service_ids['haircut'], start_time=start,
+                                end_time=start + catalog.durations['haircut'], status=status))
+        session.commit()
+    finally:
+        session.close()
+
+
+def test_totals_follow_every_insert_and_delete(Session):
+    scheduler = Scheduler(Session)
+    book(Session, scheduler, NOW + timedelta(hours=2))
+    session = Session()
+    session.execute(Client.__table__.insert(), [
+        {'name': f'Client {n}', 'email': f'client{n}@example.com'} for n in range(5)
+    ])
+    session.query(Appointment).delete()
+    session.commit()
+
+    counted = {model: session.query(func.count()).select_from(model).scalar() for model in (Client, Appointment)}
+    assert counted == {Client: 6, Appointment: 0}
+    assert {model: row_count(session, model) for model in (Client, Appointment)} == counted
+    result = dashboard_stats(session, NOW, scheduler.catalog.get())
+    assert (result['total_clients'], result['total_appointments']) == (6, 0)
+    session.close()
+
+
+def test_todays_count_matches_the_table(Session):
+    scheduler = Scheduler(Session)
+    book(Session, scheduler, NOW + timedelta(hours=2))
+    book(Session, scheduler, NOW + timedelta(hours=4), status=AppointmentStatus.CANCELLED)
+    book(Session, scheduler, NOW + timedelta(days=1))
+
+    session = Session()
+    try:
+        todays = todays_appointments(session, NOW)
+        assert dashboard_stats(session, NOW, scheduler.catalog.get())['todays_count'] == len(todays) == 1
+    finally:
+        session.close()
+
+
+def test_dashboard_is_cached_per_location(Session, monkeypatch):
+    monkeypatch.setattr(stats, 'dashboard_cache', stats.TTLCache(60))
+    main, uptown = Scheduler(Session, 'main'), Scheduler(Session, 'uptown')
+    book(Session, main, NOW + timedelta(hours=2))
+    monkeypatch.setattr(main, 'get_upcoming_appointments', lambda days: ['main'])
+    monkeypatch.setattr(uptown, 'get_upcoming_appointments', lambda days: ['uptown'])
+
+    assert dashboard_context(Session, main, NOW)['upcoming_appointments'] == ['main']
+    assert dashboard_context(Session, uptown, NOW)['upcoming_appointments'] == ['uptown']